@@ -2,16 +2,39 @@ import os
 import logging
 from flask import Flask, render_template, request, jsonify, Response, send_file
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import insert
+from sqlalchemy.orm import DeclarativeBase, defer
 from scraper.web_crawler import WebCrawler
+from scraper.extraction import ExtractionPool
 from utils.llm_handler import LLMHandler
 from utils.file_manager import FileManager
+from utils.job_manager import JobManager
+from utils.sse_broker import create_broker, format_events
+from utils.zip_stream import build_manifest, stream_zip, StoredZipLayout
+from utils.search_index import SearchIndex
 from scraper.content_analyzer import ContentAnalyzer
+from scraper.scheduler import ScrapeScheduler, ScrapeCancelled
+from scraper.image_pipeline import ImageSession
+from scraper.near_duplicates import NearDuplicateIndex, simhash
+from scraper.frontier import CrawlFrontier, FocusedFrontier
+from scraper.link_scorer import LinkScorer
+from scraper.metrics import registry as metrics, tracer
 import json
 import time
-import shutil
-from queue import Queue
-from threading import Thread
+import uuid
+import socket
+import atexit
+import threading
+import weakref
+from datetime import datetime, timedelta, timezone
+from collections import deque, defaultdict
+
+if __name__ == "__main__":
+    # Extraction workers import the main module, so run as a script this one hands over to main.py,
+    # which imports the app under its own name and skips it in the workers
+    import runpy
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py'), run_name='__main__')
+    raise SystemExit
 
 # Configure logging
 logging.basicConfig(
@@ -34,23 +57,79 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 db.init_app(app)
 
 # Initialize components
-llm_handler = LLMHandler()
-web_crawler = WebCrawler()
-content_analyzer = ContentAnalyzer()
-file_manager = FileManager()
+# Responses are cached on disk and calls throttled to stay inside the API quota
+llm_handler = LLMHandler(
+    cache_path=os.path.join(app.instance_path, 'llm_cache.db'),
+    max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 4)),
+    requests_per_minute=int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 60))
+)
+# Page extraction runs on worker processes started through a fork server; run the app via main.py
+extraction_pool = ExtractionPool(workers=int(os.environ.get("EXTRACTION_WORKERS", os.cpu_count() or 1)))
+web_crawler = WebCrawler(cache_dir=os.path.join(app.instance_path, 'http_cache'), extractor=extraction_pool)
+content_analyzer = ContentAnalyzer(
+    state_path=os.path.join(app.instance_path, 'relevance_vocabulary.json'),
+    topics=int(os.environ.get("SESSION_TOPICS", 8))
+)
+# The vocabulary is saved every few seconds while jobs run; keep the last changes on shutdown
+atexit.register(content_analyzer.scorer.flush)
+file_manager = FileManager(blob_dir=os.path.join(app.instance_path, 'blobs'))
+scrape_scheduler = ScrapeScheduler(max_workers=int(os.environ.get("SCRAPE_MAX_WORKERS", 8)))
+job_manager = JobManager(max_workers=int(os.environ.get("SCRAPE_MAX_JOBS", 2)))
+# Upper bound on the page budget a crawl job may ask for
+MAX_CRAWL_PAGES = int(os.environ.get("MAX_CRAWL_PAGES", 1000))
+CRAWL_CHECKPOINT_EVERY = 25
+# Job results are committed in batches: every PERSIST_BATCH_SIZE URLs or PERSIST_INTERVAL seconds
+PERSIST_BATCH_SIZE = int(os.environ.get("PERSIST_BATCH_SIZE", 20))
+PERSIST_INTERVAL = 2.0
+# Kept pages are analyzed in chunks of ANALYSIS_CHUNK_SIZE, or whatever arrived within ANALYSIS_INTERVAL seconds
+ANALYSIS_CHUNK_SIZE = int(os.environ.get("ANALYSIS_CHUNK_SIZE", 16))
+ANALYSIS_INTERVAL = 5.0
+# Each process refreshes the heartbeat of the jobs it runs; a job whose heartbeat is older than
+# JOB_HEARTBEAT_TIMEOUT seconds has lost its process and may be marked interrupted by any other
+JOB_HEARTBEAT_INTERVAL = 30.0
+JOB_HEARTBEAT_TIMEOUT = 120.0
+link_scorer = LinkScorer()
 
-# Message queue for SSE
-message_queues = {}
+# SimHash fingerprints of every page kept so far, across sessions; filled from the DB at startup
+near_duplicates = NearDuplicateIndex(max_distance=int(os.environ.get("NEAR_DUPLICATE_DISTANCE", 3)))
+
+# Full-text index of every kept page, next to the main DB; written off the scrape path
+search_index = SearchIndex(os.path.join(app.instance_path, 'search.db'))
+# Done pages checked against the search index per query at startup
+SEARCH_BACKFILL_BATCH = 500
+
+# Pub/sub broker for SSE; Redis lets several server processes publish to one client
+sse_broker = create_broker(os.environ.get("SSE_REDIS_URL"), buffer_size=500)
+
+# Frontiers of crawl jobs running now, for the queue depth gauge; entries vanish with their job
+active_frontiers = weakref.WeakValueDictionary()
+# Analysis sessions of running jobs, so their topics can be read while pages arrive
+active_analyses = weakref.WeakValueDictionary()
+
+metrics.gauge('scraper_jobs_active', 'Scrape jobs queued or running', callback=job_manager.active_count)
+metrics.gauge(
+    'scraper_frontier_urls', 'URLs queued in the frontiers of running crawl jobs',
+    callback=lambda: sum(len(frontier) for frontier in list(active_frontiers.values()))
+)
+metrics.gauge('search_index_queue_depth', 'Pages waiting to be written to the search index',
+              callback=lambda: search_index.stats()['queued'])
+metrics.gauge('sse_backlog_events', 'Buffered SSE events not yet delivered to their client',
+              callback=lambda: sum(sse_broker.backlog().values()))
+metrics.gauge('sse_clients', 'Clients with an SSE buffer', callback=lambda: len(sse_broker.backlog()))
+if web_crawler.http.cache is not None:
+    metrics.gauge('scraper_http_cache_bytes', 'Bytes held in the HTTP page cache',
+                  callback=lambda: web_crawler.http.cache.stats()['bytes'])
+if llm_handler.cache is not None:
+    metrics.gauge('llm_cache_entries', 'Responses held in the LLM cache',
+                  callback=lambda: llm_handler.cache.stats()['entries'])
 
 def send_sse_message(client_id, message, event_type='log', level='info'):
-    if client_id in message_queues:
-        message_queues[client_id].put({
-            'event': event_type,
-            'data': json.dumps({
-                'message': message,
-                'level': level
-            })
-        })
+    if not client_id:
+        return
+    sse_broker.publish(client_id, event_type, json.dumps({
+        'message': message,
+        'level': level
+    }))
 
 @app.route('/')
 def index():
@@ -59,27 +138,20 @@ def index():
 
 @app.route('/stream')
 def stream():
-    """SSE endpoint for real-time updates"""
-    def event_stream(client_id):
-        message_queues[client_id] = Queue()
-        try:
-            while True:
-                if client_id in message_queues:
-                    try:
-                        message = message_queues[client_id].get(timeout=30)
-                        yield f"event: {message['event']}\ndata: {message['data']}\n\n"
-                    except:
-                        yield f"event: ping\ndata: keepalive\n\n"
-                else:
-                    break
-                time.sleep(0.5)
-        finally:
-            if client_id in message_queues:
-                del message_queues[client_id]
+    """SSE endpoint for real-time updates, replaying missed events on reconnect"""
+    client_id = request.args.get('client_id') or request.headers.get('X-Client-Id') or uuid.uuid4().hex
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    def event_stream():
+        yield f"retry: 3000\nevent: hello\ndata: {json.dumps({'client_id': client_id})}\n\n"
+        for batch in sse_broker.stream(client_id, last_event_id):
+            if batch:
+                yield format_events(batch)
+            else:
+                yield "event: ping\ndata: keepalive\n\n"
 
-    client_id = request.headers.get('X-Client-Id', str(time.time()))
     return Response(
-        event_stream(client_id),
+        event_stream(),
         mimetype='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
@@ -91,7 +163,7 @@ def stream():
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat messages and return relevant websites"""
-    client_id = request.headers.get('X-Client-Id', str(time.time()))
+    client_id = request.headers.get('X-Client-Id')
     try:
         message = request.json.get('message')
         if not message:
@@ -117,7 +189,8 @@ def chat():
         
         return jsonify({
             'response': result['message'],
-            'websites': result['websites']
+            'websites': result['websites'],
+            'context': result.get('context', '')
         })
         
     except Exception as e:
@@ -132,19 +205,35 @@ def chat():
 
 @app.route('/api/scrape', methods=['POST'])
 def scrape():
-    """Handle website scraping requests"""
-    client_id = request.headers.get('X-Client-Id', str(time.time()))
+    """Queue a scraping job and return its id immediately"""
+    client_id = request.headers.get('X-Client-Id')
     
     try:
         websites = request.json.get('websites', [])
+        # Research topic and LLM context used for relevance scoring
+        query = request.json.get('query')
+        context = request.json.get('context')
         if not websites:
             logger.warning("No websites provided for scraping")
             return jsonify({
                 'error': 'No websites provided',
                 'details': 'At least one website URL is required'
             }), 400
+
+        # Crawl mode follows links from the given websites instead of scraping only them
+        crawl_options = None
+        if request.json.get('crawl'):
+            try:
+                crawl_options = _parse_crawl_options(request.json['crawl'])
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': 'Invalid crawl options', 'details': str(e)}), 400
+            if crawl_options['focused'] and not (query or context):
+                return jsonify({
+                    'error': 'Invalid crawl options',
+                    'details': 'A focused crawl needs a research query to score links against'
+                }), 400
             
-        logger.info(f"Starting scraping process for {len(websites)} websites")
+        logger.info(f"Queueing scraping job for {len(websites)} websites")
         send_sse_message(client_id, f"Starting to process {len(websites)} websites", 'log', 'info')
         
         # Create session directory
@@ -159,196 +248,964 @@ def scrape():
                 'error': 'Session initialization failed',
                 'details': str(e)
             }), 500
-            
-        analyzed_data = []
-        errors = []
+
+        # Persist the job and one row per URL so it can be resumed later
+        scraping_session = ScrapingSession(
+            topic=(query or '')[:200],
+            status='queued',
+            context=context,
+            client_id=client_id,
+            session_dir=session_dir,
+            crawl_options=crawl_options,
+            results={}
+        )
+        _claim_job(scraping_session)
+        db.session.add(scraping_session)
+        db.session.flush()
+        db.session.execute(insert(WebsiteData), [
+            {'session_id': scraping_session.id, 'url': url, 'position': position, 'depth': 0, 'status': 'pending'}
+            for position, url in enumerate(websites, 1)
+        ])
+        db.session.commit()
+
+        job_manager.submit(scraping_session.id, run_scrape_job)
         
-        total_websites = len(websites)
-        for index, url in enumerate(websites, 1):
-            try:
-                progress = (index - 1) / total_websites * 100
+        return jsonify({
+            'job_id': scraping_session.id,
+            'status': 'queued',
+            'session_dir': session_dir,
+            'total': len(websites)
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        error_msg = str(e)
+        logger.error(f"Scraping process failed: {error_msg}", exc_info=True)
+        send_sse_message(client_id, f"Fatal error: {error_msg}", 'log', 'error')
+        return jsonify({
+            'error': 'Scraping process failed',
+            'details': error_msg,
+            'type': type(e).__name__
+        }), 500
+
+def _parse_crawl_options(crawl):
+    """Validate crawl settings from a scrape request"""
+    if not isinstance(crawl, dict):
+        crawl = {}
+    allowed_domains = crawl.get('allowed_domains') or []
+    if isinstance(allowed_domains, str):
+        allowed_domains = allowed_domains.split(',')
+    return {
+        'max_depth': max(0, int(crawl.get('max_depth', 2))),
+        'max_pages': max(1, min(int(crawl.get('max_pages', 50)), MAX_CRAWL_PAGES)),
+        'same_domain': bool(crawl.get('same_domain', True)),
+        # Focused crawls fetch the links that look most on-topic first
+        'focused': bool(crawl.get('focused', False)),
+        'allowed_domains': [domain.strip() for domain in allowed_domains if domain.strip()]
+    }
+
+def _build_frontier(scraping_session, rows):
+    """Recreate a crawl job's frontier from its rows and last checkpoint"""
+    options = scraping_session.crawl_options
+    frontier_class = FocusedFrontier if options.get('focused') else CrawlFrontier
+    frontier = frontier_class(
+        max_depth=options['max_depth'],
+        max_pages=options['max_pages'],
+        same_domain=options['same_domain'],
+        allowed_domains=options['allowed_domains']
+    )
+    for row in rows:
+        if row.depth:
+            frontier.mark_seen(row.url)
+        else:
+            frontier.add_seed(row.url, queue=False)
+    # Every existing row, finished or about to be retried, counts against the budget
+    frontier.dispatched = len(rows)
+    for entry in (scraping_session.results or {}).get('frontier', []):
+        url, depth = entry[:2]
+        frontier.push(url, depth, priority=entry[2] if len(entry) > 2 else 0.0, check_rules=False)
+    return frontier
+
+def run_scrape_job(job_id, cancel_event):
+    """Scrape, save and analyze every unfinished URL of a job in the background"""
+    with app.app_context():
+        scraping_session = db.session.get(ScrapingSession, job_id)
+        client_id = scraping_session.client_id
+        session_dir = scraping_session.session_dir
+        query = scraping_session.topic or None
+        context = scraping_session.context
+
+        total_websites = WebsiteData.query.filter_by(session_id=job_id).count()
+        # Earlier results aren't needed here; leave their JSON unloaded
+        all_rows = (
+            WebsiteData.query
+            .filter_by(session_id=job_id)
+            .options(defer(WebsiteData.processed_data))
+            .order_by(WebsiteData.position)
+            .all()
+        )
+        pending_rows = (
+            WebsiteData.query
+            .filter_by(session_id=job_id)
+            .options(defer(WebsiteData.processed_data))
+            .filter(WebsiteData.status.in_(('pending', 'running')))
+            .order_by(WebsiteData.position)
+            .all()
+        )
+        rows_by_position = {row.position: row for row in pending_rows}
+        # Workers must not touch ORM rows; they only need the ids
+        row_ids = {row.position: row.id for row in pending_rows}
+        fingerprints = {}
+
+        frontier = None
+        if scraping_session.crawl_options:
+            frontier = _build_frontier(scraping_session, all_rows)
+            active_frontiers[job_id] = frontier
+            total_websites = max(total_websites, frontier.max_pages)
+            retry_rows = deque(pending_rows)
+            if scraping_session.crawl_options.get('focused'):
+                topic_vector = link_scorer.topic_vector(' '.join(part for part in (query, context) if part))
+            next_position = max((row.position for row in all_rows), default=0)
+
+        scraping_session.status = 'running'
+        db.session.commit()
+        logger.info(f"Job {job_id}: scraping {len(pending_rows)} of {total_websites} websites")
+
+        # Fetch robots.txt for every host up front so workers start with warm rules and crawl delays
+        web_crawler.prefetch_robots([row.url for row in pending_rows])
+
+        # Storage is tallied in memory and saved with the results; pick up where the last run stopped
+        file_manager.restore_storage_stats(session_dir, (scraping_session.results or {}).get('storage'))
+        image_session = ImageSession(
+            os.path.join(session_dir, 'images'),
+            store=file_manager.blobs,
+            owner=session_dir
+        )
+
+        def process_website(index, url):
+            """Fetch and save a single website; runs on a scheduler worker"""
+            # One trace per URL covers scraping and saving; analysis adds to it later
+            with tracer.trace(url):
+                return scrape_and_save(index, url)
+
+        def scrape_and_save(index, url):
+            if cancel_event.is_set():
+                raise ScrapeCancelled(url)
+
+            progress = (index - 1) / total_websites * 100
+            send_sse_message(
+                client_id,
+                f"Processing {url}",
+                'progress',
+                {'progress': progress, 'message': f"Scraping {url}"}
+            )
+            
+            logger.info(f"Scraping website: {url}")
+            
+            # Validate URL
+            if not web_crawler.is_valid_url(url):
+                raise ValueError(f"Invalid URL format: {url}")
+            
+            # Progress callback for the crawler
+            def progress_update(message, sub_progress):
+                current_progress = ((index - 1) * 100 + sub_progress) / total_websites
                 send_sse_message(
                     client_id,
-                    f"Processing {url}",
+                    message,
                     'progress',
-                    {'progress': progress, 'message': f"Scraping {url}"}
+                    {
+                        'progress': current_progress,
+                        'message': message,
+                        'url': url,
+                        'preview_html': None  # Will be updated with actual preview content
+                    }
                 )
-                
-                logger.info(f"Scraping website: {url}")
-                
-                # Validate URL
-                if not web_crawler.is_valid_url(url):
-                    raise ValueError(f"Invalid URL format: {url}")
-                
-                # Progress callback for the crawler
-                def progress_update(message, sub_progress):
-                    current_progress = ((index - 1) * 100 + sub_progress) / total_websites
-                    send_sse_message(
-                        client_id,
-                        message,
-                        'progress',
-                        {
-                            'progress': current_progress,
-                            'message': message,
-                            'url': url,
-                            'preview_html': None  # Will be updated with actual preview content
-                        }
-                    )
 
-                # Scrape website
-                content = web_crawler.scrape_website(url, progress_callback=progress_update)
-                if not content:
-                    error_msg = 'Failed to scrape content'
-                    errors.append({
+            def check_duplicate(text):
+                fingerprint = simhash(text)
+                if fingerprint is None:
+                    return None
+                fingerprints[index] = fingerprint
+                return near_duplicates.match_or_add(row_ids[index], fingerprint)
+
+            # Scrape website
+            content = web_crawler.scrape_website(
+                url,
+                progress_callback=progress_update,
+                image_session=image_session,
+                cancel_event=cancel_event,
+                duplicate_check=check_duplicate
+            )
+            if not content:
+                return None
+
+            # Near-duplicates are linked to the original instead of being stored again
+            if content.get('duplicate_of'):
+                return content
+
+            # Send preview of the content
+            if content.get('html'):
+                send_sse_message(
+                    client_id,
+                    f"Preview for {url}",
+                    'preview',
+                    {
                         'url': url,
-                        'error': error_msg,
-                        'type': 'content_extraction_error'
-                    })
-                    logger.error(f"Error scraping {url}: {error_msg}")
-                    send_sse_message(client_id, f"Failed to scrape {url}", 'log', 'error')
-                    continue
+                        'preview_html': content['html'][:1000]  # Send first 1000 chars as preview
+                    }
+                )
+            
+            # Save content in different formats
+            try:
+                # Save HTML content; identical pages are stored once across sessions
+                saved = file_manager.store_content(
+                    session_dir,
+                    f"content_{index}.html",
+                    content['html'],
+                    'html'
+                )
+                content['content_hash'] = saved['content_hash']
+                send_sse_message(
+                    client_id,
+                    f"Saved HTML content from {url}",
+                    'progress',
+                    {'progress': progress + 25, 'message': f"Saving HTML content from {url}"}
+                )
 
-                # Send preview of the content
-                if content.get('html'):
-                    send_sse_message(
-                        client_id,
-                        f"Preview for {url}",
-                        'preview',
-                        {
-                            'url': url,
-                            'preview_html': content['html'][:1000]  # Send first 1000 chars as preview
-                        }
-                    )
-                
-                # Save content in different formats
-                try:
-                    # Save HTML content
+                # Save text content
+                if content['text']:
                     file_manager.save_content(
                         session_dir,
-                        f"content_{index}.html",
-                        content['html'],
-                        'html'
+                        f"content_{index}.txt",
+                        content['text'],
+                        'text'
                     )
                     send_sse_message(
                         client_id,
-                        f"Saved HTML content from {url}",
+                        f"Saved text content from {url}",
                         'progress',
-                        {'progress': progress + 25, 'message': f"Saving HTML content from {url}"}
+                        {'progress': progress + 50, 'message': f"Saving text content from {url}"}
                     )
 
-                    # Save text content
-                    if content['text']:
-                        file_manager.save_content(
-                            session_dir,
-                            f"content_{index}.txt",
-                            content['text'],
-                            'text'
-                        )
-                        send_sse_message(
-                            client_id,
-                            f"Saved text content from {url}",
-                            'progress',
-                            {'progress': progress + 50, 'message': f"Saving text content from {url}"}
-                        )
-
-                    # Save images
-                    for img_idx, img in enumerate(content['images']):
-                        file_manager.save_content(
-                            session_dir,
-                            img['filename'],
-                            img['content'],
-                            'images'
-                        )
-                    if content['images']:
-                        send_sse_message(
-                            client_id,
-                            f"Saved {len(content['images'])} images from {url}",
-                            'progress',
-                            {'progress': progress + 75, 'message': f"Saving images from {url}"}
-                        )
-
-                except Exception as e:
-                    logger.error(f"Failed to save content for {url}: {str(e)}")
-                    send_sse_message(client_id, f"Failed to save content from {url}", 'log', 'error')
-                
-                # Analyze content
-                logger.info(f"Analyzing content from {url}")
-                result = content_analyzer.analyze_content([{
-                    'url': url,
-                    'content': content
-                }])
-                
-                if result:
-                    analyzed_data.extend(result)
+                # Images are streamed into the session by the crawler's image pipeline
+                if content['images']:
                     send_sse_message(
                         client_id,
-                        f"Successfully analyzed {url}",
-                        'log',
-                        'info'
+                        f"Saved {len(content['images'])} images from {url}",
+                        'progress',
+                        {'progress': progress + 75, 'message': f"Saving images from {url}"}
                     )
-                    
-            except ValueError as e:
-                error_msg = str(e)
-                errors.append({'url': url, 'error': error_msg, 'type': 'validation_error'})
-                logger.error(f"Validation error for {url}: {error_msg}")
-                send_sse_message(client_id, f"Error: {error_msg}", 'log', 'error')
-                
+
+            except Exception as e:
+                logger.error(f"Failed to save content for {url}: {str(e)}")
+                send_sse_message(client_id, f"Failed to save content from {url}", 'log', 'error')
+
+            return content
+
+        def next_page():
+            """Hand the crawl its next URL, creating its row; runs on this thread"""
+            nonlocal next_position
+            if retry_rows:
+                row = retry_rows.popleft()
+                return row.position, row.url
+            item = frontier.pop()
+            if item is None:
+                return None
+            url, depth = item
+            next_position += 1
+            row = WebsiteData(session_id=job_id, url=url, position=next_position, depth=depth, status='running')
+            db.session.add(row)
+            db.session.flush()
+            rows_by_position[row.position] = row
+            row_ids[row.position] = row.id
+            return row.position, url
+
+        def crawl_results():
+            """Results payload for a crawl, including the frontier so it can be resumed"""
+            return {
+                **(scraping_session.results or {}),
+                'frontier': frontier.snapshot(),
+                'crawl': {
+                    'discovered': len(frontier.seen),
+                    'dispatched': frontier.dispatched,
+                    'queued': len(frontier),
+                    'dropped': frontier.dropped
+                }
+            }
+
+        def record_error(row, error_msg, error_type):
+            row.status = 'failed'
+            row.error = error_msg
+            row.error_type = error_type
+            near_duplicates.discard(row.id)
+
+        def store_topics(topics):
+            """Write topics assigned after the fact into the results of pages already saved"""
+            by_url = dict(topics)
+            if not by_url:
+                return
+            for row in (
+                WebsiteData.query
+                .filter_by(session_id=job_id, status='done')
+                .filter(WebsiteData.url.in_(list(by_url)), WebsiteData.processed_data.isnot(None))
+            ):
+                row.processed_data = {**row.processed_data, 'topic': by_url[row.url]}
+
+        # One analysis session per run, so vocabulary, matrix and similarities are shared by all its pages
+        analysis = content_analyzer.session(query=query, context=context)
+        active_analyses[job_id] = analysis
+        # A resumed job's topics also cover the pages its earlier runs analyzed
+        earlier = (
+            db.session.query(WebsiteData.url, WebsiteData.processed_data)
+            .filter_by(session_id=job_id, status='done')
+            .filter(WebsiteData.processed_data.isnot(None))
+            .order_by(WebsiteData.position)
+            .yield_per(ANALYSIS_CHUNK_SIZE * 8)
+        )
+        batch = []
+        for url, processed_data in earlier:
+            batch.append((url, processed_data.get('processed_text') or ''))
+            if len(batch) >= ANALYSIS_CHUNK_SIZE * 8:
+                store_topics(analysis.include_earlier(batch))
+                batch = []
+        store_topics(analysis.include_earlier(batch))
+        store_topics(analysis.late_topics())
+
+        to_analyze = []
+        chunk_started = time.monotonic()
+
+        def analyze_pending():
+            """Analyze the buffered pages as one chunk, then finish their rows and queue their links"""
+            nonlocal chunk_started
+            chunk, to_analyze[:] = to_analyze[:], []
+            chunk_started = time.monotonic()
+            if not chunk:
+                return
+            try:
+                logger.info(f"Analyzing {len(chunk)} pages")
+                results = analysis.analyze([{'url': url, 'content': content} for _, _, url, content in chunk])
             except Exception as e:
                 error_msg = str(e)
-                errors.append({'url': url, 'error': error_msg, 'type': type(e).__name__})
-                logger.error(f"Error processing {url}: {error_msg}", exc_info=True)
+                logger.error(f"Error analyzing {len(chunk)} pages: {error_msg}", exc_info=True)
+                for _, row, url, _ in chunk:
+                    record_error(row, error_msg, type(e).__name__)
+                    send_sse_message(client_id, f"Error processing {url}: {error_msg}", 'log', 'error')
+                return
+
+            rows_by_url = defaultdict(list)
+            for index, row, url, content in chunk:
+                row.status = 'done'
+                row.content_hash = content.get('content_hash')
+                if index in fingerprints:
+                    row.fingerprint = f"{fingerprints[index]:016x}"
+                metadata = content.get('metadata') or {}
+                search_index.add(
+                    row.id, job_id, url,
+                    title=metadata.get('title'),
+                    description=metadata.get('description'),
+                    text=content.get('text')
+                )
+                rows_by_url[url].append(row)
+
+            for result in results:
+                row = rows_by_url[result['url']].pop(0)
+                row.processed_data = result
+                row.relevance_score = result['relevance_score']
                 send_sse_message(
                     client_id,
-                    f"Error processing {url}: {error_msg}",
+                    f"Successfully analyzed {result['url']}",
                     'log',
-                    'error'
+                    'info'
                 )
-                
-        if not analyzed_data and errors:
-            logger.error("All websites failed to process")
-            return jsonify({
-                'error': 'Content analysis failed',
-                'details': 'All websites failed to process',
-                'errors': errors
-            }), 500
-            
-        send_sse_message(
-            client_id,
-            "Scraping completed",
-            'progress',
-            {'progress': 100, 'status': 'complete'}
+            # Pages analyzed while the topics were being seeded have theirs now
+            store_topics(analysis.late_topics())
+
+            if frontier is not None:
+                for _, row, url, content in chunk:
+                    queue_links(row, url, content)
+
+        def queue_links(row, url, content):
+            """Queue the links of a kept page one level deeper"""
+            if content.get('canonical_url'):
+                frontier.mark_seen(content['canonical_url'])
+            links = content.get('link_contexts') or [{'url': link} for link in content.get('links') or []]
+            if isinstance(frontier, FocusedFrontier):
+                priorities = link_scorer.score(links, topic_vector, parent_score=row.relevance_score)
+            else:
+                priorities = [0.0] * len(links)
+            queued = sum(
+                frontier.push(link['url'], (row.depth or 0) + 1, priority=float(priority))
+                for link, priority in zip(links, priorities)
+            )
+            if queued:
+                logger.info(f"Queued {queued} links from {url} ({len(frontier)} in frontier)")
+
+        def analysis_due():
+            if not to_analyze:
+                return False
+            if len(to_analyze) >= ANALYSIS_CHUNK_SIZE or time.monotonic() - chunk_started >= ANALYSIS_INTERVAL:
+                return True
+            # A crawl about to run dry needs the links of the buffered pages now
+            return frontier is not None and not retry_rows and not len(frontier)
+
+        try:
+            # Fetching runs concurrently; analysis and DB writes stay on this thread
+            if frontier is not None:
+                results = scrape_scheduler.crawl(next_page, process_website, should_stop=cancel_event.is_set)
+            else:
+                results = scrape_scheduler.run(
+                    [row.url for row in pending_rows],
+                    process_website,
+                    indexes=[row.position for row in pending_rows],
+                    should_stop=cancel_event.is_set
+                )
+            last_commit = time.monotonic()
+            uncommitted = 0
+            for handled, (index, url, content, error) in enumerate(results, 1):
+                row = rows_by_position[index]
+
+                if isinstance(error, ScrapeCancelled):
+                    continue
+
+                if isinstance(error, ValueError):
+                    error_msg = str(error)
+                    record_error(row, error_msg, 'validation_error')
+                    logger.error(f"Validation error for {url}: {error_msg}")
+                    send_sse_message(client_id, f"Error: {error_msg}", 'log', 'error')
+
+                elif error is not None:
+                    error_msg = str(error)
+                    record_error(row, error_msg, type(error).__name__)
+                    logger.error(f"Error processing {url}: {error_msg}", exc_info=error)
+                    send_sse_message(
+                        client_id,
+                        f"Error processing {url}: {error_msg}",
+                        'log',
+                        'error'
+                    )
+
+                elif not content:
+                    error_msg = 'Failed to scrape content'
+                    record_error(row, error_msg, 'content_extraction_error')
+                    logger.error(f"Error scraping {url}: {error_msg}")
+                    send_sse_message(client_id, f"Failed to scrape {url}", 'log', 'error')
+
+                elif content.get('duplicate_of'):
+                    original_id, distance = content['duplicate_of']
+                    original = db.session.get(WebsiteData, original_id)
+                    row.status = 'duplicate'
+                    row.duplicate_of = original_id
+                    row.fingerprint = f"{fingerprints[index]:016x}"
+                    row.error = f"Near-duplicate of {original.url if original else original_id} ({distance} bits apart)"
+                    logger.info(f"Skipping {url}: {row.error}")
+                    send_sse_message(client_id, f"Skipped {url}: {row.error}", 'log', 'info')
+
+                else:
+                    # Analysis is batched; the row is finished when its chunk is analyzed
+                    to_analyze.append((index, row, url, content))
+
+                if analysis_due():
+                    analyze_pending()
+                if frontier is not None and handled % CRAWL_CHECKPOINT_EVERY == 0:
+                    scraping_session.results = crawl_results()
+
+                # One transaction per batch of URLs rather than per URL
+                uncommitted += 1
+                if uncommitted >= PERSIST_BATCH_SIZE or time.monotonic() - last_commit >= PERSIST_INTERVAL:
+                    scraping_session.results = {
+                        **(scraping_session.results or {}),
+                        'storage': file_manager.storage_stats(session_dir)
+                    }
+                    db.session.commit()
+                    last_commit = time.monotonic()
+                    uncommitted = 0
+
+            analyze_pending()
+            store_topics(analysis.late_topics(finished=True))
+            content_analyzer.scorer.flush()
+            db.session.commit()
+            stats = _job_stats(job_id)
+            crawl_unfinished = frontier is not None and len(frontier) and not frontier.exhausted
+            if cancel_event.is_set() and (stats['pending'] or crawl_unfinished):
+                scraping_session.status = 'cancelled'
+            elif not stats['successful'] and stats['failed']:
+                logger.error(f"Job {job_id}: all websites failed to process")
+                scraping_session.status = 'failed'
+            else:
+                scraping_session.status = 'completed'
+            storage = file_manager.storage_stats(session_dir)
+            scraping_session.results = {
+                **(crawl_results() if frontier is not None else {}),
+                'stats': stats,
+                'topics': analysis.topic_summary(),
+                'session_dir': session_dir,
+                'storage': storage
+            }
+            db.session.commit()
+
+            send_sse_message(
+                client_id,
+                f"Scraping {scraping_session.status}",
+                'progress',
+                {'progress': 100, 'status': 'complete', 'job_id': job_id, 'job_status': scraping_session.status}
+            )
+            logger.info(f"Job {job_id} {scraping_session.status}. Processed {stats['successful']} websites successfully")
+            logger.info(
+                f"Job {job_id} stored {storage['bytes']} bytes in {storage['files']} files, "
+                f"{storage['dedup_ratio']:.1%} deduplicated"
+            )
+
+        except Exception as e:
+            db.session.rollback()
+            error_msg = str(e)
+            logger.error(f"Scraping job {job_id} failed: {error_msg}", exc_info=True)
+            send_sse_message(client_id, f"Fatal error: {error_msg}", 'log', 'error')
+            scraping_session = db.session.get(ScrapingSession, job_id)
+            scraping_session.status = 'failed'
+            scraping_session.results = {
+                'error': error_msg,
+                'type': type(e).__name__,
+                'storage': file_manager.storage_stats(session_dir)
+            }
+            db.session.commit()
+        finally:
+            file_manager.forget_storage_stats(session_dir)
+
+def _process_owner():
+    """host:pid of this server process, as recorded in ScrapingSession.owner"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _claim_job(scraping_session):
+    """Record this process as running a job it is about to submit"""
+    scraping_session.owner = _process_owner()
+    scraping_session.heartbeat_at = datetime.utcnow()
+
+def _owner_gone(owner):
+    """Whether owner names a process on this host that no longer exists"""
+    host, _, pid = (owner or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+def _heartbeat_stale(scraping_session):
+    """Whether a job's owner stopped refreshing its heartbeat, or is known to be gone"""
+    stale_before = datetime.utcnow() - timedelta(seconds=JOB_HEARTBEAT_TIMEOUT)
+    return (
+        scraping_session.heartbeat_at is None
+        or scraping_session.heartbeat_at < stale_before
+        or _owner_gone(scraping_session.owner)
+    )
+
+def _running_elsewhere(scraping_session):
+    """Whether another live process is running a job"""
+    return (
+        scraping_session.status in ('queued', 'running')
+        and scraping_session.owner != _process_owner()
+        and not _heartbeat_stale(scraping_session)
+    )
+
+def _reclaim_stale_jobs(startup=False):
+    """Mark jobs whose process stopped heartbeating as interrupted, so they can be resumed
+
+    At startup a job recorded under this process's own host:pid was left
+    by an earlier process that happened to have the same pid.
+    """
+    stale = [
+        scraping_session
+        for scraping_session in ScrapingSession.query.filter(ScrapingSession.status.in_(('queued', 'running')))
+        if not job_manager.is_active(scraping_session.id) and (
+            _heartbeat_stale(scraping_session) or (startup and scraping_session.owner == _process_owner())
         )
-        
-        logger.info(f"Scraping completed. Processed {len(analyzed_data)} websites successfully")
-        
-        return jsonify({
-            'analyzed_data': analyzed_data,
-            'session_dir': session_dir,
-            'errors': errors,
-            'message': 'Scraping completed successfully',
+    ]
+    for scraping_session in stale:
+        scraping_session.status = 'interrupted'
+    db.session.commit()
+    if stale:
+        logger.info(f"Marked {len(stale)} unfinished jobs as interrupted")
+    return len(stale)
+
+def _job_heartbeat():
+    """Keep this process's jobs claimed and reclaim jobs whose process went away"""
+    while True:
+        time.sleep(JOB_HEARTBEAT_INTERVAL)
+        with app.app_context():
+            try:
+                active = job_manager.active_jobs()
+                if active:
+                    # Setting updated_at to itself stops onupdate from bumping it on every beat
+                    ScrapingSession.query.filter(ScrapingSession.id.in_(active)).update(
+                        {'heartbeat_at': datetime.utcnow(), 'updated_at': ScrapingSession.updated_at},
+                        synchronize_session=False
+                    )
+                    db.session.commit()
+                _reclaim_stale_jobs()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Job heartbeat failed: {str(e)}", exc_info=True)
+
+def _job_stats(job_id):
+    """Count a job's URLs by state"""
+    counts = dict(
+        db.session.query(WebsiteData.status, db.func.count(WebsiteData.id))
+        .filter(WebsiteData.session_id == job_id)
+        .group_by(WebsiteData.status)
+        .all()
+    )
+    total = sum(counts.values())
+    successful = (
+        WebsiteData.query
+        .filter_by(session_id=job_id, status='done')
+        .filter(WebsiteData.processed_data.isnot(None))
+        .count()
+    )
+    return {
+        'total': total,
+        'successful': successful,
+        'failed': counts.get('failed', 0),
+        'duplicates': counts.get('duplicate', 0),
+        'pending': counts.get('pending', 0) + counts.get('running', 0),
+        'processed': counts.get('done', 0) + counts.get('failed', 0) + counts.get('duplicate', 0)
+    }
+
+def _crawl_unfinished(scraping_session):
+    """Whether a crawl job still has queued links and page budget left"""
+    options = scraping_session.crawl_options
+    results = scraping_session.results or {}
+    if not options or not results.get('frontier'):
+        return False
+    return results.get('crawl', {}).get('dispatched', 0) < options['max_pages']
+
+def _job_payload(scraping_session):
+    stats = _job_stats(scraping_session.id)
+    # A crawl's total isn't known up front; measure progress against its page budget
+    expected = stats['total']
+    if scraping_session.crawl_options and scraping_session.status in ('queued', 'running'):
+        expected = max(expected, scraping_session.crawl_options['max_pages'])
+    return {
+        'job_id': scraping_session.id,
+        'topic': scraping_session.topic,
+        'status': scraping_session.status,
+        'mode': 'crawl' if scraping_session.crawl_options else 'list',
+        'active': job_manager.is_active(scraping_session.id),
+        'session_dir': scraping_session.session_dir,
+        'created_at': scraping_session.timestamp.isoformat() if scraping_session.timestamp else None,
+        'progress': stats['processed'] / expected * 100 if expected else 100,
+        'stats': stats,
+        'crawl': (scraping_session.results or {}).get('crawl') if scraping_session.crawl_options else None,
+        'storage': (scraping_session.results or {}).get('storage')
+    }
+
+@app.route('/api/jobs/<int:job_id>')
+def job_status(job_id):
+    """Get the status and progress of a scraping job"""
+    scraping_session = db.session.get(ScrapingSession, job_id)
+    if not scraping_session:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_payload(scraping_session))
+
+@app.route('/api/jobs/<int:job_id>/results')
+def job_results(job_id):
+    """Get the results gathered so far, in the same shape the scrape used to return"""
+    scraping_session = db.session.get(ScrapingSession, job_id)
+    if not scraping_session:
+        return jsonify({'error': 'Job not found'}), 404
+
+    rows = (
+        WebsiteData.query
+        .filter_by(session_id=job_id)
+        .filter(WebsiteData.status.in_(('done', 'failed', 'duplicate')))
+        .order_by(WebsiteData.position)
+        .all()
+    )
+    original_ids = {row.duplicate_of for row in rows if row.status == 'duplicate'}
+    originals = {
+        row.id: row for row in WebsiteData.query.filter(WebsiteData.id.in_(original_ids)).all()
+    } if original_ids else {}
+    payload = _job_payload(scraping_session)
+    payload.update({
+        'analyzed_data': [row.processed_data for row in rows if row.status == 'done' and row.processed_data],
+        'topics': (scraping_session.results or {}).get('topics', []),
+        'errors': [
+            {'url': row.url, 'error': row.error, 'type': row.error_type}
+            for row in rows if row.status == 'failed'
+        ],
+        'duplicates': [
+            {
+                'url': row.url,
+                'duplicate_of': originals[row.duplicate_of].url if row.duplicate_of in originals else None,
+                'original_session': originals[row.duplicate_of].session_id if row.duplicate_of in originals else None
+            }
+            for row in rows if row.status == 'duplicate'
+        ]
+    })
+    return jsonify(payload)
+
+@app.route('/api/jobs/<int:job_id>/topics')
+def job_topics(job_id):
+    """Topics the job's analyzed pages cluster into, updated live while the job runs"""
+    scraping_session = db.session.get(ScrapingSession, job_id)
+    if not scraping_session:
+        return jsonify({'error': 'Job not found'}), 404
+
+    analysis = active_analyses.get(job_id)
+    if analysis is not None:
+        topics = analysis.topic_summary()
+    else:
+        topics = (scraping_session.results or {}).get('topics', [])
+    return jsonify({
+        'job_id': job_id,
+        'status': scraping_session.status,
+        'pages': sum(topic['pages'] for topic in topics),
+        'topics': topics
+    })
+
+@app.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a running job; unfinished URLs stay pending for a later resume"""
+    scraping_session = db.session.get(ScrapingSession, job_id)
+    if not scraping_session:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if not job_manager.cancel(job_id):
+        return jsonify({'error': 'Job is not running', 'status': scraping_session.status}), 409
+
+    send_sse_message(scraping_session.client_id, f"Cancelling job {job_id}", 'log', 'info')
+    return jsonify({'job_id': job_id, 'status': 'cancelling'})
+
+@app.route('/api/jobs/<int:job_id>/resume', methods=['POST'])
+def resume_job(job_id):
+    """Resume an interrupted, cancelled or failed job from its unfinished URLs"""
+    scraping_session = db.session.get(ScrapingSession, job_id)
+    if not scraping_session:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if job_manager.is_active(job_id) or _running_elsewhere(scraping_session):
+        return jsonify({'error': 'Job is already running'}), 409
+
+    if _job_stats(job_id)['pending'] == 0 and not _crawl_unfinished(scraping_session):
+        return jsonify({'error': 'Job has no unfinished URLs', 'status': scraping_session.status}), 409
+
+    client_id = request.headers.get('X-Client-Id')
+    if client_id:
+        scraping_session.client_id = client_id
+    scraping_session.status = 'queued'
+    _claim_job(scraping_session)
+    db.session.commit()
+
+    job_manager.submit(job_id, run_scrape_job)
+    return jsonify({'job_id': job_id, 'status': 'queued'}), 202
+
+def _paging():
+    """offset/limit query arguments, clamped to a sane page size"""
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    return offset, limit
+
+def _page_summary(row):
+    """A result row without its analysis JSON"""
+    return {
+        'id': row.id,
+        'session_id': row.session_id,
+        'url': row.url,
+        'position': row.position,
+        'depth': row.depth,
+        'status': row.status,
+        'relevance_score': row.relevance_score,
+        'content_hash': row.content_hash,
+        'duplicate_of': row.duplicate_of,
+        'error': row.error,
+        'error_type': row.error_type
+    }
+
+@app.route('/api/jobs')
+def list_jobs():
+    """Page through past scraping sessions, newest first, without loading their results"""
+    offset, limit = _paging()
+    query = ScrapingSession.query
+    if request.args.get('status'):
+        query = query.filter(ScrapingSession.status == request.args['status'])
+    if request.args.get('topic'):
+        query = query.filter(ScrapingSession.topic.ilike(f"%{request.args['topic']}%"))
+
+    total = query.count()
+    sessions = (
+        query
+        .options(defer(ScrapingSession.results), defer(ScrapingSession.context))
+        .order_by(ScrapingSession.timestamp.desc(), ScrapingSession.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+    # Row counts for the whole page in one grouped query
+    counts = {}
+    if sessions:
+        for session_id, status, count in (
+            db.session.query(WebsiteData.session_id, WebsiteData.status, db.func.count(WebsiteData.id))
+            .filter(WebsiteData.session_id.in_([scraping_session.id for scraping_session in sessions]))
+            .group_by(WebsiteData.session_id, WebsiteData.status)
+        ):
+            counts.setdefault(session_id, {})[status] = count
+
+    jobs = []
+    for scraping_session in sessions:
+        by_status = counts.get(scraping_session.id, {})
+        jobs.append({
+            'job_id': scraping_session.id,
+            'topic': scraping_session.topic,
+            'status': scraping_session.status,
+            'mode': 'crawl' if scraping_session.crawl_options else 'list',
+            'active': job_manager.is_active(scraping_session.id),
+            'session_dir': scraping_session.session_dir,
+            'created_at': scraping_session.timestamp.isoformat() if scraping_session.timestamp else None,
+            'updated_at': scraping_session.updated_at.isoformat() if scraping_session.updated_at else None,
             'stats': {
-                'total': len(websites),
-                'successful': len(analyzed_data),
-                'failed': len(errors)
+                'total': sum(by_status.values()),
+                'done': by_status.get('done', 0),
+                'failed': by_status.get('failed', 0),
+                'duplicates': by_status.get('duplicate', 0),
+                'pending': by_status.get('pending', 0) + by_status.get('running', 0)
             }
         })
-        
+    return jsonify({'total': total, 'offset': offset, 'limit': limit, 'jobs': jobs})
+
+@app.route('/api/jobs/<int:job_id>/pages')
+def job_pages(job_id):
+    """Page through a job's URLs, optionally by status or best relevance first"""
+    if not db.session.get(ScrapingSession, job_id, options=[defer(ScrapingSession.results)]):
+        return jsonify({'error': 'Job not found'}), 404
+
+    offset, limit = _paging()
+    query = WebsiteData.query.filter_by(session_id=job_id).options(defer(WebsiteData.processed_data))
+    if request.args.get('status'):
+        query = query.filter(WebsiteData.status == request.args['status'])
+    min_score = request.args.get('min_score', type=float)
+    if min_score is not None:
+        query = query.filter(WebsiteData.relevance_score >= min_score)
+
+    if request.args.get('order') == 'relevance':
+        query = query.order_by(WebsiteData.relevance_score.desc().nullslast(), WebsiteData.position)
+    else:
+        query = query.order_by(WebsiteData.position)
+
+    total = query.count()
+    rows = query.offset(offset).limit(limit).all()
+    return jsonify({
+        'job_id': job_id,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'pages': [_page_summary(row) for row in rows]
+    })
+
+@app.route('/api/pages')
+def find_pages():
+    """Look up a URL or content hash across every past job, newest first"""
+    url = request.args.get('url')
+    content_hash = request.args.get('content_hash')
+    if not url and not content_hash:
+        return jsonify({'error': 'Provide url or content_hash'}), 400
+
+    offset, limit = _paging()
+    query = WebsiteData.query.options(defer(WebsiteData.processed_data))
+    if url:
+        query = query.filter(WebsiteData.url == url)
+    if content_hash:
+        query = query.filter(WebsiteData.content_hash == content_hash)
+
+    total = query.count()
+    rows = query.order_by(WebsiteData.id.desc()).offset(offset).limit(limit).all()
+    return jsonify({
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'pages': [_page_summary(row) for row in rows]
+    })
+
+def _search_time(name):
+    """A since/until search argument as a unix timestamp; accepts ISO dates or epoch seconds"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+@app.route('/api/search')
+def search():
+    """Full-text search over every scraped page, best matches first"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query', 'details': 'Pass the search terms as q'}), 400
+    try:
+        since, until = _search_time('since'), _search_time('until')
+    except ValueError as e:
+        return jsonify({'error': 'Invalid date filter', 'details': str(e)}), 400
+
+    offset, limit = _paging()
+    try:
+        found = search_index.search(
+            query,
+            session_id=request.args.get('session_id', type=int),
+            domain=request.args.get('domain'),
+            since=since,
+            until=until,
+            offset=offset,
+            limit=min(limit, 100)
+        )
     except Exception as e:
-        error_msg = str(e)
-        logger.error(f"Scraping process failed: {error_msg}", exc_info=True)
-        send_sse_message(client_id, f"Fatal error: {error_msg}", 'log', 'error')
-        return jsonify({
-            'error': 'Scraping process failed',
-            'details': error_msg,
-            'type': type(e).__name__
-        }), 500
+        logger.error(f"Search failed for {query!r}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Search failed', 'details': str(e)}), 500
+    return jsonify({'query': query, 'offset': offset, 'limit': min(limit, 100), **found})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Counters, gauges and stage latency histograms in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/trace')
+def url_trace():
+    """Where the time went for one recently processed URL"""
+    url = request.args.get('url')
+    if not url:
+        return jsonify({'error': 'Missing url'}), 400
+    trace = tracer.get(url)
+    if trace is None:
+        return jsonify({'error': 'No trace for this URL', 'details': 'Only recently processed URLs are kept'}), 404
+    return jsonify(trace)
+
 
 @app.route('/api/folder-structure')
 def get_folder_structure():
-    """Get the current folder structure"""
+    """Get one level of the folder structure
+
+    ?path= selects the directory (the data folder by default) and
+    ?offset=/&limit= page through large directories. Responses carry an ETag
+    so unchanged listings come back as 304 Not Modified.
+    """
     try:
-        structure = file_manager.get_folder_structure()
-        return jsonify(structure)
+        try:
+            offset = max(0, int(request.args.get('offset', 0)))
+            limit = min(1000, max(1, int(request.args.get('limit', 200))))
+        except ValueError:
+            return jsonify({'error': 'offset and limit must be integers'}), 400
+
+        structure = file_manager.get_folder_structure(request.args.get('path', ''), offset, limit)
+        response = jsonify(structure)
+        response.set_etag(structure['etag'])
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except ValueError:
+        return jsonify({'error': 'Invalid folder path'}), 403
+    except (FileNotFoundError, NotADirectoryError):
+        return jsonify({'error': 'Folder not found'}), 404
     except Exception as e:
         logger.error(f"Failed to get folder structure: {str(e)}", exc_info=True)
         return jsonify({
@@ -377,40 +1234,176 @@ def download_file():
         logger.error(f"File download failed: {str(e)}", exc_info=True)
         return jsonify({'error': 'Download failed', 'details': str(e)}), 500
 
+def _resolve_folder(folder_path):
+    """Map a requested folder to an absolute path inside the data directory, or an error response"""
+    if not folder_path:
+        return None, (jsonify({'error': 'No folder path provided'}), 400)
+        
+    # Ensure the folder is within the data directory
+    abs_path = os.path.abspath(os.path.join(file_manager.base_dir, folder_path))
+    if not abs_path.startswith(file_manager.base_dir):
+        return None, (jsonify({'error': 'Invalid folder path'}), 403)
+        
+    if not os.path.isdir(abs_path):
+        return None, (jsonify({'error': 'Folder not found'}), 404)
+    return abs_path, None
+
+def _include_patterns():
+    """Subset of the folder to archive, e.g. ?include=text or ?include=images/*.png,text"""
+    patterns = []
+    for value in request.args.getlist('include'):
+        patterns.extend(part for part in value.split(',') if part.strip())
+    return patterns or None
+
+@app.route('/api/download-folder/manifest')
+def download_folder_manifest():
+    """Describe the resumable ZIP for a folder: entries, total size and ETag"""
+    try:
+        abs_path, error = _resolve_folder(request.args.get('path'))
+        if error:
+            return error
+
+        layout = StoredZipLayout(build_manifest(abs_path, _include_patterns(), with_crc=True))
+        return jsonify({
+            'etag': layout.etag,
+            'total_size': layout.total_size,
+            'entries': [
+                {'name': entry['arcname'], 'size': entry['size'], 'crc32': entry['crc32']}
+                for entry in layout.entries
+            ]
+        })
+    except ValueError as e:
+        return jsonify({'error': 'Folder too large for a resumable download', 'details': str(e)}), 413
+    except Exception as e:
+        logger.error(f"Folder manifest failed: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Manifest failed', 'details': str(e)}), 500
+
 @app.route('/api/download-folder')
 def download_folder():
-    """Download a folder as ZIP"""
+    """Download a folder as a ZIP generated on the fly
+
+    By default entries are deflated, except already-compressed images. With
+    ?resumable=1 (or a Range header) every entry is stored so the archive has a
+    fixed layout and byte ranges can be resumed.
+    """
     try:
         folder_path = request.args.get('path')
-        if not folder_path:
-            return jsonify({'error': 'No folder path provided'}), 400
-            
-        # Ensure the folder is within the data directory
-        abs_path = os.path.abspath(os.path.join(file_manager.base_dir, folder_path))
-        if not abs_path.startswith(file_manager.base_dir):
-            return jsonify({'error': 'Invalid folder path'}), 403
-            
-        if not os.path.isdir(abs_path):
-            return jsonify({'error': 'Folder not found'}), 404
-            
-        # Create a temporary file for the ZIP
-        temp_file = os.path.join(file_manager.base_dir, f'temp_{int(time.time())}.zip')
+        abs_path, error = _resolve_folder(folder_path)
+        if error:
+            return error
+
+        include = _include_patterns()
+        download_name = f"{os.path.basename(abs_path.rstrip(os.sep))}.zip"
+        headers = {'Content-Disposition': f'attachment; filename="{download_name}"'}
+
+        resumable = request.args.get('resumable') == '1' or 'Range' in request.headers
+        if not resumable:
+            return Response(
+                stream_zip(build_manifest(abs_path, include)),
+                mimetype='application/zip',
+                headers=headers,
+                direct_passthrough=True
+            )
+
         try:
-            shutil.make_archive(temp_file[:-4], 'zip', abs_path)
-            return send_file(temp_file, as_attachment=True, download_name=f"{os.path.basename(folder_path)}.zip")
-        finally:
-            # Clean up temp file in background
-            def cleanup():
-                time.sleep(1)  # Wait for file to be sent
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-            Thread(target=cleanup).start()
+            layout = StoredZipLayout(build_manifest(abs_path, include, with_crc=True))
+        except ValueError:
+            logger.warning(f"{folder_path} is too large for a resumable ZIP, streaming instead")
+            return Response(
+                stream_zip(build_manifest(abs_path, include)),
+                mimetype='application/zip',
+                headers=headers,
+                direct_passthrough=True
+            )
+
+        headers.update({'Accept-Ranges': 'bytes', 'ETag': f'"{layout.etag}"'})
+        start, stop, status = 0, layout.total_size, 200
+
+        # Only honour the range if the archive is unchanged since the client started
+        if_range = request.headers.get('If-Range')
+        if request.range and (not if_range or if_range.strip('"') == layout.etag):
+            byte_range = request.range.range_for_length(layout.total_size)
+            if byte_range is None:
+                return Response(status=416, headers={'Content-Range': f'bytes */{layout.total_size}'})
+            start, stop = byte_range
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{stop - 1}/{layout.total_size}'
+
+        headers['Content-Length'] = str(stop - start)
+        return Response(
+            layout.iter_range(start, stop),
+            status=status,
+            mimetype='application/zip',
+            headers=headers,
+            direct_passthrough=True
+        )
     except Exception as e:
         logger.error(f"Folder download failed: {str(e)}", exc_info=True)
         return jsonify({'error': 'Download failed', 'details': str(e)}), 500
+
+def _backfill_search_index():
+    """Queue every done page the search index doesn't have"""
+    with app.app_context():
+        backfilled = 0
+        done_ids = (
+            db.session.query(WebsiteData.id)
+            .filter(WebsiteData.status == 'done')
+            .order_by(WebsiteData.id)
+            .yield_per(SEARCH_BACKFILL_BATCH)
+        )
+        batch = []
+        for (row_id,) in done_ids:
+            batch.append(row_id)
+            if len(batch) >= SEARCH_BACKFILL_BATCH:
+                backfilled += _backfill_pages(search_index.missing(batch))
+                batch = []
+        backfilled += _backfill_pages(search_index.missing(batch))
+        if backfilled:
+            logger.info(f"Queued {backfilled} saved pages for the search index")
+
+def _backfill_pages(row_ids):
+    if not row_ids:
+        return 0
+    for row, scraped_at in (
+        db.session.query(WebsiteData, ScrapingSession.timestamp)
+        .join(ScrapingSession, ScrapingSession.id == WebsiteData.session_id)
+        .filter(WebsiteData.id.in_(row_ids))
+    ):
+        data = row.processed_data or {}
+        metadata = data.get('metadata') or {}
+        search_index.add(
+            row.id, row.session_id, row.url,
+            title=metadata.get('title'),
+            description=metadata.get('description'),
+            text=data.get('processed_text'),
+            # Session timestamps are naive UTC; without a zone .timestamp() would read them as local time
+            scraped_at=scraped_at.replace(tzinfo=timezone.utc).timestamp() if scraped_at else None,
+            block=True
+        )
+    db.session.expunge_all()
+    return len(row_ids)
+
 with app.app_context():
     import models
+    from models import ScrapingSession, WebsiteData
+    models.configure_sqlite(db.engine)
     db.create_all()
+    models.ensure_columns()
+    models.ensure_indexes()
 
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Jobs left by a process that is gone can't still be running; mark them resumable. Jobs other
+    # live server processes are running keep their status, and the heartbeat thread reclaims
+    # them if those processes stop
+    _reclaim_stale_jobs(startup=True)
+    threading.Thread(target=_job_heartbeat, name='job-heartbeat', daemon=True).start()
+
+    # Rebuild the near-duplicate index from the pages already kept
+    for row_id, fingerprint in (
+        db.session.query(WebsiteData.id, WebsiteData.fingerprint)
+        .filter(WebsiteData.status == 'done', WebsiteData.fingerprint.isnot(None))
+    ):
+        near_duplicates.add(row_id, int(fingerprint, 16))
+    logger.info(f"Loaded {len(near_duplicates)} page fingerprints for near-duplicate detection")
+
+    # Index pages saved before the search index existed, or lost from its queue on shutdown
+    threading.Thread(target=_backfill_search_index, name='search-backfill', daemon=True).start()
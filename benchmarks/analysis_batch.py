@@ -0,0 +1,103 @@
+"""Per-page analysis cost against chunk size and session size
+
+Runs synthetic pages through one ContentAnalyzer session per run, a chunk
+at a time, with the relevance vocabulary persisted to a temporary file as
+the app does. Pages are parsed before the timings start, so only the
+analysis itself is measured: vectorizing, scoring, keywords and
+similarities. A chunk size of 1 is the old one-page-per-call behaviour:
+
+    python benchmarks/analysis_batch.py --chunks 1,16,64 --sessions 100,400
+
+Across session sizes of 64 to 2048 pages, ms/page no longer grows with the
+session. With chunks of 16, it is about 1.1-1.3 ms/page and then about 1.0
+at 2048 pages. Before topic centroid updates were amortized, it rose from
+1.3 to 2.5. What remains is per-page work (text extraction and
+tokenizing), so ms/page levels off rather than falling towards zero.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.crawl_suite import QUERY, git_commit  # noqa: E402
+from scraper.content_analyzer import ContentAnalyzer  # noqa: E402
+from scraper.document import ParsedDocument  # noqa: E402
+
+TOPICS = (
+    'astrology zodiac horoscope planets signs moon',
+    'python scraping html parser requests crawler',
+    'cooking pasta tomato basil garlic olive',
+    'football league goal match season player',
+)
+
+
+def synthetic_pages(rng, count, words):
+    """Pages drawn mostly from one topic's words plus a long tail of rarer ones"""
+    pages = []
+    for index in range(count):
+        topic = TOPICS[index % len(TOPICS)].split()
+        text = ' '.join(
+            rng.choice(topic) if rng.random() < 0.3 else f"term{int(rng.paretovariate(1.2)) % 20000}"
+            for _ in range(words)
+        )
+        url = f"http://bench.local/{index}"
+        document = ParsedDocument(f"<html><body><p>{text}</p></body></html>", url)
+        pages.append({'url': url, 'content': {'document': document, 'metadata': {'title': url}}})
+    return pages
+
+
+def run(pages, chunk, work_dir):
+    state_path = os.path.join(work_dir, f"vocabulary_{chunk}_{len(pages)}.json")
+    analysis = ContentAnalyzer(state_path=state_path).session(query=QUERY)
+    started = time.perf_counter()
+    kept = 0
+    for offset in range(0, len(pages), chunk):
+        kept += len(analysis.analyze(pages[offset:offset + chunk]))
+    elapsed = time.perf_counter() - started
+    return {
+        'chunk': chunk,
+        'pages': len(pages),
+        'kept': kept,
+        'seconds': round(elapsed, 3),
+        'ms_per_page': round(elapsed / len(pages) * 1000, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', default='1,4,16,64', help='comma-separated chunk sizes')
+    parser.add_argument('--sessions', default='64,256,1024', help='comma-separated session sizes in pages')
+    parser.add_argument('--words', type=int, default=600, help='words per page')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.ERROR)
+
+    chunks = [int(chunk) for chunk in args.chunks.split(',')]
+    sessions = [int(size) for size in args.sessions.split(',')]
+    rng = random.Random(args.seed)
+    pages = synthetic_pages(rng, max(sessions), args.words)
+
+    with tempfile.TemporaryDirectory(prefix='analysis-bench-') as work_dir:
+        # Untimed, so the first run doesn't also pay for lazy imports and first-call setup
+        run(pages[:min(sessions)], chunks[0], work_dir)
+        runs = [run(pages[:size], chunk, work_dir) for size in sessions for chunk in chunks]
+
+    if args.json:
+        print(json.dumps({'git_commit': git_commit(), 'words': args.words, 'runs': runs}, indent=2))
+        return
+    print(f"  {'pages':>7}{'chunk':>7}{'seconds':>10}{'ms/page':>10}")
+    for result in runs:
+        print(f"  {result['pages']:>7}{result['chunk']:>7}{result['seconds']:>10.3f}{result['ms_per_page']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
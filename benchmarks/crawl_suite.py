@@ -0,0 +1,467 @@
+"""End-to-end crawler benchmark against a local fixture server
+
+Serves fixture sites over HTTP on localhost: the pages recorded under
+data/ (their off-site images rewritten to local routes), synthetic large article pages, image-heavy pages and text-less
+thumbnail pages that trafilatura rejects, so the BeautifulSoup fallback
+runs. Each page goes through the same steps as a scrape job:
+WebCrawler.scrape_website with extraction on --extract-workers
+processes, saving HTML and text through FileManager, then analysis in
+chunks of --analysis-chunk pages of one ContentAnalyzer session.
+
+Reports pages/sec, latency percentiles per stage (fetch, extract,
+trafilatura, fallback, images, analysis, save) and peak RSS. Runs write
+JSON that a later run can be compared against:
+
+    python benchmarks/crawl_suite.py --output before.json
+    python benchmarks/crawl_suite.py --compare before.json
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from scraper.web_crawler import WebCrawler  # noqa: E402
+from scraper.extraction import ExtractionPool  # noqa: E402
+from scraper.content_analyzer import ContentAnalyzer  # noqa: E402
+from scraper.image_pipeline import ImageSession  # noqa: E402
+from scraper.scheduler import ScrapeScheduler  # noqa: E402
+from utils.file_manager import FileManager  # noqa: E402
+
+FIXTURE_SETS = ('recorded', 'large', 'images', 'fallback')
+STAGES = ('page', 'fetch', 'extract', 'trafilatura', 'fallback', 'images', 'save', 'analysis')
+QUERY = 'astrology zodiac horoscope planets'
+WORDS = (
+    'astrology zodiac horoscope planets natal chart signs retrograde moon garden soil compost '
+    'seeds bicycle gears route bread sourdough oven flour stocks bonds portfolio telescope galaxy '
+    'the and of to in that is for with as on by at from this be are was it an or'
+).split()
+
+
+# --- fixtures ---------------------------------------------------------------
+
+# Absolute and protocol-relative URLs in src/srcset of recorded pages, rewritten to local routes
+SOURCE_ATTRIBUTE = re.compile(rb'\b(src|srcset)=(["\'])(.*?)\2', re.S | re.I)
+ABSOLUTE_URL = re.compile(rb'(?:https?:)?//([^\s"\',?#]+)[^\s"\',]*', re.I)
+
+
+def localize_sources(body):
+    """Point every off-host src/srcset URL at /remote/<host>/<path>, returning the body and those paths
+
+    The pages recorded under data/ reference images on their original
+    sites; served as-is, the image stage would time real network requests.
+    """
+    paths = set()
+
+    def local_url(match):
+        path = b'/remote/' + match.group(1)
+        paths.add(path.decode('utf-8', 'replace'))
+        return path
+
+    def rewrite(match):
+        return match.group(1) + b'=' + match.group(2) + ABSOLUTE_URL.sub(local_url, match.group(3)) + match.group(2)
+
+    return SOURCE_ATTRIBUTE.sub(rewrite, body), paths
+
+
+def recorded_pages():
+    """Pages saved by earlier scrapes under data/, keyed by their fixture path"""
+    pages = {}
+    data_dir = os.path.join(REPO_DIR, 'data')
+    for root, _, files in os.walk(data_dir):
+        for name in sorted(files):
+            if name.endswith('.html'):
+                path = os.path.join(root, name)
+                site = os.path.relpath(path, data_dir).split(os.sep)[1]
+                with open(path, 'rb') as f:
+                    pages[f"/recorded/{site}/{name}"] = f.read()
+    return pages
+
+
+def paragraphs(rng, count, words=80):
+    return ''.join(f"<p>{' '.join(rng.choice(WORDS) for _ in range(words))}.</p>" for _ in range(count))
+
+
+def chrome(rng):
+    """Navigation and footer boilerplate that extraction has to strip"""
+    nav = ''.join(f'<li><a href="/nav/{i}.html">Section {i}</a></li>' for i in range(40))
+    return f"<nav><ul>{nav}</ul></nav>", f"<footer>{paragraphs(rng, 2, 20)}</footer>"
+
+
+def large_page(rng, index, size_kb):
+    nav, footer = chrome(rng)
+    body = paragraphs(rng, max(1, size_kb * 1024 // 560))
+    return (
+        f"<html><head><title>Large article {index}</title>"
+        f"<meta name='description' content='Synthetic long read {index}'></head>"
+        f"<body>{nav}<article><h1>Large article {index}</h1>{body}</article>{footer}</body></html>"
+    ).encode('utf-8')
+
+
+def image_page(rng, index, image_paths):
+    nav, footer = chrome(rng)
+    figures = ''.join(
+        f'<figure><img src="{path}" alt="figure {i}" width="400"><figcaption>{paragraphs(rng, 1, 15)}</figcaption></figure>'
+        for i, path in enumerate(image_paths)
+    )
+    return (
+        f"<html><head><title>Gallery {index}</title></head>"
+        f"<body>{nav}<article><h1>Gallery {index}</h1>{paragraphs(rng, 4)}{figures}</article>{footer}</body></html>"
+    ).encode('utf-8')
+
+
+def fallback_page(index, image_paths):
+    """A thumbnail grid with no text at all, which trafilatura declines to extract"""
+    cells = ''.join(f'<td><img src="{path}" alt=""></td>' for path in image_paths)
+    return (
+        f"<html><head><title>Thumbnails {index}</title></head>"
+        f"<body><div id='content'><table><tr>{cells}</tr></table></div></body></html>"
+    ).encode('utf-8')
+
+
+def image_bytes(rng, index):
+    size = rng.choice((64, 160, 320, 640))
+    pixels = np.random.default_rng(index).integers(0, 255, (size, size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    if index % 2:
+        Image.fromarray(pixels).save(buffer, format='JPEG', quality=80)
+        return 'image/jpeg', buffer.getvalue()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    return 'image/png', buffer.getvalue()
+
+
+def build_fixtures(sets, large_pages, large_kb, image_pages, images_per_page, fallback_pages, seed):
+    """Return ({path: (content_type, body)}, [(fixture_set, path)]) for the chosen sets"""
+    rng = random.Random(seed)
+    routes = {'/robots.txt': ('text/plain', b'User-agent: *\nAllow: /\n')}
+    pages = []
+
+    def add_page(fixture_set, path, body):
+        routes[path] = ('text/html; charset=utf-8', body)
+        pages.append((fixture_set, path))
+
+    if 'recorded' in sets:
+        for path, body in recorded_pages().items():
+            body, remote_paths = localize_sources(body)
+            for remote_path in sorted(remote_paths):
+                if remote_path not in routes:
+                    # Own generator, so the other fixture sets stay the same for a given seed
+                    routes[remote_path] = image_bytes(random.Random(remote_path), len(routes))
+            add_page('recorded', path, body)
+    if 'large' in sets:
+        for i in range(large_pages):
+            add_page('large', f"/large/{i}.html", large_page(rng, i, large_kb))
+
+    def add_images(prefix, count):
+        paths = []
+        for j in range(count):
+            content_type, body = image_bytes(rng, len(routes))
+            path = f"{prefix}/{j}.{content_type.split('/')[1]}"
+            routes[path] = (content_type, body)
+            paths.append(path)
+        return paths
+
+    if 'images' in sets:
+        for i in range(image_pages):
+            add_page('images', f"/gallery/{i}.html", image_page(rng, i, add_images(f"/img/{i}", images_per_page)))
+    if 'fallback' in sets:
+        for i in range(fallback_pages):
+            add_page('fallback', f"/thumbnails/{i}.html", fallback_page(i, add_images(f"/thumbs/{i}", 6)))
+    return routes, pages
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    routes = {}
+
+    def do_GET(self):
+        route = self.routes.get(self.path.split('?', 1)[0])
+        if route is None:
+            self.send_error(404)
+            return
+        content_type, body = route
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(routes):
+    FixtureHandler.routes = routes
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- measurement ------------------------------------------------------------
+
+class StageTimer:
+    """Collects wall-clock durations per stage from any thread"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def timed(self, stage, function):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        return wrapper
+
+    def summary(self):
+        result = {}
+        for stage in STAGES:
+            samples = np.array(self.samples.get(stage, [])) * 1000
+            if not len(samples):
+                result[stage] = {'count': 0}
+                continue
+            p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+            result[stage] = {
+                'count': int(len(samples)),
+                'mean_ms': round(float(samples.mean()), 3),
+                'p50_ms': round(float(p50), 3),
+                'p90_ms': round(float(p90), 3),
+                'p99_ms': round(float(p99), 3),
+                'max_ms': round(float(samples.max()), 3),
+                'total_s': round(float(samples.sum()) / 1000, 3)
+            }
+        return result
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def instrument(crawler, timer):
+    """Time the crawler's stages by wrapping the calls it makes
+
+    trafilatura and the fallback may run in extraction workers, so their
+    durations come from the timings each extracted page carries back.
+    """
+    crawler.http.fetch_body = timer.timed('fetch', crawler.http.fetch_body)
+    crawler.image_pipeline.fetch_images = timer.timed('images', crawler.image_pipeline.fetch_images)
+    extract = timer.timed('extract', crawler.extractor.extract)
+
+    def timed_extract(*args, **kwargs):
+        page = extract(*args, **kwargs)
+        for stage, _, seconds in page.timings:
+            if stage in STAGES:
+                timer.record(stage, seconds)
+        return page
+    crawler.extractor.extract = timed_extract
+
+
+def run(pages, base_url, workers, extract_workers, analysis_chunk, repeat, work_dir):
+    timer = StageTimer()
+    crawler = WebCrawler(extractor=ExtractionPool(workers=extract_workers))
+    crawler.host_limiter.delay = 0  # One local host; politeness delays would only measure sleep
+    instrument(crawler, timer)
+    analyzer = ContentAnalyzer()
+    os.chdir(work_dir)
+    file_manager = FileManager(blob_dir=os.path.join(work_dir, 'blobs'))
+    scheduler = ScrapeScheduler(max_workers=workers)
+
+    urls = [base_url + path for _, path in pages] * repeat
+    fixture_of = {base_url + path: fixture_set for fixture_set, path in pages}
+    outcomes = defaultdict(lambda: {'pages': 0, 'failed': 0})
+
+    session_dir = file_manager.create_session_directory()
+    image_session = ImageSession(
+        os.path.join(session_dir, 'images'),
+        max_images=len(urls) * 40,
+        max_bytes=4 * 1024 ** 3,
+        store=file_manager.blobs,
+        owner=session_dir
+    )
+
+    def scrape(index, url):
+        started = time.perf_counter()
+        content = crawler.scrape_website(url, image_session=image_session)
+        if content:
+            save_started = time.perf_counter()
+            saved = file_manager.store_content(session_dir, f"content_{index}.html", content['html'], 'html')
+            content['content_hash'] = saved['content_hash']
+            if content['text']:
+                file_manager.save_content(session_dir, f"content_{index}.txt", content['text'], 'text')
+            timer.record('save', time.perf_counter() - save_started)
+        timer.record('page', time.perf_counter() - started)
+        return content
+
+    analysis = analyzer.session(query=QUERY)
+    to_analyze = []
+
+    def analyze_pending():
+        if not to_analyze:
+            return
+        analysis_started = time.perf_counter()
+        analysis.analyze(to_analyze)
+        # Recorded per page, so chunk sizes compare directly
+        per_page = (time.perf_counter() - analysis_started) / len(to_analyze)
+        for _ in to_analyze:
+            timer.record('analysis', per_page)
+        to_analyze.clear()
+
+    started = time.perf_counter()
+    # Like a scrape job: fetching on the pool, analysis on this thread in chunks as results arrive
+    for index, url, content, error in scheduler.run(urls, scrape):
+        outcome = outcomes[fixture_of[url]]
+        outcome['pages'] += 1
+        if error is not None or not content:
+            outcome['failed'] += 1
+            continue
+        to_analyze.append({'url': url, 'content': content})
+        if len(to_analyze) >= analysis_chunk:
+            analyze_pending()
+    analyze_pending()
+    elapsed = time.perf_counter() - started
+
+    crawler.http.close()
+    crawler.extractor.close()
+    total = sum(outcome['pages'] for outcome in outcomes.values())
+    return {
+        'pages': total,
+        'failed': sum(outcome['failed'] for outcome in outcomes.values()),
+        'by_fixture': dict(outcomes),
+        'wall_seconds': round(elapsed, 3),
+        'pages_per_sec': round(total / elapsed, 3) if elapsed else None,
+        'stages': timer.summary(),
+        'peak_rss_bytes': peak_rss_bytes()
+    }
+
+
+def compare(current, baseline):
+    """Print the change in throughput and stage latencies relative to a baseline run"""
+    def change(new, old):
+        return f"{(new - old) / old:+.1%}" if old else 'n/a'
+
+    print(f"\nCompared with {baseline['meta'].get('git_commit') or 'baseline'}:")
+    print(f"  pages/sec  {baseline['pages_per_sec']:>10} -> {current['pages_per_sec']:<10} "
+          f"{change(current['pages_per_sec'], baseline['pages_per_sec'])}")
+    for stage in STAGES:
+        new, old = current['stages'].get(stage, {}), baseline['stages'].get(stage, {})
+        if new.get('count') and old.get('count'):
+            print(f"  {stage:<12} p50 {change(new['p50_ms'], old['p50_ms']):>8}   p90 {change(new['p90_ms'], old['p90_ms']):>8}")
+    if current.get('peak_rss_bytes') and baseline.get('peak_rss_bytes'):
+        print(f"  peak RSS   {change(current['peak_rss_bytes'], baseline['peak_rss_bytes']):>8}")
+
+
+def print_report(results):
+    print(f"{results['pages']} pages ({results['failed']} failed) in {results['wall_seconds']}s "
+          f"= {results['pages_per_sec']} pages/sec, peak RSS {(results['peak_rss_bytes'] or 0) / 2 ** 20:.0f} MiB")
+    for fixture_set, outcome in results['by_fixture'].items():
+        print(f"  {fixture_set:<10} {outcome['pages']:>5} pages, {outcome['failed']} failed")
+    print(f"\n  {'stage':<12}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'total s':>10}")
+    for stage, summary in results['stages'].items():
+        if summary['count']:
+            print(f"  {stage:<12}{summary['count']:>7}{summary['p50_ms']:>10.2f}{summary['p90_ms']:>10.2f}"
+                  f"{summary['p99_ms']:>10.2f}{summary['total_s']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=','.join(FIXTURE_SETS),
+                        help=f"comma-separated fixture sets ({', '.join(FIXTURE_SETS)})")
+    parser.add_argument('--large-pages', type=int, default=20)
+    parser.add_argument('--large-kb', type=int, default=400, help='approximate size of each large page')
+    parser.add_argument('--image-pages', type=int, default=10)
+    parser.add_argument('--images-per-page', type=int, default=20)
+    parser.add_argument('--fallback-pages', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3, help='passes over the fixture pages')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--extract-workers', type=int, default=os.cpu_count() or 1,
+                        help='extraction worker processes; 0 extracts on the fetch threads')
+    parser.add_argument('--analysis-chunk', type=int, default=16, help='pages analyzed together; 1 analyzes each page alone')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.ERROR)
+
+    sets = [name.strip() for name in args.fixtures.split(',') if name.strip()]
+    unknown = set(sets) - set(FIXTURE_SETS)
+    if unknown:
+        parser.error(f"unknown fixture sets: {', '.join(sorted(unknown))}")
+
+    routes, pages = build_fixtures(
+        sets, args.large_pages, args.large_kb, args.image_pages, args.images_per_page, args.fallback_pages, args.seed
+    )
+    server = start_server(routes)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory(prefix='crawl-bench-') as work_dir:
+            results = run(
+                pages, base_url, args.workers, args.extract_workers, args.analysis_chunk, args.repeat, work_dir
+            )
+    finally:
+        os.chdir(REPO_DIR)
+        server.shutdown()
+
+    results = {
+        'meta': {
+            'git_commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args)
+        },
+        **results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Extraction throughput against the number of extraction worker processes
+
+Feeds the fixture pages of crawl_suite (recorded, large and fallback
+pages) straight to ExtractionPool.extract from a pool of threads, the way
+fetch workers do, with no network involved. Runs once inline (0 workers)
+and once per worker count, and reports pages/sec and the speedup over a
+single worker:
+
+    python benchmarks/extraction_scaling.py --workers 1,2,4,8
+
+Speedup can only track the worker count up to the number of cores.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.crawl_suite import build_fixtures, git_commit  # noqa: E402
+from scraper.extraction import ExtractionPool  # noqa: E402
+
+
+def default_worker_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def run(bodies, workers, repeat):
+    pool = ExtractionPool(workers=workers)
+    # Twice as many feeding threads as workers keeps the bounded queue full
+    feeders = max(2, workers * 2)
+    items = bodies * repeat
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=feeders) as executor:
+            extracted = sum(
+                1 for page in executor.map(lambda item: pool.extract(item[0], item[1], 'utf-8'), items)
+                if page.html is not None
+            )
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.close()
+    return {
+        'workers': workers,
+        'pages': len(items),
+        'extracted': extracted,
+        'wall_seconds': round(elapsed, 3),
+        'pages_per_sec': round(len(items) / elapsed, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', help='comma-separated worker counts (default: powers of two up to the core count)')
+    parser.add_argument('--large-pages', type=int, default=20)
+    parser.add_argument('--large-kb', type=int, default=400, help='approximate size of each large page')
+    parser.add_argument('--fallback-pages', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=2, help='passes over the fixture pages per run')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.ERROR)
+
+    counts = [int(count) for count in args.workers.split(',')] if args.workers else default_worker_counts()
+    routes, pages = build_fixtures(
+        ('recorded', 'large', 'fallback'), args.large_pages, args.large_kb, 0, 0, args.fallback_pages, args.seed
+    )
+    bodies = [(f"http://127.0.0.1{path}", routes[path][1]) for _, path in pages]
+
+    runs = [run(bodies, workers, args.repeat) for workers in [0] + counts]
+    single = next((result for result in runs if result['workers'] == 1), None)
+    for result in runs:
+        if single and result['workers']:
+            result['speedup'] = round(result['pages_per_sec'] / single['pages_per_sec'], 2)
+
+    if args.json:
+        print(json.dumps({'git_commit': git_commit(), 'cores': os.cpu_count(), 'runs': runs}, indent=2))
+        return
+    print(f"{len(bodies)} fixture pages x {args.repeat}, {os.cpu_count()} cores")
+    print(f"\n  {'workers':>8}{'pages/sec':>12}{'speedup':>10}")
+    for result in runs:
+        label = 'inline' if not result['workers'] else result['workers']
+        print(f"  {label:>8}{result['pages_per_sec']:>12.2f}{result.get('speedup', ''):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Compare focused and breadth-first crawling on a synthetic web graph
+
+Builds a site of pages spread over several topics, where pages mostly
+link within their own topic and anchors or URLs only sometimes say what
+they point to. Both crawlers start from the same seed with the same page
+budget; the harvest rate is the share of fetched pages that are on-topic.
+
+    python benchmarks/focused_crawl.py --pages 5000 --budget 300
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper.document import ParsedDocument  # noqa: E402
+from scraper.frontier import CrawlFrontier, FocusedFrontier  # noqa: E402
+from scraper.link_scorer import LinkScorer  # noqa: E402
+
+BASE_URL = 'http://bench.local'
+TOPICS = {
+    'astrology': 'astrology zodiac horoscope planets natal chart signs retrograde moon',
+    'gardening': 'garden soil compost seeds pruning perennials mulch watering',
+    'cycling': 'bicycle cycling gears saddle route climb peloton tyres',
+    'baking': 'bread sourdough oven flour yeast dough crust proofing',
+    'finance': 'stocks bonds portfolio dividends index funds savings inflation',
+    'astronomy': 'telescope galaxy nebula stars orbit comet observatory eclipse',
+    'chess': 'chess openings gambit endgame checkmate rook bishop tactics',
+    'hiking': 'trail summit backpack boots ridge campsite hiking map',
+}
+GENERIC_ANCHORS = ['read more', 'click here', 'next', 'details', 'continue', 'more']
+
+
+def build_site(pages, target, seed=7):
+    """Return {url: (topic, html)} for a synthetic site"""
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    assignments = [target if i % len(topics) == 0 else rng.choice(topics) for i in range(pages)]
+    urls = []
+    for i, topic in enumerate(assignments):
+        # Only some URLs carry a topical slug
+        urls.append(f"{BASE_URL}/{topic}/{i}.html" if rng.random() < 0.4 else f"{BASE_URL}/p/{i}.html")
+    by_topic = {}
+    for i, topic in enumerate(assignments):
+        by_topic.setdefault(topic, []).append(i)
+
+    site = {}
+    for i, topic in enumerate(assignments):
+        words = TOPICS[topic].split()
+        text = ' '.join(rng.choice(words + ['the', 'and', 'about', 'guide', 'notes']) for _ in range(120))
+        links = []
+        for _ in range(15):
+            same_topic = rng.random() < 0.35
+            j = rng.choice(by_topic[topic]) if same_topic else rng.randrange(pages)
+            target_words = TOPICS[assignments[j]].split()
+            if rng.random() < 0.4:
+                anchor = ' '.join(rng.sample(target_words, 2))
+            else:
+                anchor = rng.choice(GENERIC_ANCHORS)
+            around = ' '.join(rng.sample(target_words, 3)) if rng.random() < 0.3 else 'see also'
+            links.append(f'<li>{around}: <a href="{urls[j]}">{anchor}</a></li>')
+        site[urls[i]] = (topic, f"<html><body><article><h1>{topic} {i}</h1><p>{text}</p><ul>{''.join(links)}</ul></article></body></html>")
+    return site, urls[0]
+
+
+def crawl(site, seed_url, budget, target, focused, scorer):
+    frontier_class = FocusedFrontier if focused else CrawlFrontier
+    frontier = frontier_class(max_depth=50, max_pages=budget, max_queued=100000)
+    frontier.add_seed(seed_url)
+    topic_vector = scorer.topic_vector(TOPICS[target])
+
+    on_topic = 0
+    scoring_time = 0.0
+    while True:
+        item = frontier.pop()
+        if item is None:
+            break
+        url, depth = item
+        topic, html = site[url]
+        on_topic += topic == target
+
+        document = ParsedDocument(html, url)
+        links = document.link_contexts
+        if focused:
+            started = time.perf_counter()
+            # Stand-in for the analyzer's relevance score of the fetched page
+            page_score = float((scorer.vectorizer.transform([document.text()]) @ topic_vector.T).toarray()[0, 0])
+            priorities = scorer.score(links, topic_vector, parent_score=page_score)
+            scoring_time += time.perf_counter() - started
+        else:
+            priorities = [0.0] * len(links)
+        for link, priority in zip(links, priorities):
+            frontier.push(link['url'], depth + 1, priority=float(priority))
+
+    fetched = frontier.dispatched
+    return {
+        'fetched': fetched,
+        'on_topic': on_topic,
+        'harvest_rate': on_topic / fetched if fetched else 0.0,
+        'scoring_ms_per_page': scoring_time / fetched * 1000 if fetched and focused else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=5000)
+    parser.add_argument('--budget', type=int, default=300)
+    parser.add_argument('--topic', default='astrology', choices=sorted(TOPICS))
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    site, seed_url = build_site(args.pages, args.topic, seed=args.seed)
+    scorer = LinkScorer()
+    results = {
+        'pages': args.pages,
+        'budget': args.budget,
+        'topic': args.topic,
+        'breadth_first': crawl(site, seed_url, args.budget, args.topic, False, scorer),
+        'focused': crawl(site, seed_url, args.budget, args.topic, True, scorer),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.pages} pages, budget {args.budget}, topic '{args.topic}'")
+    for name in ('breadth_first', 'focused'):
+        result = results[name]
+        print(
+            f"  {name:<14} {result['on_topic']:>4}/{result['fetched']} on-topic "
+            f"(harvest {result['harvest_rate']:.1%}, scoring {result['scoring_ms_per_page']:.2f} ms/page)"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Text normalization: the single-pass TextNormalizer against the regex cascades it replaced
+
+Times clean_html (used on extracted HTML) and normalize (used for the
+analyzer's full text) on multi-MB pages, on hostile markup full of
+unterminated <script> and comment openers, and many small documents one at a time
+against the batch calls:
+
+    python benchmarks/normalize_bench.py --size-mb 8
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.crawl_suite import WORDS, git_commit  # noqa: E402
+from scraper.normalize import normalizer  # noqa: E402
+
+
+# --- the code TextNormalizer replaced, kept here for comparison ----------------
+
+def legacy_clean_html(content):
+    content = re.sub(r'<(script|style)[^>]*>.*?</\1>', '', content, flags=re.DOTALL)
+    content = re.sub(r'<!--.*?-->', '', content, flags=re.DOTALL)
+    content = re.sub(r'\s+', ' ', content)
+    content = re.sub(r'^\s*$\n', '', content, flags=re.MULTILINE)
+    return content.strip()
+
+
+def legacy_normalize(text):
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text)
+    text = re.sub(r'\n\s*\n+', '\n\n', text).strip()
+    return ''.join(char for char in text if char.isprintable() or char in '\n\t')
+
+
+# --- inputs -----------------------------------------------------------------
+
+def words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def article_html(rng, size):
+    """Indented markup with scripts, styles, comments and the odd non-printable character"""
+    parts = []
+    total = 0
+    while total < size:
+        part = rng.choice((
+            f"\n    <p>{words(rng, 60)}​.</p>",
+            f"\n    <div class='card'>\n        <h2>{words(rng, 5)}</h2>\n        <p>{words(rng, 30)}&nbsp;</p>\n    </div>",
+            f"\n    <script>var data = {{'k': '{words(rng, 20)}'}};\n    track(data);</script>",
+            f"\n    <style>.card {{ margin: 0 auto; }}\n</style>",
+            f"\n    <!-- {words(rng, 8)} -->",
+        ))
+        parts.append(part)
+        total += len(part)
+    return '<html><body>' + ''.join(parts) + '\n</body></html>'
+
+
+def hostile_html(rng, size):
+    """Text mentioning <script and <!-- without ever closing them, which the lazy .*? rescans
+
+    The second half is bare unterminated openers ending in a space, so every
+    block runs to the end of the document with nothing after it but whitespace.
+    """
+    line = "<p>Use a <script src=...> tag or a <!-- comment in your page.</p>\n"
+    openers = "<script><!--<style>"
+    half = max(1, size // 2)
+    return line * max(1, half // len(line)) + openers * max(1, half // len(openers)) + ' '
+
+
+def page_text(rng, size):
+    """Text shaped like the output of a page walk: block breaks, indentation, tabs and NBSPs"""
+    parts = []
+    total = 0
+    while total < size:
+        part = f"\n\n   {words(rng, 40)}\t  {words(rng, 20)}  \n \n\n\n\x07"
+        parts.append(part)
+        total += len(part)
+    return ''.join(parts)
+
+
+def timed(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def compare(name, legacy, current, argument, repeat):
+    legacy_seconds, _ = timed(legacy, argument, repeat=repeat)
+    current_seconds, _ = timed(current, argument, repeat=repeat)
+    return {
+        'case': name,
+        'bytes': len(argument) if isinstance(argument, str) else sum(len(item) for item in argument),
+        'legacy_s': round(legacy_seconds, 4),
+        'current_s': round(current_seconds, 4),
+        'speedup': round(legacy_seconds / current_seconds, 1) if current_seconds else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=4, help='size of each large document')
+    parser.add_argument('--hostile-kb', type=int, default=64, help='size of the hostile document')
+    parser.add_argument('--documents', type=int, default=2000, help='small documents for the batch comparison')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the best is kept')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    size = int(args.size_mb * 1024 * 1024)
+    html = article_html(rng, size)
+    text = page_text(rng, size)
+    hostile = hostile_html(rng, args.hostile_kb * 1024)
+    small = [page_text(rng, 4096) for _ in range(args.documents)]
+    normalizer.normalize('')  # compile the patterns outside the timings
+
+    results = [
+        compare('clean_html article', legacy_clean_html, normalizer.clean_html, html, args.repeat),
+        compare('clean_html hostile', legacy_clean_html, normalizer.clean_html, hostile, 1),
+        compare('normalize page text', legacy_normalize, normalizer.normalize, text, args.repeat),
+        compare('normalize small docs', lambda texts: [legacy_normalize(t) for t in texts],
+                lambda texts: [normalizer.normalize(t) for t in texts], small, args.repeat),
+        compare('normalize_batch small docs', lambda texts: [legacy_normalize(t) for t in texts],
+                normalizer.normalize_batch, small, args.repeat),
+    ]
+
+    if args.json:
+        print(json.dumps({'git_commit': git_commit(), 'seed': args.seed, 'results': results}, indent=2))
+        return
+    print(f"  {'case':<28}{'MB':>8}{'legacy s':>11}{'current s':>11}{'speedup':>9}")
+    for result in results:
+        print(f"  {result['case']:<28}{result['bytes'] / 2 ** 20:>8.1f}{result['legacy_s']:>11.3f}"
+              f"{result['current_s']:>11.3f}{result['speedup']:>8}x")
+
+
+if __name__ == '__main__':
+    main()
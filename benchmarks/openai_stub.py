@@ -0,0 +1,128 @@
+"""Minimal OpenAI-compatible chat completions server for local runs
+
+Answers POST /v1/chat/completions with deterministic JSON for the prompts
+LLMHandler sends: website suggestions, single and batched relevance. It
+can add latency and fail a share of requests with 429 to exercise caching,
+coalescing and retries. GET /stats returns request counts.
+
+    python benchmarks/openai_stub.py --port 8800 --latency 0.5 --fail-rate 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8800/v1 OPENAI_API_KEY=stub python main.py
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = re.compile(r'\w+')
+stats = {'requests': 0, 'completions': 0, 'throttled': 0}
+stats_lock = threading.Lock()
+
+
+def overlap_score(context, content):
+    context_words = set(WORDS.findall(context.lower()))
+    content_words = set(WORDS.findall(content.lower()))
+    if not context_words or not content_words:
+        return 0.0
+    return round(len(context_words & content_words) / len(context_words), 3)
+
+
+def answer(messages):
+    system = messages[0]['content'] if messages else ''
+    user = messages[-1]['content'] if messages else ''
+    if 'numbered content item' in system:
+        context, _, items = user.partition('\nItems: ')
+        context = context.removeprefix('Context: ')
+        return {'results': [
+            {
+                'index': item['index'],
+                'relevance_score': overlap_score(context, item['content']),
+                'explanation': 'word overlap with the context'
+            }
+            for item in json.loads(items or '[]')
+        ]}
+    if 'relevance' in system:
+        context, _, content = user.partition('\nContent: ')
+        return {
+            'relevance_score': overlap_score(context.removeprefix('Context: '), content),
+            'explanation': 'word overlap with the context'
+        }
+    slug = '-'.join(WORDS.findall(user.lower())[:3]) or 'topic'
+    return {
+        'message': f"Here are some sources about {user}",
+        'websites': [f"https://example.com/{slug}", f"https://example.org/{slug}"],
+        'context': user
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fail_rate = 0.0
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with stats_lock:
+                return self._send(200, dict(stats))
+        self._send(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        with stats_lock:
+            stats['requests'] += 1
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send(404, {'error': {'message': 'not found'}})
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if random.random() < self.fail_rate:
+            with stats_lock:
+                stats['throttled'] += 1
+            return self._send(429, {'error': {'message': 'rate limited', 'type': 'rate_limit'}}, {'Retry-After': '0.2'})
+
+        time.sleep(self.latency)
+        with stats_lock:
+            stats['completions'] += 1
+        self._send(200, {
+            'id': f"chatcmpl-stub-{stats['completions']}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': json.dumps(answer(request.get('messages', [])))},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every completion')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of requests answered with 429')
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"OpenAI stub listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
-from app import app
+# Extraction workers import the main module as __mp_main__; the app must not start up again in them
+if __name__ != "__mp_main__":
+    from app import app
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
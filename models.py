@@ -1,17 +1,79 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import event, inspect, text
 
 class ScrapingSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     topic = db.Column(db.String(200), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     results = db.Column(db.JSON)
     status = db.Column(db.String(50))
+    context = db.Column(db.Text)
+    client_id = db.Column(db.String(100))
+    session_dir = db.Column(db.String(500))
+    crawl_options = db.Column(db.JSON)  # Set for crawl jobs: depth, page budget, domain rules
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    owner = db.Column(db.String(200))  # host:pid of the server process running the job
+    heartbeat_at = db.Column(db.DateTime)  # Refreshed by the owner while the job is queued or running
 
 class WebsiteData(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.Integer, db.ForeignKey('scraping_session.id'))
-    url = db.Column(db.String(500))
+    session_id = db.Column(db.Integer, db.ForeignKey('scraping_session.id'), index=True)
+    url = db.Column(db.String(500), index=True)
     relevance_score = db.Column(db.Float)
-    content_hash = db.Column(db.String(64))
+    content_hash = db.Column(db.String(64), index=True)
     processed_data = db.Column(db.JSON)
+    position = db.Column(db.Integer)
+    depth = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(50), default='pending')
+    error = db.Column(db.Text)
+    error_type = db.Column(db.String(100))
+    fingerprint = db.Column(db.String(16))  # SimHash of the extracted text, hex
+    duplicate_of = db.Column(db.Integer, db.ForeignKey('website_data.id'))
+
+    __table_args__ = (
+        # Job progress and result listings filter a session's rows by status in position order
+        db.Index('ix_website_data_session_status_position', 'session_id', 'status', 'position'),
+    )
+
+def configure_sqlite(engine):
+    """Tune every new SQLite connection for one writer alongside concurrent readers
+
+    WAL lets status and history requests read while a job is writing, and
+    synchronous=NORMAL is safe under WAL while avoiding an fsync per commit.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=15000')
+        cursor.execute('PRAGMA cache_size=-20000')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+
+    # Connections opened before the listener existed miss the pragmas; start afresh
+    engine.dispose()
+
+def ensure_columns():
+    """Add columns introduced after a table was first created (SQLite has no migrations here)"""
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def ensure_indexes():
+    """Create indexes declared after a table was first created (CREATE INDEX IF NOT EXISTS)"""
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
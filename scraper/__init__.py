@@ -4,9 +4,46 @@ Intelligent Web Scraper Package
 This package contains components for web scraping with AI-powered content analysis:
 - WebCrawler: Handles the actual web scraping with rate limiting and content extraction
 - ContentAnalyzer: Processes and analyzes scraped content using ML/NLP techniques
+- AnalysisSession: Chunked analysis of a whole scraping session over one shared TF-IDF matrix
+- ScrapeScheduler: Runs scrapes on a bounded worker pool with per-host politeness
+- HttpClient: Pooled keep-alive HTTP client shared by all crawler fetches
+- ImagePipeline: Concurrent, size-capped image downloads spilled to disk
+- HttpCache: Persistent conditional-request cache for fetched pages
+- ParsedDocument: A page parsed once and shared by crawler and analyzer stages
+- RelevanceScorer: Batch, query-aware relevance over an incremental TF-IDF vocabulary
+- CrawlFrontier: Depth- and budget-bounded crawl queue with a Bloom-filter visited set
+- LinkScorer: Vectorized topic scoring of a page's outgoing links for focused crawls
+- NearDuplicateIndex: SimHash/LSH lookup of pages near-identical to ones already scraped
+- RobotsCache: Bounded TTL cache of robots.txt rules and crawl delays per origin
+- ExtractionPool: CPU-bound parsing and extraction on worker processes, with backpressure
+- MetricsRegistry: Counters, gauges and histograms rendered for Prometheus, plus per-URL traces
+- TextNormalizer: Single-pass markup stripping, whitespace collapsing and non-printable removal
+- TopicClusterer: Streaming MiniBatchKMeans topics over a session's TF-IDF rows, in bounded memory
 """
 
 from .web_crawler import WebCrawler
-from .content_analyzer import ContentAnalyzer
+from .content_analyzer import ContentAnalyzer, AnalysisSession
+from .scheduler import ScrapeScheduler, HostLimiter
+from .http_client import HttpClient
+from .image_pipeline import ImagePipeline, ImageSession
+from .http_cache import HttpCache
+from .document import ParsedDocument
+from .relevance import RelevanceScorer, IncrementalTfidf
+from .near_duplicates import NearDuplicateIndex, simhash
+from .frontier import CrawlFrontier, FocusedFrontier
+from .link_scorer import LinkScorer
+from .bloom import BloomFilter, ScalableBloomFilter
+from .robots import RobotsCache
+from .extraction import ExtractionPool, ExtractedPage
+from .metrics import MetricsRegistry, Tracer
+from .normalize import TextNormalizer
+from .topics import TopicClusterer
 
-__all__ = ['WebCrawler', 'ContentAnalyzer']
+__all__ = [
+    'WebCrawler', 'ContentAnalyzer', 'AnalysisSession', 'ScrapeScheduler', 'HostLimiter', 'HttpClient',
+    'ImagePipeline', 'ImageSession', 'HttpCache', 'ParsedDocument', 'RelevanceScorer',
+    'IncrementalTfidf', 'NearDuplicateIndex', 'simhash', 'CrawlFrontier', 'BloomFilter',
+    'ScalableBloomFilter', 'FocusedFrontier', 'LinkScorer', 'RobotsCache',
+    'ExtractionPool', 'ExtractedPage', 'MetricsRegistry', 'Tracer',
+    'TextNormalizer', 'TopicClusterer'
+]
@@ -0,0 +1,84 @@
+import math
+import hashlib
+
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter over strings
+
+    Positions come from one 128-bit BLAKE2b digest split into two hashes
+    (double hashing), so adding or checking an item costs a single hash.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def _contains(self, positions):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def __contains__(self, item):
+        return self._contains(self._positions(item))
+
+    def add(self, item):
+        """Add an item; returns False if it was (probably) already present"""
+        positions = self._positions(item)
+        if self._contains(positions):
+            return False
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+        return True
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+
+class ScalableBloomFilter:
+    """Bloom filter that grows by adding larger, stricter filters as it fills
+
+    Memory stays proportional to the number of items and the overall
+    false-positive rate stays below error_rate however many items are
+    added. At the default 0.1% that is 2 to 3.7 bytes per item: each new
+    filter is stricter than the last, and one just added is mostly empty.
+    """
+
+    def __init__(self, initial_capacity=10000, error_rate=0.001, growth=2, tightening=0.5):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = []
+
+    def _grow(self):
+        capacity = self.initial_capacity * self.growth ** len(self.filters)
+        error_rate = self.error_rate * (1 - self.tightening) * self.tightening ** len(self.filters)
+        self.filters.append(BloomFilter(capacity, error_rate))
+
+    def __contains__(self, item):
+        return any(item in bloom for bloom in self.filters)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def add(self, item):
+        """Add an item; returns False if it was (probably) already present"""
+        if item in self:
+            return False
+        if not self.filters or self.filters[-1].full:
+            self._grow()
+        return self.filters[-1].add(item)
+
+    @property
+    def nbytes(self):
+        return sum(len(bloom.bits) for bloom in self.filters)
@@ -0,0 +1,110 @@
+import re
+import codecs
+import logging
+
+logger = logging.getLogger(__name__)
+
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+# Browsers look for <meta charset> in the first 1024 bytes; allow for long heads
+PRESCAN_BYTES = 4096
+META_CHARSET = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:+-]+)', re.I)
+# Labels browsers decode as windows-1252, whatever the page says
+WINDOWS_1252_ALIASES = {'ascii', 'latin-1', 'iso8859-1'}
+
+
+def normalize_charset(label):
+    """Python codec name for a charset label, or None if there is no such codec"""
+    if not label:
+        return None
+    try:
+        name = codecs.lookup(label.strip().strip('"\'')).name
+    except LookupError:
+        logger.debug(f"Unknown charset {label}")
+        return None
+    if name in WINDOWS_1252_ALIASES:
+        return 'cp1252'
+    return name
+
+
+class CharsetSniffer:
+    """Works out a page's charset from its bytes as they arrive
+
+    A charset declared in the headers wins. Otherwise the first bytes are
+    checked for a byte order mark and the first PRESCAN_BYTES for a
+    <meta charset> or http-equiv Content-Type. Failing both, the body is
+    validated as UTF-8 chunk by chunk. finish() returns the charset, or
+    None when the body is not UTF-8 either and detection is left to the
+    parser.
+    """
+
+    def __init__(self, declared=None):
+        self.charset = normalize_charset(declared)
+        self._head = b''
+        self._utf8 = None
+        self._done = self.charset is not None
+
+    def feed(self, chunk):
+        if self._done or not chunk:
+            return
+        if self._utf8 is not None:
+            self._validate(chunk)
+            return
+
+        self._head += chunk
+        if self._prescan() or len(self._head) < PRESCAN_BYTES:
+            return
+        # No declaration near the top; from here on only check that the body is valid UTF-8
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        head, self._head = self._head, b''
+        self._validate(head)
+
+    def _prescan(self):
+        for bom, charset in BOMS:
+            if self._head.startswith(bom):
+                return self._decide(charset)
+        match = META_CHARSET.search(self._head[:PRESCAN_BYTES])
+        if match:
+            charset = normalize_charset(match.group(1).decode('ascii'))
+            # A page that can declare itself in ASCII is not UTF-16, whatever it claims
+            if charset and charset.startswith('utf-16'):
+                charset = 'utf-8'
+            if charset:
+                return self._decide(charset)
+        return False
+
+    def _decide(self, charset):
+        self.charset = charset
+        self._done = True
+        self._head = b''
+        return True
+
+    def _validate(self, chunk, final=False):
+        try:
+            self._utf8.decode(chunk, final)
+        except UnicodeDecodeError:
+            self._done = True
+
+    def finish(self):
+        if self._done:
+            return self.charset
+        if self._utf8 is None:
+            self._utf8 = codecs.getincrementaldecoder('utf-8')()
+            head, self._head = self._head, b''
+            self._validate(head)
+        if not self._done:
+            self._validate(b'', final=True)
+        if not self._done:
+            self.charset = 'utf-8'
+            self._done = True
+        return self.charset
+
+
+def sniff_charset(body, declared=None):
+    """One-shot CharsetSniffer over a whole body"""
+    sniffer = CharsetSniffer(declared)
+    sniffer.feed(body)
+    return sniffer.finish()
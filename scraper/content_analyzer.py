@@ -1,99 +1,263 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import logging
 import numpy as np
-from PIL import Image
-import io
-import re
+from scipy import sparse
+from .document import ParsedDocument
+from .relevance import RelevanceScorer
+from .topics import TopicClusterer
+from .metrics import registry, stage
 
-class ContentAnalyzer:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer()
-        self.relevance_threshold = 0.3
+ANALYZED = registry.counter('analyzer_pages_total', 'Pages run through analyze_content, by whether they were kept', ('result',))
+
+logger = logging.getLogger(__name__)
+
+KEYWORDS_PER_PAGE = 10
+SIMILAR_PAGES = 5
+# Pages whose TF-IDF vectors are less alike than this are not listed as similar
+SIMILARITY_THRESHOLD = 0.3
+# Kept pages each new page is compared with, most recent first; bounds the cost per page
+SIMILARITY_WINDOW = 2000
+
+
+class AnalysisSession:
+    """Analysis of one scraping session, fed a chunk of pages at a time
+
+    Each chunk is vectorized into a single sparse matrix over the shared
+    vocabulary, which is persisted once per chunk rather than once per
+    page. Keywords are the heaviest TF-IDF terms of each row. Kept pages
+    accumulate in the session, a block per chunk: every page is compared
+    with the last SIMILARITY_WINDOW pages kept before it and within its
+    chunk, and similarity_matrix() covers the whole session. Without a query
+    pages are scored against the centroid of every other page seen so far
+    in the session, and every page with text is kept. Kept pages are also
+    clustered into topics as they arrive; see topic_summary() and
+    late_topics().
+    """
+
+    def __init__(self, analyzer, query=None, context=None):
+        self.analyzer = analyzer
+        self.query = query
+        self.context = context
+        self.urls = []
+        self._blocks = []
+        self._window = None
+        self._centroid = None
+        self.topics = TopicClusterer(analyzer.scorer.model, n_topics=analyzer.topics)
+
+    def analyze(self, scraped_data):
+        """Analyze a chunk of pages and return the results of the relevant ones"""
+        with stage('analysis', url=[item['url'] for item in scraped_data]):
+            analyzed_results = self._analyze(scraped_data)
+        ANALYZED.inc(len(analyzed_results), result='relevant')
+        ANALYZED.inc(len(scraped_data) - len(analyzed_results), result='irrelevant')
+        return analyzed_results
+
+    def _analyze(self, scraped_data):
+        if not scraped_data:
+            return []
+        analyzer = self.analyzer
+
+        documents = [analyzer._get_document(item['content'], item['url']) for item in scraped_data]
+
+        # Extract text content
+        texts = [analyzer._extract_text(document) for document in documents]
+
+        # Vectorize and score the whole chunk at once
+        matrix, relevance_scores = self._calculate_relevance(texts)
+        if matrix is None:
+            return []
+        if self.query or self.context:
+            kept = [i for i, score in enumerate(relevance_scores) if score >= analyzer.relevance_threshold]
+        else:
+            # With no query nothing is off-topic: scores only rank pages against the rest of the
+            # session, and only pages without any text are dropped
+            kept = [i for i in range(matrix.shape[0]) if matrix.indptr[i + 1] > matrix.indptr[i]]
+        if not kept:
+            return []
+
+        kept_matrix = matrix[kept]
+        keywords = analyzer.scorer.model.top_terms(kept_matrix, KEYWORDS_PER_PAGE)
+        kept_urls = [scraped_data[i]['url'] for i in kept]
+        similar_pages = self._add_pages(kept_matrix, kept_urls)
+        topics = self._cluster(kept_matrix, kept_urls)
 
-    def analyze_content(self, scraped_data):
         analyzed_results = []
-        
-        for item in scraped_data:
-            # Extract text content
-            text_content = self._extract_text(item['content'])
-            
-            # Calculate relevance score
-            relevance_score = self._calculate_relevance(text_content)
-            
-            if relevance_score >= self.relevance_threshold:
-                # Process images if present
-                images = self._process_images(item['content'])
-                
-                # Create structured output
-                analyzed_results.append({
-                    'url': item['url'],
-                    'relevance_score': relevance_score,
-                    'processed_text': text_content,
-                    'images': images,
-                    'metadata': self._extract_metadata(item['content'])
-                })
-        
+        for position, i in enumerate(kept):
+            item, document = scraped_data[i], documents[i]
+            # Create structured output
+            analyzed_results.append({
+                'url': item['url'],
+                'relevance_score': relevance_scores[i],
+                'processed_text': texts[i],
+                'keywords': [{'term': term, 'weight': round(weight, 4)} for term, weight in keywords[position]],
+                'similar_pages': similar_pages[position],
+                'topic': topics[position],
+                'images': analyzer._process_images(document),
+                'metadata': analyzer._extract_metadata(item['content'], document)
+            })
+
         return analyzed_results
 
-    def _extract_text(self, content):
-        """Extract and clean text content with improved handling"""
+    def _calculate_relevance(self, texts):
+        """Vectorize texts and score them against the query and LLM context"""
+        scorer = self.analyzer.scorer
         try:
-            # Remove script and style elements
-            content = re.sub(r'<(script|style)[^>]*>.*?</\1>', '', content, flags=re.DOTALL)
-            
-            # Remove HTML comments
-            content = re.sub(r'<!--.*?-->', '', content, flags=re.DOTALL)
-            
-            # Remove HTML tags while preserving structure
-            text = re.sub(r'<br[^>]*>', '\n', content)
-            text = re.sub(r'</p>', '\n\n', text)
-            text = re.sub(r'<[^>]+>', '', text)
-            
-            # Clean up whitespace
-            text = re.sub(r'[ \t]+', ' ', text)
-            text = re.sub(r'\n\s*\n+', '\n\n', text)
-            text = text.strip()
-            
-            # Remove non-printable characters
-            text = ''.join(char for char in text if char.isprintable() or char in '\n\t')
-            
-            return text
+            matrix = scorer.vectorize(texts)
+            chunk_sum = matrix.sum(axis=0)
+            self._centroid = chunk_sum if self._centroid is None else self._centroid + chunk_sum
+            return matrix, scorer.score_matrix(matrix, self.query, self.context, centroid=self._centroid)
         except Exception as e:
-            logger.error(f"Error extracting text: {str(e)}")
-            return ""
+            logger.error(f"Error calculating relevance: {str(e)}", exc_info=True)
+            return None, [0.0] * len(texts)
+
+    def _add_pages(self, matrix, urls):
+        """Add kept rows to the session and list each one's most similar pages"""
+        self._blocks.append(matrix)
+        self.urls.extend(urls)
+        window = self._window_rows(matrix.shape[0])
+        first = len(self.urls) - window.shape[0]
+        offset = window.shape[0] - matrix.shape[0]
+
+        # Rows are L2-normalized, so the product is cosine similarity. It stays sparse: only pages
+        # sharing a term with the row are ever looked at
+        similarities = sparse.csr_matrix(matrix @ window.T)
+        similar_pages = []
+        for position in range(matrix.shape[0]):
+            start, end = similarities.indptr[position], similarities.indptr[position + 1]
+            columns = similarities.indices[start:end]
+            values = similarities.data[start:end]
+            match = (values >= SIMILARITY_THRESHOLD) & (columns != offset + position)
+            columns, values = columns[match], values[match]
+            if len(values) > SIMILAR_PAGES:
+                best = np.argpartition(-values, SIMILAR_PAGES - 1)[:SIMILAR_PAGES]
+                columns, values = columns[best], values[best]
+            order = np.argsort(-values, kind='stable')
+            similar_pages.append([
+                {'url': self.urls[first + column], 'similarity': round(float(value), 4)}
+                for column, value in zip(columns[order], values[order])
+            ])
+        return similar_pages
+
+    def _window_rows(self, added):
+        """The last SIMILARITY_WINDOW kept rows, the added ones included, as one matrix"""
+        if self._window is None:
+            self._window = self._blocks[-1]
+        else:
+            self._window = sparse.vstack([self._window, self._blocks[-1]], format='csr')
+        if self._window.shape[0] > SIMILARITY_WINDOW + added:
+            self._window = self._window[-(SIMILARITY_WINDOW + added):]
+        return self._window
+
+    def _cluster(self, matrix, urls):
+        """Topic of each kept page; None while the topics are still being seeded, see late_topics()"""
+        try:
+            return self.topics.add(matrix, urls)
+        except Exception as e:
+            logger.error(f"Error clustering pages into topics: {str(e)}", exc_info=True)
+            return [None] * len(urls)
 
-    def _calculate_relevance(self, text):
-        # Simple relevance scoring using TF-IDF
+    def include_earlier(self, scraped_texts):
+        """Count pages analyzed by an earlier run of this session in its topics
+
+        scraped_texts holds (url, processed text) pairs. They are vectorized
+        against the vocabulary without updating it and only feed the topics.
+        Returns (url, topic) for the pages assigned a topic right away; the
+        rest come out of late_topics() once the topics are seeded.
+        """
+        if not scraped_texts:
+            return []
+        urls = [url for url, _ in scraped_texts]
         try:
-            tfidf_matrix = self.vectorizer.fit_transform([text])
-            return float(np.mean(tfidf_matrix.toarray()))
-        except:
-            return 0.0
+            matrix = self.analyzer.scorer.model.transform([text for _, text in scraped_texts])
+        except Exception as e:
+            logger.error(f"Error vectorizing earlier pages: {str(e)}", exc_info=True)
+            return []
+        return [(url, topic) for url, topic in zip(urls, self._cluster(matrix, urls)) if topic is not None]
+
+    def late_topics(self, finished=False):
+        """(url, topic) of pages returned with topic None whose topic is known now
+
+        Pages that arrive while the topics are being seeded are returned
+        without one; this hands out their topics once, after seeding. With
+        finished set, a session too short to seed its topics seeds them
+        from the pages it has.
+        """
+        if finished:
+            try:
+                self.topics.seed_pending()
+            except Exception as e:
+                logger.error(f"Error seeding topics: {str(e)}", exc_info=True)
+        return self.topics.pop_seeded()
+
+    def topic_summary(self):
+        """The session's topics: label terms, page count and representative page of each"""
+        try:
+            return self.topics.summary()
+        except Exception as e:
+            logger.error(f"Error summarizing topics: {str(e)}", exc_info=True)
+            return []
+
+    def similarity_matrix(self):
+        """Sparse pairwise cosine similarity of the kept pages, in the order of urls"""
+        if not self._blocks:
+            return sparse.csr_matrix((0, 0))
+        matrix = sparse.vstack(self._blocks, format='csr')
+        return (matrix @ matrix.T).tocsr()
+
 
-    def _process_images(self, content):
+class ContentAnalyzer:
+    def __init__(self, state_path=None, topics=8):
+        self.scorer = RelevanceScorer(state_path=state_path)
+        # Topics each analysis session clusters its kept pages into
+        self.topics = topics
+        # Cosine similarity to the research query; off-topic pages score near zero
+        self.relevance_threshold = 0.02
+
+    def session(self, query=None, context=None):
+        """Start an AnalysisSession that pages of one scraping session are analyzed in"""
+        return AnalysisSession(self, query, context)
+
+    def analyze_content(self, scraped_data, query=None, context=None):
+        """Analyze a batch of pages together, as a session of their own"""
+        return self.session(query, context).analyze(scraped_data)
+
+    def analyze_stream(self, chunks, query=None, context=None):
+        """Analyze chunks of pages in one session, yielding each chunk's results as it finishes"""
+        analysis = self.session(query, context)
+        for chunk in chunks:
+            yield analysis.analyze(chunk)
+
+    def _get_document(self, content, url=None):
+        """Reuse the crawler's parsed document, parsing raw HTML only when none was shared"""
+        if isinstance(content, dict):
+            if content.get('document') is not None:
+                return content['document']
+            return ParsedDocument(content.get('html') or '', url)
+        return ParsedDocument(content or '', url)
+
+    def _extract_text(self, document):
+        """Extract visible text from the parsed document"""
+        try:
+            return document.full_text()
+        except Exception as e:
+            logger.error(f"Error extracting text: {str(e)}")
+            return ""
+
+    def _process_images(self, document):
         """Process images with enhanced metadata extraction"""
         images = []
-        img_pattern = r'<img[^>]+(?:src="([^">]+)"|alt="([^">]+)"|title="([^">]+)"|width="([^">]+)"|height="([^">]+)")'
-        
-        # Find all image tags and their attributes
-        matches = re.finditer(img_pattern, content)
-        processed_urls = set()
         
-        for match in matches:
+        for image in document.images():
             try:
-                img_url = next((g for g in match.groups() if g), '')
-                if not img_url or img_url in processed_urls:
-                    continue
-                    
-                processed_urls.add(img_url)
+                img_url = image['url']
+                path = img_url.split('?', 1)[0]
                 
                 metadata = {
                     'source': img_url,
-                    'alt_text': match.group(2) or '',
-                    'title': match.group(3) or '',
-                    'width': match.group(4) or '',
-                    'height': match.group(5) or '',
-                    'file_type': img_url.split('.')[-1].lower() if '.' in img_url else 'unknown',
+                    'alt_text': image['alt'] or '',
+                    'title': image['title'] or '',
+                    'width': image['width'] or '',
+                    'height': image['height'] or '',
+                    'file_type': path.rsplit('.', 1)[-1].lower() if '.' in path.rsplit('/', 1)[-1] else 'unknown',
                     'processed': True
                 }
                 
@@ -112,18 +276,8 @@ class ContentAnalyzer:
                 
         return images
 
-    def _extract_metadata(self, content):
-        metadata = {
-            'title': self._extract_tag_content(content, 'title'),
-            'description': self._extract_meta_content(content, 'description'),
-            'keywords': self._extract_meta_content(content, 'keywords'),
-        }
-        return metadata
-
-    def _extract_tag_content(self, content, tag):
-        match = re.search(f'<{tag}[^>]*>(.*?)</{tag}>', content, re.I|re.S)
-        return match.group(1) if match else ''
-
-    def _extract_meta_content(self, content, name):
-        match = re.search(f'<meta[^>]+name="{name}"[^>]+content="([^"]*)"', content, re.I)
-        return match.group(1) if match else ''
+    def _extract_metadata(self, content, document):
+        """Prefer page-level metadata from the crawler, falling back to the document head"""
+        if isinstance(content, dict) and content.get('metadata'):
+            return dict(content['metadata'])
+        return dict(document.metadata)
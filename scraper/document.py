@@ -0,0 +1,218 @@
+import re
+import logging
+from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup
+from bs4.element import NavigableString, PreformattedString
+from .normalize import normalizer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+UNWANTED_TAGS = ['script', 'style', 'nav', 'footer', 'iframe', 'header', 'noscript']
+TEXT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'li', 'ul', 'ol', 'table', 'tr',
+    'blockquote', 'pre', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'
+}
+
+# Elements whose text is taken as the context around a link
+CONTEXT_TAGS = {'p', 'li', 'td', 'dd', 'dt', 'blockquote', 'figcaption', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+CONTEXT_CHARS = 300
+
+
+def _is_http_url(url):
+    parsed = urlparse(url)
+    return parsed.scheme in ('http', 'https') and bool(parsed.netloc)
+
+
+class ParsedDocument:
+    """An HTML page parsed once and shared by every extraction stage
+
+    Links and metadata are read from the full tree before unwanted elements
+    are stripped for main-content extraction, so stages can ask for them in
+    any order.
+    """
+
+    def __init__(self, html, url=None, parser=None, root=None):
+        self.url = url
+        if root is not None:
+            self.soup = root
+        else:
+            self.soup = self._parse(html, parser or DEFAULT_PARSER)
+        self._links = None
+        self._link_contexts = None
+        self._metadata = None
+        self._stripped = False
+
+    @staticmethod
+    def _parse(html, parser):
+        try:
+            return BeautifulSoup(html, parser)
+        except Exception as e:
+            if parser == 'html.parser':
+                raise
+            logger.warning(f"{parser} failed to parse document, falling back to html.parser: {str(e)}")
+            return BeautifulSoup(html, 'html.parser')
+
+    @classmethod
+    def from_node(cls, node, url=None):
+        """Wrap an already parsed subtree without re-parsing it"""
+        return cls(None, url=url, root=node)
+
+    @property
+    def metadata(self):
+        """Title, description and keywords from the document head"""
+        if self._metadata is None:
+            title = self.soup.find('title')
+            self._metadata = {
+                'title': title.get_text(strip=True) if title else '',
+                'description': self._meta_content('description'),
+                'keywords': self._meta_content('keywords'),
+            }
+        return self._metadata
+
+    def _meta_content(self, name):
+        tag = self.soup.find('meta', attrs={'name': re.compile(f'^{name}$', re.I)})
+        return tag.get('content', '') if tag else ''
+
+    @property
+    def links(self):
+        """Absolute http(s) links in document order, without duplicates"""
+        if self._links is None:
+            self._read_links()
+        return self._links
+
+    @property
+    def link_contexts(self):
+        """Anchor text and surrounding text for each entry of links
+
+        Returns dicts of url, anchor and context aligned with links; anchors
+        of repeated links are joined so every mention counts.
+        """
+        if self._link_contexts is None:
+            self._read_links()
+        return self._link_contexts
+
+    def _read_links(self):
+        self._links = []
+        contexts = {}
+        for anchor in self.soup.find_all('a', href=True):
+            href = anchor['href'].strip()
+            if not href or href.startswith(('#', 'javascript:', 'mailto:')):
+                continue
+            absolute_url = urljoin(self.url or '', href)
+            if not _is_http_url(absolute_url):
+                continue
+
+            text = ' '.join(filter(None, (
+                anchor.get_text(' ', strip=True), anchor.get('title', ''), anchor.get('aria-label', '')
+            )))
+            if absolute_url in contexts:
+                contexts[absolute_url]['anchor'] += ' ' + text
+                continue
+            self._links.append(absolute_url)
+            contexts[absolute_url] = {'url': absolute_url, 'anchor': text, 'context': self._context_of(anchor)}
+        self._link_contexts = [contexts[url] for url in self._links]
+
+    @staticmethod
+    def _context_of(anchor):
+        """Text of the nearest paragraph-like element around a link, truncated"""
+        node = anchor.parent
+        for _ in range(3):
+            if node is None or node.name in ('body', '[document]'):
+                break
+            if node.name in CONTEXT_TAGS:
+                return node.get_text(' ', strip=True)[:CONTEXT_CHARS]
+            node = node.parent
+        return ''
+
+    @property
+    def canonical_url(self):
+        """Absolute URL from <link rel="canonical">, if the page declares one"""
+        for link in self.soup.find_all('link', href=True):
+            rel = link.get('rel') or []
+            if isinstance(rel, str):
+                rel = rel.split()
+            if 'canonical' in (value.lower() for value in rel):
+                canonical = urljoin(self.url or '', link['href'].strip())
+                return canonical if _is_http_url(canonical) else None
+        return None
+
+    def strip_unwanted(self):
+        """Remove scripts, styles and page chrome from the tree (once)"""
+        if not self._stripped:
+            # Read links and metadata first; they live partly in the stripped chrome
+            if self._links is None:
+                self._read_links()
+            self.metadata
+            for element in self.soup(UNWANTED_TAGS):
+                element.decompose()
+            self._stripped = True
+        return self
+
+    def main_content(self):
+        """Return the node holding the main content of the page"""
+        self.strip_unwanted()
+        node = (
+            self.soup.find('main')
+            or self.soup.find('article')
+            or self.soup.find('div', {'class': ['content', 'main', 'article']})
+        )
+        if not node:
+            node = self.soup.body if self.soup.body else self.soup
+        return node
+
+    def text(self):
+        """Paragraph and heading text, with headings marked up as markdown"""
+        self.strip_unwanted()
+        paragraphs = []
+        for element in self.soup.find_all(TEXT_TAGS):
+            text = element.get_text(strip=True)
+            if text:  # Only add non-empty paragraphs
+                if element.name.startswith('h'):
+                    paragraphs.append(f"\n# {text}\n")
+                else:
+                    paragraphs.append(text)
+        return '\n\n'.join(paragraphs)
+
+    def full_text(self):
+        """All visible text, keeping line breaks and block boundaries"""
+        self.strip_unwanted()
+        root = self.soup.body or self.soup
+        chunks = []
+        for node in root.descendants:
+            if isinstance(node, NavigableString):
+                # Comments, doctypes and CDATA are PreformattedString subclasses
+                if not isinstance(node, PreformattedString):
+                    chunks.append(str(node))
+            elif node.name == 'br':
+                chunks.append('\n')
+            elif node.name in BLOCK_TAGS:
+                chunks.append('\n\n')
+        return normalizer.normalize(''.join(chunks))
+
+    def images(self):
+        """Image references with absolute URLs and their descriptive attributes"""
+        images = []
+        seen = set()
+        for img in self.soup.find_all('img'):
+            src = (img.get('src') or '').strip()
+            if not src or src.startswith('data:'):
+                continue
+            img_url = urljoin(self.url or '', src)
+            if img_url in seen or (self.url and not _is_http_url(img_url)):
+                continue
+            seen.add(img_url)
+            images.append({
+                'url': img_url,
+                'alt': img.get('alt', ''),
+                'title': img.get('title', ''),
+                'width': img.get('width', ''),
+                'height': img.get('height', ''),
+            })
+        return images
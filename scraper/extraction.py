@@ -0,0 +1,231 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory, resource_tracker
+import trafilatura
+from .document import ParsedDocument
+from .http_client import decode_body
+from .normalize import normalizer
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Bodies this large are handed to workers through shared memory rather than pickled through a pipe
+SHARED_MEMORY_MIN_BYTES = 64 * 1024
+
+QUEUED = registry.gauge('scraper_extraction_queued', 'Pages submitted for extraction and not finished yet')
+QUEUE_WAIT = registry.histogram(
+    'scraper_extraction_wait_seconds', 'Time fetch workers waited for room in the extraction queue'
+)
+
+
+class ExtractedPage:
+    """Plain-data result of extracting one page
+
+    Stands in for the ParsedDocument of the main content (text(),
+    full_text(), images()) and carries the page-level links and metadata,
+    so nothing but strings and lists crosses the process boundary.
+    """
+
+    def __init__(self, url, method=None, html=None, text='', full_text='', images=None, metadata=None,
+                 links=None, link_contexts=None, canonical_url=None, timings=None):
+        self.url = url
+        self.method = method
+        self.html = html
+        self._text = text
+        self._full_text = full_text
+        self._images = images or []
+        self.metadata = metadata or {}
+        self.links = links or []
+        self.link_contexts = link_contexts or []
+        self.canonical_url = canonical_url
+        self.timings = timings or []
+
+    def text(self):
+        return self._text
+
+    def full_text(self):
+        return self._full_text
+
+    def images(self):
+        return list(self._images)
+
+
+@contextmanager
+def _timed(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((name, started, time.perf_counter() - started))
+
+
+def extract_page(url, body, charset=None):
+    """Parse a downloaded page, extract and clean its main content
+
+    trafilatura is tried first, with the BeautifulSoup main-content
+    heuristics as the fallback. body is the raw page (any bytes-like object)
+    and charset the one the server declared. Runs in an extraction worker
+    or inline; html is None when no content could be extracted.
+    """
+    timings = []
+    with _timed(timings, 'parse'):
+        downloaded = decode_body(body, charset)
+        # Parse the page once; links, metadata and the fallback all read this tree
+        page = ParsedDocument(downloaded, url)
+        links, link_contexts, metadata = page.links, page.link_contexts, page.metadata
+        canonical_url = page.canonical_url
+
+    with _timed(timings, 'trafilatura'):
+        main_content = trafilatura.extract(
+            downloaded,
+            url=url,
+            include_images=True,
+            include_links=True,
+            output_format='html',
+            with_metadata=True
+        )
+
+    if main_content:
+        method = 'trafilatura'
+        with _timed(timings, 'clean'):
+            html_content = normalizer.clean_html(main_content)
+            document = ParsedDocument(html_content, url)
+    else:
+        # Extract main content; unwanted elements are stripped from the shared tree
+        method = 'fallback'
+        with _timed(timings, 'fallback'):
+            main_node = page.main_content()
+            html_content = normalizer.clean_html(str(main_node))
+        if not html_content.strip():
+            return ExtractedPage(url, method, metadata=metadata, links=links, link_contexts=link_contexts,
+                                 canonical_url=canonical_url, timings=timings)
+        document = ParsedDocument.from_node(main_node, url)
+
+    with _timed(timings, 'text'):
+        text = document.text()
+        full_text = document.full_text()
+        images = document.images()
+
+    return ExtractedPage(
+        url, method, html_content, text, full_text, images, metadata, links, link_contexts, canonical_url, timings
+    )
+
+
+def _extract_shared(url, name, size, charset):
+    """extract_page for a body left in a shared memory block by the parent"""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        view = block.buf[:size]
+        try:
+            return extract_page(url, view, charset)
+        finally:
+            view.release()
+    finally:
+        block.close()
+
+
+def _warm_up():
+    return os.getpid()
+
+
+class ExtractionPool:
+    """CPU-bound page extraction on a pool of worker processes
+
+    Parsing, trafilatura and cleaning hold the GIL, so fetch threads hand
+    pages to worker processes instead and wait for the result. At most
+    max_queued pages are in the pool at once; past that extract() blocks,
+    which holds fetch workers back rather than letting downloaded pages
+    pile up. Bodies of SHARED_MEMORY_MIN_BYTES or more are copied once into
+    shared memory and decoded by the worker straight from there.
+
+    Workers are forked by a fork server (spawned where that is missing)
+    rather than by this process, which by the time a broken pool is
+    restarted runs fetch, writer and request threads whose locks a plain
+    fork could copy mid-acquire. Like any spawned process, workers import
+    the main module, so it must not start the application when imported
+    under the name __mp_main__. With workers=0 pages are extracted inline
+    on the calling thread.
+    """
+
+    def __init__(self, workers=None, max_queued=None, shared_memory_min_bytes=SHARED_MEMORY_MIN_BYTES):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_queued = max_queued or max(2, self.workers * 2)
+        self.shared_memory_min_bytes = shared_memory_min_bytes
+        self._slots = threading.BoundedSemaphore(self.max_queued)
+        self._lock = threading.Lock()
+        self._executor = None
+        if self.workers > 0:
+            self._start()
+
+    def _start(self):
+        """Start the workers now, so later extractions never pay for process startup"""
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        if context.get_start_method() == 'forkserver':
+            # The server imports the extraction code once and forks every worker with it loaded
+            context.set_forkserver_preload([__name__])
+        # Workers must share our resource tracker, or each would report the shared memory it
+        # attached to as leaked after we unlink it
+        resource_tracker.ensure_running()
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        # Workers are started on demand; keep them all busy at once so every one starts now
+        for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+        self._executor = executor
+        logger.info(f"Started {self.workers} extraction workers")
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._start()
+            return self._executor
+
+    def extract(self, url, body, charset=None):
+        """Extract a downloaded page, waiting for room in the pool when it is busy"""
+        if isinstance(body, str):
+            body, charset = body.encode('utf-8'), 'utf-8'
+        if self.workers <= 0:
+            return extract_page(url, body, charset)
+
+        started = time.perf_counter()
+        self._slots.acquire()
+        QUEUE_WAIT.observe(time.perf_counter() - started)
+        QUEUED.inc()
+        try:
+            executor = self._pool()
+            return self._submit(executor, url, body, charset)
+        except BrokenProcessPool:
+            # A worker died (possibly on this very page); fail the page and start fresh workers next time
+            logger.error(f"Extraction worker died while extracting {url}, restarting the pool")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+        finally:
+            QUEUED.dec()
+            self._slots.release()
+
+    def _submit(self, executor, url, body, charset):
+        if len(body) < self.shared_memory_min_bytes:
+            return executor.submit(extract_page, url, body, charset).result()
+
+        block = shared_memory.SharedMemory(create=True, size=len(body))
+        try:
+            block.buf[:len(body)] = body
+            return executor.submit(_extract_shared, url, block.name, len(body), charset).result()
+        finally:
+            block.close()
+            block.unlink()
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
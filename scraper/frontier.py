@@ -0,0 +1,188 @@
+import heapq
+import logging
+import itertools
+from collections import deque
+from urllib.parse import urlsplit
+from .bloom import ScalableBloomFilter
+from .url_utils import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+# Links to these are never pages worth analysing
+NON_HTML_EXTENSIONS = {
+    'jpg', 'jpeg', 'png', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp', 'tiff',
+    'pdf', 'zip', 'gz', 'tar', 'rar', '7z', 'exe', 'dmg', 'msi', 'apk',
+    'mp3', 'mp4', 'avi', 'mov', 'webm', 'wav', 'ogg',
+    'css', 'js', 'json', 'xml', 'rss', 'woff', 'woff2', 'ttf', 'eot'
+}
+
+
+def _domain(url):
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class CrawlFrontier:
+    """Queue of URLs still to crawl, with depth, page budget and domain rules
+
+    Every URL is canonicalized and remembered in a scalable Bloom filter the
+    first time it is queued, so a page is scheduled at most once per job and
+    the visited set costs a few bits per URL however large the crawl grows.
+    """
+
+    def __init__(self, max_depth=2, max_pages=50, same_domain=True, allowed_domains=None, max_queued=10000):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.same_domain = same_domain
+        self.allowed_domains = {domain.lower().strip('.') for domain in allowed_domains or ()}
+        self.max_queued = max_queued
+        self.seed_domains = set()
+        self.seen = ScalableBloomFilter()
+        self.queue = deque()
+        self.dispatched = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    @property
+    def exhausted(self):
+        return self.dispatched >= self.max_pages
+
+    def _domain_allowed(self, url):
+        domain = _domain(url)
+        if self.allowed_domains and any(
+            domain == allowed or domain.endswith('.' + allowed) for allowed in self.allowed_domains
+        ):
+            return True
+        if self.same_domain:
+            return domain in self.seed_domains
+        return not self.allowed_domains
+
+    def allows(self, url):
+        """Whether a discovered link may be crawled at all"""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            return False
+        name = parts.path.rsplit('/', 1)[-1]
+        if '.' in name and name.rpartition('.')[2].lower() in NON_HTML_EXTENSIONS:
+            return False
+        return self._domain_allowed(url)
+
+    def add_seed(self, url, queue=True):
+        """Register a starting URL; its domain becomes crawlable when same_domain is set
+
+        With queue=False the seed is only marked as seen, for seeds that
+        already have a row of their own.
+        """
+        self.seed_domains.add(_domain(url))
+        if not queue:
+            self.mark_seen(url)
+            return False
+        return self.push(url, 0, priority=1.0, check_rules=False)
+
+    def mark_seen(self, url):
+        """Record a URL as visited without queueing it (e.g. a page's canonical link)"""
+        self.seen.add(canonicalize_url(url))
+
+    def push(self, url, depth, priority=0.0, check_rules=True):
+        """Queue a URL unless it is too deep, off-limits, already seen or the queue is full"""
+        if depth > self.max_depth or (check_rules and not self.allows(url)):
+            return False
+        canonical = canonicalize_url(url)
+        if canonical in self.seen:
+            return False
+        if len(self) >= self.max_queued and not self._make_room(priority):
+            self.dropped += 1
+            return False
+        self.seen.add(canonical)
+        self._enqueue(url, depth, priority)
+        return True
+
+    def pop(self):
+        """Next (url, depth) to crawl, or None when the queue is empty or the budget spent"""
+        if self.exhausted or not len(self):
+            return None
+        self.dispatched += 1
+        return self._dequeue()
+
+    def _make_room(self, priority):
+        return False
+
+    def _enqueue(self, url, depth, priority):
+        self.queue.append((url, depth))
+
+    def _dequeue(self):
+        return self.queue.popleft()
+
+    def snapshot(self):
+        """Queued URLs as [url, depth, priority] lists, for resuming the crawl later"""
+        return [[url, depth, 0.0] for url, depth in self.queue]
+
+
+class FocusedFrontier(CrawlFrontier):
+    """Crawl frontier that hands out the most promising link first
+
+    Links are pushed with a priority (see LinkScorer). When the queue is
+    full, a new link displaces the lowest-priority one if it scores higher.
+    Queued links sit in two heaps, best first and worst first, so popping,
+    checking the worst link and evicting it are all O(log n). A link taken
+    from one heap is dropped lazily from the other when it surfaces there.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.heap = []
+        self._worst = []
+        self._queued = set()
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._queued)
+
+    def _enqueue(self, url, depth, priority):
+        # Ties keep discovery order, so equal scores still crawl breadth-first
+        order = next(self._counter)
+        heapq.heappush(self.heap, (-priority, order, url, depth))
+        # Of equally bad links the most recently found is evicted first
+        heapq.heappush(self._worst, (priority, -order))
+        self._queued.add(order)
+
+    def _dequeue(self):
+        _, order, url, depth = self._pop_queued(self.heap, lambda entry: entry[1])
+        self._queued.discard(order)
+        self._compact()
+        return url, depth
+
+    def _make_room(self, priority):
+        worst = self._peek_queued(self._worst, lambda entry: -entry[1])
+        if worst[0] >= priority:
+            return False
+        heapq.heappop(self._worst)
+        self._queued.discard(-worst[1])
+        self._compact()
+        self.dropped += 1
+        return True
+
+    def _peek_queued(self, heap, order):
+        while order(heap[0]) not in self._queued:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def _pop_queued(self, heap, order):
+        self._peek_queued(heap, order)
+        return heapq.heappop(heap)
+
+    def _compact(self):
+        """Rebuild the heaps once links removed from the other heap make up most of one"""
+        if len(self.heap) + len(self._worst) > 4 * len(self._queued) + 64:
+            self.heap = [entry for entry in self.heap if entry[1] in self._queued]
+            self._worst = [entry for entry in self._worst if -entry[1] in self._queued]
+            heapq.heapify(self.heap)
+            heapq.heapify(self._worst)
+
+    def snapshot(self):
+        return [
+            [url, depth, -negative] for negative, order, url, depth in sorted(self.heap)
+            if order in self._queued
+        ]
@@ -0,0 +1,229 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+from .url_utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_PATTERN = re.compile(r'(?:^|,)\s*(?:s-maxage|max-age)\s*=\s*"?(\d+)"?', re.I)
+
+
+class HttpCache:
+    """On-disk HTTP cache keyed by normalized URL with LRU eviction
+
+    Bodies are stored as files under bodies/ and indexed in a small SQLite
+    database together with the validators needed for conditional requests.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.body_dir = os.path.join(cache_dir, 'bodies')
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.body_dir, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, 'index.db'),
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                cache_control TEXT,
+                expires TEXT,
+                content_type TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)')
+        self.total_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _body_path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.body_dir, digest[:2], digest)
+
+    def lookup(self, url):
+        """Return the cached entry for a URL, or None"""
+        key = normalize_url(url)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT key, etag, last_modified, cache_control, expires, content_type, stored_at, size '
+                'FROM entries WHERE key = ?',
+                (key,)
+            ).fetchone()
+        if not row:
+            return None
+
+        entry = dict(zip(
+            ('key', 'etag', 'last_modified', 'cache_control', 'expires', 'content_type', 'stored_at', 'size'),
+            row
+        ))
+        entry['path'] = self._body_path(key)
+        if not os.path.exists(entry['path']):
+            self._delete(key)
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        """Check whether an entry can be served without revalidation"""
+        cache_control = (entry.get('cache_control') or '').lower()
+        if 'no-cache' in cache_control or 'must-revalidate' in cache_control:
+            return False
+
+        match = MAX_AGE_PATTERN.search(cache_control)
+        if match:
+            return time.time() - entry['stored_at'] < int(match.group(1))
+
+        if entry.get('expires'):
+            try:
+                return parsedate_to_datetime(entry['expires']).timestamp() > time.time()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def conditional_headers(self, entry):
+        """Build If-None-Match / If-Modified-Since headers for a cached entry"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read_body(self, entry):
+        """Read a cached body and mark the entry as recently used"""
+        with open(entry['path'], 'rb') as f:
+            body = f.read()
+        with self._lock:
+            self._db.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (time.time(), entry['key']))
+        return body
+
+    def record_hit(self, revalidated=False):
+        with self._lock:
+            if revalidated:
+                self.revalidated += 1
+            else:
+                self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def refresh(self, entry, headers):
+        """Update validators and freshness after a 304 Not Modified"""
+        with self._lock:
+            self._db.execute(
+                'UPDATE entries SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), '
+                'cache_control = COALESCE(?, cache_control), expires = COALESCE(?, expires), '
+                'stored_at = ?, accessed_at = ? WHERE key = ?',
+                (
+                    headers.get('ETag'),
+                    headers.get('Last-Modified'),
+                    headers.get('Cache-Control'),
+                    headers.get('Expires'),
+                    time.time(),
+                    time.time(),
+                    entry['key']
+                )
+            )
+
+    def store(self, url, headers, body):
+        """Store a 200 response body with its validators
+
+        A response with neither a validator (ETag, Last-Modified) nor a
+        freshness lifetime (max-age, Expires) could never be served from the
+        cache or revalidated. It isn't stored, and any earlier entry for the
+        URL is dropped.
+        """
+        cache_control = (headers.get('Cache-Control') or '').lower()
+        if 'no-store' in cache_control or len(body) > self.max_bytes // 4:
+            return
+
+        key = normalize_url(url)
+        if not (headers.get('ETag') or headers.get('Last-Modified') or headers.get('Expires')
+                or MAX_AGE_PATTERN.search(cache_control)):
+            self._delete(key)
+            return
+
+        path = self._body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, path)
+
+        now = time.time()
+        with self._lock:
+            previous = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries '
+                '(key, etag, last_modified, cache_control, expires, content_type, stored_at, accessed_at, size) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    key,
+                    headers.get('ETag'),
+                    headers.get('Last-Modified'),
+                    headers.get('Cache-Control'),
+                    headers.get('Expires'),
+                    headers.get('Content-Type'),
+                    now,
+                    now,
+                    len(body)
+                )
+            )
+            self.total_bytes += len(body) - (previous[0] if previous else 0)
+
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def _delete(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            if row:
+                self.total_bytes -= row[0]
+        try:
+            os.remove(self._body_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is under 90% of its bound"""
+        target = int(self.max_bytes * 0.9)
+        with self._lock:
+            rows = self._db.execute('SELECT key, size FROM entries ORDER BY accessed_at').fetchall()
+
+        evicted = 0
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            self._delete(key)
+            evicted += 1
+        logger.info(f"Evicted {evicted} entries from HTTP cache ({self.total_bytes} bytes remain)")
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            return {
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'entries': entries,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,222 @@
+import time
+import logging
+from contextlib import nullcontext
+import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+from urllib3.util.retry import Retry
+from .charset import CharsetSniffer, sniff_charset
+from .metrics import registry
+
+FETCH_BYTES = registry.counter('scraper_fetch_bytes_total', 'Page bytes fetched, by where they came from', ('source',))
+CACHE_LOOKUPS = registry.counter('scraper_http_cache_total', 'HTTP cache lookups for pages, by result', ('result',))
+RESPONSES = registry.counter('scraper_http_responses_total', 'Page responses from the network, by status class', ('status',))
+REJECTED = registry.counter('scraper_pages_rejected_total', 'Page downloads refused before or while reading the body', ('reason',))
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli  # noqa: F401 - enables urllib3's transparent br decoding
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# Media types worth handing to the extractor; anything else is refused from its headers
+PAGE_CONTENT_TYPES = {'text/html', 'application/xhtml+xml', 'application/xml', 'text/xml'}
+CHUNK_SIZE = 64 * 1024
+
+
+class PageRejected(requests.exceptions.RequestException):
+    """A page download refused before or while reading the body"""
+    reason = 'rejected'
+
+
+class UnsupportedContentType(PageRejected):
+    reason = 'content_type'
+
+
+class PageTooLarge(PageRejected):
+    reason = 'too_large'
+
+
+class PageDeadlineExceeded(PageRejected):
+    reason = 'deadline'
+
+
+def declared_charset(content_type):
+    """Charset named in a Content-Type header, if any"""
+    content_type = (content_type or '').lower()
+    if 'charset=' not in content_type:
+        return None
+    return content_type.split('charset=', 1)[1].split(';', 1)[0].strip().strip('"\'') or None
+
+
+def decode_body(body, charset):
+    """Decode with the declared charset, or hand back bytes for sniffing
+
+    body may be any bytes-like object, e.g. a view of shared memory.
+    """
+    if charset:
+        try:
+            return str(body, charset, 'replace')
+        except LookupError:
+            logger.warning(f"Unknown charset {charset}, falling back to sniffing")
+    return bytes(body)
+
+
+class HttpClient:
+    def __init__(self, headers=None, per_host_connections=4, max_hosts=64,
+                 connect_timeout=5, read_timeout=15, retries=1, cache=None,
+                 max_page_bytes=10 * 1024 * 1024, page_deadline=30):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.cache = cache
+        # Limits for fetch_page/fetch_body: decoded body size and wall-clock seconds per page
+        self.max_page_bytes = max_page_bytes
+        self.page_deadline = page_deadline
+
+        self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': ACCEPT_ENCODING})
+        if headers:
+            self.session.headers.update(headers)
+
+        # One keep-alive pool per host; pool_block caps concurrent connections per host
+        adapter = HTTPAdapter(
+            pool_connections=max_hosts,
+            pool_maxsize=per_host_connections,
+            pool_block=True,
+            max_retries=Retry(
+                total=retries,
+                connect=retries,
+                read=retries,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=('GET', 'HEAD'),
+                raise_on_status=False
+            )
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def get(self, url, timeout=None, **kwargs):
+        """Issue a GET through the shared connection pool"""
+        return self.session.get(url, timeout=timeout or self.timeout, **kwargs)
+
+    def fetch_page(self, url, timeout=None, throttle=None):
+        """Download a page once, going through the HTTP cache when one is configured
+
+        throttle is an optional callable returning a context manager that is
+        held only while a network request is in flight, so fresh cache hits
+        skip politeness delays. The body is returned as text when the charset
+        is declared or detected and as raw bytes otherwise, so trafilatura and
+        BeautifulSoup can sniff the encoding from the document itself.
+        """
+        body, charset = self.fetch_body(url, timeout=timeout, throttle=throttle)
+        return decode_body(body, charset)
+
+    def fetch_body(self, url, timeout=None, throttle=None):
+        """Like fetch_page, but return the undecoded body and its charset (or None)
+
+        Lets the caller hand raw bytes to another process and decode them
+        there. The body is streamed: non-HTML content types and oversized
+        Content-Lengths are refused from the headers, the download is cut off
+        at max_page_bytes or after page_deadline seconds (PageRejected), and
+        the charset is worked out while the bytes arrive.
+        """
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            self.cache.record_hit()
+            CACHE_LOOKUPS.inc(result='hit')
+            logger.info(f"Serving {url} from HTTP cache")
+            body = self.cache.read_body(entry)
+            FETCH_BYTES.inc(len(body), source='cache')
+            return body, sniff_charset(body, declared_charset(entry.get('content_type')))
+
+        headers = self.cache.conditional_headers(entry) if entry else {}
+        with throttle(url) if throttle else nullcontext():
+            deadline = time.monotonic() + self.page_deadline
+            timeout = timeout or (self.connect_timeout, min(self.read_timeout, self.page_deadline))
+            with self.get(url, timeout=timeout, headers=headers, stream=True) as response:
+                RESPONSES.inc(status=f"{response.status_code // 100}xx")
+                if entry and response.status_code == 304:
+                    self.cache.refresh(entry, response.headers)
+                    self.cache.record_hit(revalidated=True)
+                    CACHE_LOOKUPS.inc(result='revalidated')
+                    logger.info(f"Revalidated {url} from HTTP cache")
+                    body = self.cache.read_body(entry)
+                    FETCH_BYTES.inc(len(body), source='cache')
+                    return body, sniff_charset(body, declared_charset(entry.get('content_type')))
+
+                response.raise_for_status()
+                try:
+                    body, charset = self._read_page(url, response, deadline)
+                except PageRejected as e:
+                    REJECTED.inc(reason=e.reason)
+                    raise
+
+        FETCH_BYTES.inc(len(body), source='network')
+        if self.cache:
+            self.cache.record_miss()
+            CACHE_LOOKUPS.inc(result='miss')
+            self.cache.store(url, response.headers, body)
+        return body, charset
+
+    def _read_page(self, url, response, deadline):
+        """Stream a page body, enforcing content type, size and deadline as it arrives"""
+        content_type = response.headers.get('Content-Type')
+        media_type = (content_type or '').split(';', 1)[0].strip().lower()
+        if media_type and media_type not in PAGE_CONTENT_TYPES:
+            raise UnsupportedContentType(f"{url} is {media_type}, not a web page", response=response)
+
+        declared = response.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > self.max_page_bytes:
+            raise PageTooLarge(f"{url} declares {declared} bytes, over the {self.max_page_bytes} byte limit",
+                               response=response)
+
+        sniffer = CharsetSniffer(declared_charset(content_type))
+        chunks = []
+        size = 0
+        for chunk in self._body_chunks(response):
+            # Without a Content-Type, refuse bodies that are plainly binary
+            if not chunks and not media_type and b'\x00' in chunk[:1024] and not chunk.startswith(
+                    (b'\xff\xfe', b'\xfe\xff')):
+                raise UnsupportedContentType(f"{url} has no Content-Type and a binary body", response=response)
+            size += len(chunk)
+            if size > self.max_page_bytes:
+                raise PageTooLarge(f"{url} exceeded the {self.max_page_bytes} byte limit", response=response)
+            if time.monotonic() > deadline:
+                raise PageDeadlineExceeded(f"{url} took longer than {self.page_deadline}s to download",
+                                           response=response)
+            chunks.append(chunk)
+            sniffer.feed(chunk)
+        return b''.join(chunks), sniffer.finish()
+
+    @staticmethod
+    def _body_chunks(response):
+        """Decoded body chunks as soon as the socket has data, so limits are checked between reads
+
+        A stalled read still waits out the read timeout, so the deadline can
+        be overrun by at most that much.
+        """
+        read1 = getattr(response.raw, 'read1', None)
+        if read1 is None:
+            # urllib3 before 2.3 has no read1; each chunk may then wait for CHUNK_SIZE bytes
+            yield from response.iter_content(chunk_size=CHUNK_SIZE)
+            return
+        try:
+            while True:
+                chunk = read1(CHUNK_SIZE, decode_content=True)
+                if not chunk:
+                    return
+                yield chunk
+        except urllib3.exceptions.HTTPError as e:
+            # Raise what iter_content would, so callers only deal with requests exceptions
+            raise requests.exceptions.ConnectionError(e, response=response)
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
@@ -0,0 +1,240 @@
+import os
+import hashlib
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+IMAGES = registry.counter('scraper_images_total', 'Image downloads attempted, by outcome', ('outcome',))
+IMAGE_BYTES = registry.counter('scraper_image_bytes_total', 'Bytes of images kept')
+
+# Leading bytes identifying the image formats we keep
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'\x00\x00\x01\x00', 'ico'),
+)
+
+SNIFF_BYTES = 512
+CHUNK_SIZE = 64 * 1024
+
+
+def sniff_image_format(head):
+    """Identify an image format from its first bytes, or return None"""
+    for signature, img_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return img_format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis'):
+        return 'avif'
+    text = head.lstrip().lower()
+    if text.startswith(b'<svg') or (text.startswith(b'<?xml') and b'<svg' in text):
+        return 'svg'
+    return None
+
+
+class ImageSession:
+    """Image budget, URL dedup set and destination directory for one scraping session
+
+    With a blob store, images are kept once by content and linked into
+    images_dir; usage is recorded against owner (the session directory).
+    """
+
+    def __init__(self, images_dir, max_images=500, max_bytes=200 * 1024 * 1024,
+                 per_page_images=30, per_page_bytes=20 * 1024 * 1024, store=None, owner=None):
+        self.images_dir = images_dir
+        self.store = store
+        self.owner = owner or os.path.dirname(images_dir)
+        self.max_images = max_images
+        self.max_bytes = max_bytes
+        self.per_page_images = per_page_images
+        self.per_page_bytes = per_page_bytes
+        self.seen_urls = set()
+        self.image_count = 0
+        self.byte_count = 0
+        self._lock = threading.Lock()
+        os.makedirs(images_dir, exist_ok=True)
+
+    def claim(self, url):
+        """Reserve an image slot for a URL not seen before in this session"""
+        with self._lock:
+            if url in self.seen_urls or self.image_count >= self.max_images:
+                return False
+            self.seen_urls.add(url)
+            self.image_count += 1
+            return True
+
+    def release(self):
+        """Give back a slot claimed for an image that was not kept"""
+        with self._lock:
+            self.image_count -= 1
+
+    def consume_bytes(self, size):
+        """Account downloaded bytes against the session budget"""
+        with self._lock:
+            if self.byte_count + size > self.max_bytes:
+                return False
+            self.byte_count += size
+            return True
+
+    def refund_bytes(self, size):
+        with self._lock:
+            self.byte_count -= size
+
+
+class _PageBudget:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.byte_count = 0
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        with self._lock:
+            if self.byte_count + size > self.max_bytes:
+                return False
+            self.byte_count += size
+            return True
+
+    def refund(self, size):
+        with self._lock:
+            self.byte_count -= size
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class ImagePipeline:
+    def __init__(self, http_client, max_workers=8, max_image_bytes=5 * 1024 * 1024, timeout=10):
+        self.http = http_client
+        self.max_image_bytes = max_image_bytes
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='images')
+
+    def fetch_images(self, candidates, session):
+        """Download candidate images concurrently into the session's images directory
+
+        candidates is a list of {'url', 'alt'} dicts with absolute URLs. Returns
+        metadata for every image that was kept, in candidate order.
+        """
+        page_budget = _PageBudget(session.per_page_bytes)
+        claimed = []
+        for candidate in candidates:
+            if len(claimed) >= session.per_page_images:
+                break
+            if session.claim(candidate['url']):
+                claimed.append(candidate)
+
+        if not claimed:
+            return []
+
+        futures = [
+            self.executor.submit(self._download, candidate, session, page_budget)
+            for candidate in claimed
+        ]
+
+        images = []
+        for future in futures:
+            image = future.result()
+            if image:
+                images.append(image)
+                IMAGES.inc(outcome='kept')
+                IMAGE_BYTES.inc(image['size'])
+            else:
+                session.release()
+                IMAGES.inc(outcome='failed')
+        logger.info(f"Kept {len(images)} of {len(claimed)} images")
+        return images
+
+    def _download(self, candidate, session, page_budget):
+        """Stream one image to disk, aborting on non-images and size limits"""
+        img_url = candidate['url']
+        temp_path = None
+        consumed = 0
+        try:
+            with self.http.get(img_url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+
+                declared = response.headers.get('Content-Length')
+                if declared and declared.isdigit() and int(declared) > self.max_image_bytes:
+                    raise ImageTooLarge(f"declared size {declared} bytes")
+
+                chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+                head = self._read_head(chunks)
+                img_format = sniff_image_format(head[:SNIFF_BYTES])
+                if not img_format:
+                    raise ValueError("Content is not a recognised image format")
+
+                digest = hashlib.sha256()
+                temp_file, temp_path = self._open_temp(session)
+                with temp_file:
+                    for chunk in itertools.chain((head,), chunks):
+                        if not chunk:
+                            continue
+                        if consumed + len(chunk) > self.max_image_bytes:
+                            raise ImageTooLarge(f"exceeded {self.max_image_bytes} bytes")
+                        if not page_budget.consume(len(chunk)):
+                            raise ImageTooLarge("page image budget exhausted")
+                        if not session.consume_bytes(len(chunk)):
+                            page_budget.refund(len(chunk))
+                            raise ImageTooLarge("session image budget exhausted")
+                        consumed += len(chunk)
+                        digest.update(chunk)
+                        temp_file.write(chunk)
+
+            content_hash = digest.hexdigest()
+            filename = f"image_{content_hash}.{img_format}"
+            filepath = os.path.join(session.images_dir, filename)
+            if session.store is not None:
+                created = session.store.put_file(temp_path, content_hash)
+                temp_path = None
+                session.store.link(content_hash, filepath)
+                session.store.record(session.owner, consumed, created)
+            else:
+                os.replace(temp_path, filepath)
+                temp_path = None
+
+            return {
+                'url': img_url,
+                'filename': filename,
+                'path': filepath,
+                'format': img_format,
+                'content_hash': content_hash,
+                'alt': candidate.get('alt', ''),
+                'size': consumed
+            }
+
+        except Exception as e:
+            if consumed:
+                page_budget.refund(consumed)
+                session.refund_bytes(consumed)
+            logger.warning(f"Failed to process image {img_url}: {str(e)}")
+            return None
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _read_head(self, chunks):
+        """Pull chunks until there are enough bytes to sniff the format"""
+        head = b''
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= SNIFF_BYTES:
+                break
+        return head
+
+    def _open_temp(self, session):
+        temp_path = os.path.join(
+            session.images_dir,
+            f".download_{threading.get_ident()}_{os.urandom(4).hex()}.part"
+        )
+        return open(temp_path, 'wb'), temp_path
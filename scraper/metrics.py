@@ -0,0 +1,284 @@
+import time
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans a cache hit (milliseconds) to a slow page or LLM call (a minute)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Label value used once a metric has max_series label combinations, e.g. very many hosts
+OVERFLOW_LABEL = '_other'
+
+
+def host_label(url):
+    try:
+        return (urlsplit(url).hostname or '').lower() or 'unknown'
+    except ValueError:
+        return 'unknown'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), max_series=1000):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        if key not in self._series and len(self._series) >= self.max_series:
+            return (OVERFLOW_LABEL,) * len(self.labelnames)
+        return key
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; with a callback it is read at scrape time
+
+    The callback returns a number, or a dict of {label value tuple: number}.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), max_series=1000, callback=None):
+        super().__init__(name, documentation, labelnames, max_series)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        if self.callback is not None:
+            try:
+                values = self.callback()
+            except Exception as e:
+                logger.warning(f"Metric {self.name} callback failed: {str(e)}")
+                values = {}
+            if not isinstance(values, dict):
+                values = {(): values}
+            with self._lock:
+                self._series = {
+                    tuple(str(part) for part in (key if isinstance(key, tuple) else (key,))): value
+                    for key, value in values.items()
+                }
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), max_series=1000, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_series(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered in the Prometheus text exposition format
+
+    counter(), gauge() and histogram() return the existing metric when the
+    name is already registered, so modules can declare what they use.
+    """
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=(), **kwargs):
+        return self._register(Counter, name, documentation, labelnames, **kwargs)
+
+    def gauge(self, name, documentation, labelnames=(), **kwargs):
+        return self._register(Gauge, name, documentation, labelnames, **kwargs)
+
+    def histogram(self, name, documentation, labelnames=(), **kwargs):
+        return self._register(Histogram, name, documentation, labelnames, **kwargs)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class Tracer:
+    """Per-URL record of where a scrape spent its time, for the most recent URLs
+
+    trace(url) opens a trace on the current thread and stage() adds spans
+    to it. Stages that run elsewhere (analysis on the job thread) name the
+    URL explicitly.
+    """
+
+    def __init__(self, max_traces=500):
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, url):
+        current = getattr(self._local, 'record', None)
+        if current is not None and current['url'] == url:
+            # Already tracing this URL further up the stack; keep adding to that trace
+            yield current
+            return
+        record = {'url': url, 'started_at': time.time(), 'spans': [], '_start': time.perf_counter()}
+        with self._lock:
+            self._traces.pop(url, None)
+            self._traces[url] = record
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        previous = getattr(self._local, 'record', None)
+        self._local.record = record
+        try:
+            yield record
+        finally:
+            record['total_ms'] = round((time.perf_counter() - record['_start']) * 1000, 3)
+            self._local.record = previous
+
+    def add_span(self, stage, started, duration, url=None, **details):
+        if url is not None:
+            with self._lock:
+                record = self._traces.get(url)
+        else:
+            record = getattr(self._local, 'record', None)
+        if record is None:
+            return
+        span = {
+            'stage': stage,
+            'start_ms': round((started - record['_start']) * 1000, 3),
+            'duration_ms': round(duration * 1000, 3)
+        }
+        span.update(details)
+        with self._lock:
+            record['spans'].append(span)
+
+    def get(self, url):
+        with self._lock:
+            record = self._traces.get(url)
+            if record is None:
+                return None
+            return {key: value for key, value in record.items() if not key.startswith('_')}
+
+
+registry = MetricsRegistry()
+tracer = Tracer()
+
+STAGE_SECONDS = registry.histogram(
+    'scraper_stage_seconds', 'Time spent in each stage of scraping and processing a page', ('stage',)
+)
+
+
+@contextmanager
+def stage(name, url=None, **details):
+    """Time a stage into scraper_stage_seconds and a URL's trace
+
+    Without url the span goes to the trace open on this thread; url may
+    also be a list when one call processes several pages.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, started, time.perf_counter() - started, url, **details)
+
+
+def record_stage(name, started, duration, url=None, **details):
+    """Record a stage timed elsewhere, e.g. in an extraction worker process
+
+    started is a time.perf_counter() value; the clock is system-wide, so
+    values taken in a worker line up with the trace opened here.
+    """
+    STAGE_SECONDS.observe(duration, stage=name)
+    for target in url if isinstance(url, (list, tuple)) else [url]:
+        tracer.add_span(name, started, duration, url=target, **details)
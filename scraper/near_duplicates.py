@@ -0,0 +1,113 @@
+import re
+import hashlib
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 10
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def _shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def simhash(text, shingle_size=SHINGLE_SIZE):
+    """64-bit SimHash of a text's word shingles, or None if the text is too short
+
+    Pages that differ only in boilerplate, dates or a few edits end up a few
+    bits apart, so Hamming distance between fingerprints measures similarity.
+    """
+    tokens = TOKEN_PATTERN.findall((text or '').lower())
+    if len(tokens) < shingle_size + MIN_SHINGLES - 1:
+        return None
+
+    hashes = np.fromiter(
+        (_shingle_hash(' '.join(tokens[i:i + shingle_size])) for i in range(len(tokens) - shingle_size + 1)),
+        dtype=np.uint64
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    return int(np.packbits(votes > 0, bitorder='little').view('<u8')[0])
+
+
+class NearDuplicateIndex:
+    """LSH index of SimHash fingerprints for near-duplicate lookups
+
+    Fingerprints are split into max_distance + 1 bands. Two fingerprints
+    within max_distance bits must agree exactly on at least one band, so a
+    lookup only compares against the few pages sharing a band value instead
+    of the whole corpus.
+    """
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self._mask = (1 << self.band_bits) - 1
+        self._fingerprints = {}
+        self._tables = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def _band_values(self, fingerprint):
+        return [(fingerprint >> (band * self.band_bits)) & self._mask for band in range(self.bands)]
+
+    def _nearest(self, fingerprint, exclude=None):
+        best = None
+        seen = {exclude}
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            for key in table.get(value, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                distance = (self._fingerprints[key] ^ fingerprint).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (key, distance)
+        return best
+
+    def _add(self, key, fingerprint):
+        self._fingerprints[key] = fingerprint
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            table.setdefault(value, []).append(key)
+
+    def add(self, key, fingerprint):
+        with self._lock:
+            if key not in self._fingerprints:
+                self._add(key, fingerprint)
+
+    def discard(self, key):
+        """Remove a page, e.g. one whose processing failed after it was claimed"""
+        with self._lock:
+            fingerprint = self._fingerprints.pop(key, None)
+            if fingerprint is None:
+                return
+            for table, value in zip(self._tables, self._band_values(fingerprint)):
+                bucket = table.get(value)
+                if bucket:
+                    bucket.remove(key)
+                    if not bucket:
+                        del table[value]
+
+    def query(self, fingerprint):
+        """Return (key, distance) of the closest indexed page within max_distance, or None"""
+        with self._lock:
+            return self._nearest(fingerprint)
+
+    def match_or_add(self, key, fingerprint):
+        """Return the near-duplicate of a page if there is one, otherwise index the page
+
+        Checking and adding happen under one lock, so two copies scraped
+        concurrently can't both be treated as originals.
+        """
+        with self._lock:
+            match = self._nearest(fingerprint, exclude=key)
+            if match is None and key not in self._fingerprints:
+                self._add(key, fingerprint)
+            return match
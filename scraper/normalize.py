@@ -0,0 +1,139 @@
+import re
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Outside the Basic Multilingual Plane only tag characters and private use planes are dropped;
+# listing every unassigned astral range would make each character test walk hundreds of ranges
+ASTRAL_JUNK = (
+    (0xE0000, 0xE0FFF),
+    (0xF0000, 0x10FFFF),
+)
+# Joins documents in the batch calls; it is a control character, so it is stripped from the input anyway
+BATCH_SEPARATOR = '\x00'
+
+
+def _junk_class():
+    """Regex class of characters that are neither printable nor whitespace"""
+    ranges = []
+    start = None
+    # Starts past NUL, the batch separator, which is removed before matching
+    for code_point in range(1, 0x10000):
+        char = chr(code_point)
+        junk = not char.isprintable() and not char.isspace()
+        if junk and start is None:
+            start = code_point
+        elif not junk and start is not None:
+            ranges.append((start, code_point - 1))
+            start = None
+    if start is not None:
+        ranges.append((start, 0xFFFF))
+    ranges.extend(ASTRAL_JUNK)
+    return ''.join(
+        f'\\U{first:08x}' if first == last else f'\\U{first:08x}-\\U{last:08x}'
+        for first, last in ranges
+    )
+
+
+class TextNormalizer:
+    """Whitespace collapsing, comment/script/style removal and non-printable removal in one pass
+
+    Each call is a single re.sub with one precompiled alternation, so the
+    document is scanned once: comments and <script>/<style> blocks (an
+    unterminated one runs to the end of the document rather than being
+    rescanned from every later opener), runs of whitespace, and characters
+    that are neither printable nor whitespace. A single space between words
+    never matches, so ordinary text is skipped at C speed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = None
+
+    def _patterns(self):
+        # Building the character class walks every code point; do it once, on first use
+        with self._lock:
+            if self._compiled is None:
+                junk = _junk_class()
+                # Everything after the '<' of a comment or <script>/<style> block. No match ever
+                # spans the batch separator, so documents stay apart. Atomic, so a matched block
+                # is never reopened to look for a later closing tag
+                block = (
+                    r'(?>!--(?:[^\x00]*?-->|[^\x00]*)'
+                    r'|(?i:script)\b(?:[^\x00]*?</(?i:script)\s*>|[^\x00]*)'
+                    r'|(?i:style)\b(?:[^\x00]*?</(?i:style)\s*>|[^\x00]*))'
+                )
+                token = f'(?:(?P<ws>\\s)|[{junk}]|<{block})'
+                starts_token = f'(?:[\\s{junk}]|<(?=!--|(?i:script|style)\\b))'
+                # Both patterns open with a bare character class, which lets re skip ahead to the
+                # next candidate in a tight loop instead of trying the pattern at every position.
+                # A '<' must open a block; a single space must be followed by another token. The
+                # space check only applies to whitespace, so a block that runs to the end of the
+                # document is removed even when nothing follows it, and never tried again from
+                # each later opener. Blocks join the surrounding whitespace run, so removing one
+                # never leaves two spaces
+                html = (
+                    f'[\\s{junk}<]'
+                    f'(?:(?<=<){block}|(?<!<)(?:(?<! )|(?={starts_token})))'
+                    f'{token}*'
+                )
+                text = f'[\\s{junk}](?:(?<! )|(?=[\\s{junk}]))[\\s{junk}]*'
+                self._compiled = {
+                    'html': re.compile(html),
+                    'text': re.compile(text),
+                }
+            return self._compiled
+
+    @staticmethod
+    def _inline_space(match):
+        """Replacement for clean_html: blocks go, any whitespace run becomes one space"""
+        return ' ' if match.group('ws') is not None or match.string[match.start()].isspace() else ''
+
+    @staticmethod
+    def _text_space(match):
+        """Replacement for normalize: line breaks kept, at most one blank line in a row"""
+        run = match.group()
+        newlines = run.count('\n')
+        if newlines:
+            return '\n\n' if newlines > 1 else '\n'
+        return ' ' if any(char.isspace() for char in run) else ''
+
+    def clean_html(self, html):
+        """Drop comments, scripts and styles from HTML and collapse all whitespace to single spaces"""
+        if not html:
+            return ''
+        return self._patterns()['html'].sub(self._inline_space, _without_separator(html)).strip()
+
+    def normalize(self, text):
+        """Collapse whitespace within lines, squeeze blank lines and drop non-printables
+
+        Lines lose leading and trailing whitespace; tabs and Unicode spaces
+        become plain spaces.
+        """
+        if not text:
+            return ''
+        return self._patterns()['text'].sub(self._text_space, _without_separator(text)).strip()
+
+    def clean_html_batch(self, documents):
+        """clean_html for many documents in a single pass over all of them"""
+        return [text.strip() for text in self._batch(documents, 'html', self._inline_space)]
+
+    def normalize_batch(self, texts):
+        """normalize for many documents in a single pass over all of them"""
+        return [text.strip() for text in self._batch(texts, 'text', self._text_space)]
+
+    def _batch(self, documents, kind, replace):
+        documents = [_without_separator(document) for document in documents]
+        if not documents:
+            return []
+        joined = self._patterns()[kind].sub(replace, BATCH_SEPARATOR.join(documents))
+        return joined.split(BATCH_SEPARATOR)
+
+
+def _without_separator(text):
+    text = text or ''
+    return text.replace(BATCH_SEPARATOR, '') if BATCH_SEPARATOR in text else text
+
+
+normalizer = TextNormalizer()
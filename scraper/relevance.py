@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from collections import Counter
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalTfidf:
+    """TF-IDF over a persisted, growing vocabulary with a fixed column space
+
+    Terms get a column the first time they are seen (up to max_features) and
+    document frequencies are updated as pages arrive, so new pages never
+    require refitting. Every matrix has max_features columns, which keeps
+    vectors from different batches directly comparable.
+    """
+
+    def __init__(self, max_features=2 ** 17, stop_words='english'):
+        self.max_features = max_features
+        self.analyzer = TfidfVectorizer(stop_words=stop_words).build_analyzer()
+        self.vocabulary = {}
+        self.terms = []
+        self.doc_freq = np.zeros(max_features, dtype=np.int64)
+        self.n_docs = 0
+        self._lock = threading.RLock()
+
+    def _counts(self, texts, grow):
+        """Build a raw term-count matrix, adding unseen terms when grow is set"""
+        indptr = [0]
+        indices = []
+        data = []
+        for text in texts:
+            for term, count in Counter(self.analyzer(text or '')).items():
+                column = self.vocabulary.get(term)
+                if column is None:
+                    if not grow or len(self.terms) >= self.max_features:
+                        continue
+                    column = len(self.terms)
+                    self.vocabulary[term] = column
+                    self.terms.append(term)
+                indices.append(column)
+                data.append(count)
+            indptr.append(len(indices))
+
+        return sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(texts), self.max_features)
+        )
+
+    def idf(self, columns=None):
+        """Smoothed inverse document frequency of columns, or of every column"""
+        doc_freq = self.doc_freq if columns is None else self.doc_freq[columns]
+        return np.log((1 + self.n_docs) / (1 + doc_freq)) + 1.0
+
+    def partial_fit_transform(self, texts):
+        """Add documents to the model and return their TF-IDF rows"""
+        with self._lock:
+            counts = self._counts(texts, grow=True)
+            self.doc_freq += np.bincount(counts.indices, minlength=self.max_features)
+            self.n_docs += len(texts)
+            return self._weight(counts)
+
+    def transform(self, texts):
+        """Return TF-IDF rows without updating document frequencies"""
+        with self._lock:
+            return self._weight(self._counts(texts, grow=False))
+
+    def top_terms(self, matrix, count):
+        """The count highest-weighted (term, weight) pairs of every row, heaviest first
+
+        One sort over all non-zeros of the matrix ranks the terms within each
+        row at once.
+        """
+        matrix = sparse.csr_matrix(matrix)
+        rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+        order = np.lexsort((-matrix.data, rows))
+        rank = np.arange(len(order)) - matrix.indptr[rows[order]]
+        keep = order[rank < count]
+        top = [[] for _ in range(matrix.shape[0])]
+        with self._lock:
+            for row, column, weight in zip(rows[keep], matrix.indices[keep], matrix.data[keep]):
+                top[row].append((self.terms[column], float(weight)))
+        return top
+
+    def _weight(self, counts):
+        counts = counts.copy()
+        counts.data = 1.0 + np.log(counts.data)
+        counts.data *= self.idf(counts.indices)
+        return normalize(counts, norm='l2', copy=False)
+
+    def save(self, path):
+        """Persist the vocabulary and document frequencies
+
+        The state is written under the lock to a temp file of its own, so
+        concurrent saves can neither interleave nor install a torn file.
+        """
+        with self._lock:
+            size = len(self.terms)
+            state = {'n_docs': self.n_docs, 'terms': self.terms, 'doc_freq': self.doc_freq[:size].tolist()}
+            f = tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', dir=os.path.dirname(path) or '.', prefix=os.path.basename(path),
+                suffix='.tmp', delete=False
+            )
+            try:
+                with f:
+                    json.dump(state, f)
+                os.replace(f.name, path)
+            except BaseException:
+                if os.path.exists(f.name):
+                    os.unlink(f.name)
+                raise
+
+    def load(self, path):
+        """Restore a persisted vocabulary, ignoring terms beyond max_features"""
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        with self._lock:
+            self.terms = state['terms'][:self.max_features]
+            self.vocabulary = {term: column for column, term in enumerate(self.terms)}
+            self.doc_freq[:] = 0
+            self.doc_freq[:len(self.terms)] = state['doc_freq'][:len(self.terms)]
+            self.n_docs = state['n_docs']
+
+
+class RelevanceScorer:
+    """Scores batches of pages against the research query in one sparse product"""
+
+    def __init__(self, model=None, state_path=None, persist_interval=30.0):
+        self.model = model or IncrementalTfidf()
+        self.state_path = state_path
+        # The vocabulary is rewritten at most this often, plus on flush()
+        self.persist_interval = persist_interval
+        self._dirty = False
+        self._last_persist = time.monotonic()
+        self._persist_lock = threading.Lock()
+        if state_path and os.path.exists(state_path):
+            try:
+                self.model.load(state_path)
+                logger.info(f"Loaded relevance vocabulary with {len(self.model.terms)} terms")
+            except Exception as e:
+                logger.warning(f"Failed to load relevance vocabulary from {state_path}: {str(e)}")
+
+    def score(self, texts, query=None, context=None):
+        """Return cosine relevance of each text to the query, as a list of floats
+
+        Without a query each page is scored against the centroid of the rest
+        of the batch, which still yields scores comparable across pages; see
+        score_matrix.
+        """
+        if not texts:
+            return []
+        return self.score_matrix(self.vectorize(texts), query, context)
+
+    def vectorize(self, texts):
+        """Add texts to the model and return their TF-IDF rows, persisting the vocabulary when due"""
+        matrix = self.model.partial_fit_transform(texts)
+        self._dirty = True
+        self._persist()
+        return matrix
+
+    def score_matrix(self, matrix, query=None, context=None, centroid=None):
+        """Cosine relevance of already vectorized rows to the query
+
+        Without a query, rows are scored against centroid, the unnormalized
+        sum of the rows to compare with (by default the rows themselves),
+        minus the row being scored, so a page never counts towards its own
+        reference. A row with nothing else to compare with scores None.
+        """
+        if matrix.shape[0] == 0:
+            return []
+
+        query_text = ' '.join(part for part in (query, context) if part)
+        if query_text:
+            target = self.model.transform([query_text])
+            scores = (matrix @ target.T).toarray().ravel()
+            return [float(score) for score in scores]
+
+        if centroid is None:
+            centroid = matrix.sum(axis=0)
+        centroid = np.asarray(centroid).ravel()
+        # With s the centroid and r a row: cos(r, s - r) = (r.s - |r|^2) / |s - r|, for every row at once
+        dots = matrix @ centroid
+        row_norms = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+        reference_norms = np.sqrt(np.maximum(centroid @ centroid - 2 * dots + row_norms, 0.0))
+        return [
+            float((dot - row_norm) / norm) if norm > 1e-9 else None
+            for dot, row_norm, norm in zip(dots, row_norms, reference_norms)
+        ]
+
+    def flush(self):
+        """Persist the vocabulary now if it changed since it was last saved"""
+        self._persist(force=True)
+
+    def _persist(self, force=False):
+        if not self.state_path:
+            return
+        with self._persist_lock:
+            if not self._dirty:
+                return
+            if not force and time.monotonic() - self._last_persist < self.persist_interval:
+                return
+            self._dirty = False
+            self._last_persist = time.monotonic()
+            try:
+                self.model.save(self.state_path)
+            except Exception as e:
+                self._dirty = True
+                logger.warning(f"Failed to persist relevance vocabulary: {str(e)}")
@@ -0,0 +1,136 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+logger = logging.getLogger(__name__)
+
+
+class RobotsEntry:
+    """Parsed robots.txt for one origin and when it stops being fresh"""
+
+    def __init__(self, parser, expires_at, crawl_delay=None):
+        self.parser = parser
+        self.expires_at = expires_at
+        self.crawl_delay = crawl_delay
+
+
+class RobotsCache:
+    """robots.txt rules per origin, fetched through the shared HTTP client
+
+    Entries live for ttl seconds and the least recently used origins are
+    evicted past max_origins. Fetch failures (timeouts, 5xx) are cached as
+    allow-all for negative_ttl seconds so an unreachable host is not retried
+    for every page. Concurrent lookups for one origin share a single fetch.
+    """
+
+    def __init__(self, http, user_agent, ttl=24 * 3600, negative_ttl=600, max_origins=2048,
+                 timeout=(2, 3), max_crawl_delay=30):
+        self.http = http
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_origins = max_origins
+        self.timeout = timeout
+        self.max_crawl_delay = max_crawl_delay
+        self._entries = OrderedDict()
+        self._fetching = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def origin(url):
+        parts = urlsplit(url)
+        return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+    def _fetch(self, origin):
+        robots_url = f"{origin}/robots.txt"
+        parser = RobotFileParser()
+        parser.set_url(robots_url)
+        try:
+            response = self.http.get(robots_url, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Failed to fetch {robots_url}: {str(e)}")
+            parser.allow_all = True
+            return RobotsEntry(parser, time.monotonic() + self.negative_ttl)
+
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif 400 <= response.status_code < 500:
+            parser.allow_all = True
+        elif response.status_code >= 500:
+            logger.warning(f"{robots_url} returned {response.status_code}, allowing for now")
+            parser.allow_all = True
+            return RobotsEntry(parser, time.monotonic() + self.negative_ttl)
+        else:
+            parser.parse(response.text.splitlines())
+        return RobotsEntry(parser, time.monotonic() + self.ttl, self._crawl_delay(parser))
+
+    def _crawl_delay(self, parser):
+        """Seconds between requests asked for by Crawl-delay or Request-rate, if any"""
+        delay = None
+        try:
+            delay = parser.crawl_delay(self.user_agent)
+            rate = parser.request_rate(self.user_agent)
+            if rate and rate.requests:
+                delay = max(float(delay or 0), rate.seconds / rate.requests)
+        except (TypeError, ValueError):
+            return None
+        if delay is None:
+            return None
+        return min(float(delay), self.max_crawl_delay)
+
+    def entry(self, url):
+        """Rules for the URL's origin, fetching them unless a fresh copy is cached"""
+        origin = self.origin(url)
+        with self._lock:
+            entry = self._entries.get(origin)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(origin)
+                return entry
+            pending = self._fetching.get(origin)
+            owner = pending is None
+            if owner:
+                pending = self._fetching[origin] = threading.Event()
+
+        if not owner:
+            # The owner always sets the event, even when its fetch fails
+            pending.wait()
+            with self._lock:
+                entry = self._entries.get(origin)
+            if entry is not None:
+                return entry
+            return self._fetch(origin)
+
+        try:
+            entry = self._fetch(origin)
+            with self._lock:
+                self._entries[origin] = entry
+                self._entries.move_to_end(origin)
+                while len(self._entries) > self.max_origins:
+                    self._entries.popitem(last=False)
+            return entry
+        finally:
+            with self._lock:
+                del self._fetching[origin]
+            pending.set()
+
+    def can_fetch(self, url):
+        return self.entry(url).parser.can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        return self.entry(url).crawl_delay
+
+    def prefetch(self, urls, max_workers=8):
+        """Fetch robots.txt for every origin among urls concurrently; returns {origin: entry}"""
+        origins = list(OrderedDict.fromkeys(self.origin(url) for url in urls if urlsplit(url).netloc))
+        if not origins:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(origins)), thread_name_prefix='robots') as executor:
+            entries = executor.map(lambda origin: self.entry(origin + '/'), origins)
+            return dict(zip(origins, entries))
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT = registry.gauge('scraper_tasks_in_flight', 'Scrape tasks running on scheduler workers')
+
+
+def _tracked(task):
+    def run(index, url):
+        IN_FLIGHT.inc()
+        try:
+            return task(index, url)
+        finally:
+            IN_FLIGHT.dec()
+    return run
+
+
+def host_key(url):
+    """Return the host a URL belongs to for politeness accounting"""
+    try:
+        return urlparse(url).netloc.lower()
+    except Exception:
+        return ''
+
+
+class ScrapeCancelled(Exception):
+    pass
+
+
+class HostLimiter:
+    def __init__(self, per_host_limit=2, delay=1):
+        self.per_host_limit = per_host_limit
+        self.delay = delay  # Seconds between requests to the same host
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_allowed = {}
+        self._host_delays = {}  # Per-host overrides, e.g. from robots.txt Crawl-delay
+
+    def set_delay(self, url, delay):
+        """Space requests to the URL's host by delay seconds (never less than the default)"""
+        host = host_key(url)
+        with self._lock:
+            if delay is None or delay <= self.delay:
+                self._host_delays.pop(host, None)
+            else:
+                self._host_delays[host] = delay
+
+    def delay_for(self, url):
+        with self._lock:
+            return self._host_delays.get(host_key(url), self.delay)
+
+    def _get_slot(self, host):
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._slots[host]
+
+    def _reserve_start(self, host):
+        """Reserve the next start time for a host and return how long to wait"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = start + self._host_delays.get(host, self.delay)
+            return start - now
+
+    @contextmanager
+    def acquire(self, url, cancel_event=None):
+        """Hold a per-host slot, waiting out the politeness delay for that host only
+
+        Waiting is abandoned with ScrapeCancelled once cancel_event is set.
+        """
+        host = host_key(url)
+        slot = self._get_slot(host)
+        while not slot.acquire(timeout=0.5):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ScrapeCancelled(url)
+        try:
+            wait = self._reserve_start(host)
+            if wait > 0:
+                logger.debug(f"Waiting {wait:.2f}s before requesting {host}")
+                if cancel_event is None:
+                    time.sleep(wait)
+                elif cancel_event.wait(wait):
+                    raise ScrapeCancelled(url)
+            yield
+        finally:
+            slot.release()
+
+
+class ScrapeScheduler:
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+
+    def _interleave_by_host(self, items):
+        """Order (index, url) pairs round-robin across hosts so one host can't hog the pool"""
+        by_host = OrderedDict()
+        for index, url in items:
+            by_host.setdefault(host_key(url), deque()).append((index, url))
+
+        ordered = []
+        while by_host:
+            for host in list(by_host):
+                ordered.append(by_host[host].popleft())
+                if not by_host[host]:
+                    del by_host[host]
+        return ordered
+
+    def run(self, urls, task, indexes=None, should_stop=None):
+        """Run task(index, url) for every URL and yield (index, url, result, error) as they finish
+
+        indexes defaults to 1..n. Once should_stop() returns true, tasks that have
+        not started yet are cancelled and never yielded.
+        """
+        if indexes is None:
+            indexes = range(1, len(urls) + 1)
+        items = self._interleave_by_host(zip(indexes, urls))
+        if not items:
+            return
+
+        task = _tracked(task)
+        workers = max(1, min(self.max_workers, len(items)))
+        logger.info(f"Scheduling {len(items)} URLs across {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scrape') as executor:
+            futures = {
+                executor.submit(task, index, url): (index, url)
+                for index, url in items
+            }
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                index, url = futures[future]
+                try:
+                    yield index, url, future.result(), None
+                except Exception as e:
+                    yield index, url, None, e
+
+                if should_stop and should_stop():
+                    for pending in futures:
+                        pending.cancel()
+
+    def crawl(self, next_item, task, should_stop=None):
+        """Run task(index, url) for items pulled from next_item() and yield (index, url, result, error)
+
+        next_item() returns an (index, url) pair or None when nothing is ready.
+        Results are yielded on the calling thread before more work is pulled,
+        so the caller can queue links found on a page before the pool refills.
+        The crawl ends when nothing is in flight and next_item() has nothing.
+        """
+        task = _tracked(task)
+        in_flight = {}
+        stopping = False
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='crawl') as executor:
+            while True:
+                while not stopping and len(in_flight) < self.max_workers:
+                    item = next_item()
+                    if item is None:
+                        break
+                    index, url = item
+                    in_flight[executor.submit(task, index, url)] = item
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, url = in_flight.pop(future)
+                    try:
+                        yield index, url, future.result(), None
+                    except Exception as e:
+                        yield index, url, None, e
+
+                if should_stop and should_stop():
+                    stopping = True
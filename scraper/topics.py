@@ -0,0 +1,187 @@
+import logging
+import threading
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+LABEL_TERMS = 5
+# Pages kept per topic as candidates for its representative, re-ranked against the current centroid
+REPRESENTATIVE_CANDIDATES = 5
+# Pages buffered per topic before the centroids are seeded with k-means++
+SEED_PAGES_PER_TOPIC = 3
+# Pages assigned between two centroid updates: a quarter of the pages clustered so far, within
+# these bounds. An update works on the dense centroids, so its cost is spread over more pages
+# the larger the session grows
+MIN_UPDATE_PAGES = 16
+MAX_UPDATE_PAGES = 256
+
+
+class TopicClusterer:
+    """Streaming topic clustering of TF-IDF rows with MiniBatchKMeans
+
+    Rows are fed a chunk at a time: the first SEED_PAGES_PER_TOPIC pages per
+    topic seed the centroids, after which each page is assigned to its
+    nearest topic on arrival with one sparse product. The centroids move in
+    partial_fit steps over the pages assigned since the last step, taken
+    once those reach a quarter of the session (MIN_UPDATE_PAGES to
+    MAX_UPDATE_PAGES). Memory is bounded by the centroids (n_topics x the
+    model's fixed column count), at most MAX_UPDATE_PAGES buffered rows and
+    a few candidate rows per topic, however many pages the session has. Pages keep the topic they were nearest to
+    on arrival while the centroids go on moving. Pages buffered for seeding
+    get their topic once the centroids are seeded, by a later chunk or by
+    seed_pending(); pop_seeded() hands them back to the caller.
+    """
+
+    def __init__(self, model, n_topics=8, random_state=0):
+        self.model = model
+        self.n_topics = n_topics
+        self.random_state = random_state
+        self.kmeans = MiniBatchKMeans(n_clusters=n_topics, random_state=random_state)
+        self.counts = np.zeros(n_topics, dtype=np.int64)
+        self._fitted = False
+        self._pending = []
+        self._unfitted = []
+        self._centers = None
+        self._seeded = []
+        self._candidates = [[] for _ in range(n_topics)]
+        self._lock = threading.Lock()
+
+    def _pending_pages(self):
+        return sum(matrix.shape[0] for matrix, _ in self._pending)
+
+    def add(self, matrix, urls):
+        """Cluster a chunk of rows and return each one's topic, or None while the centroids are seeded"""
+        if not urls:
+            return []
+        with self._lock:
+            if self._fitted:
+                labels = self._assign(matrix, urls)
+                self._unfitted.append(matrix)
+                if sum(rows.shape[0] for rows in self._unfitted) >= self._update_pages():
+                    self._flush()
+                return [int(label) for label in labels]
+
+            self._pending.append((matrix, list(urls)))
+            if self._pending_pages() < self.n_topics * SEED_PAGES_PER_TOPIC:
+                return [None] * len(urls)
+            # The buffered pages seed the centroids along with this chunk
+            seeded_urls, labels = self._seed()
+            labels = [int(label) for label in labels]
+            self._seeded.extend(zip(seeded_urls[:-len(urls)], labels[:-len(urls)]))
+            return labels[-len(urls):]
+
+    def seed_pending(self):
+        """Seed the centroids from the pages buffered so far, for a session that ends before seeding
+
+        With fewer pages than topics there are only as many topics as
+        pages, as in the summary() preview.
+        """
+        with self._lock:
+            if self._fitted or not self._pending:
+                return
+            pages = self._pending_pages()
+            if pages < self.n_topics:
+                self.n_topics = pages
+                self.kmeans = MiniBatchKMeans(n_clusters=pages, random_state=self.random_state)
+                self.counts = np.zeros(pages, dtype=np.int64)
+                self._candidates = [[] for _ in range(pages)]
+            seeded_urls, labels = self._seed()
+            self._seeded.extend(zip(seeded_urls, (int(label) for label in labels)))
+
+    def pop_seeded(self):
+        """(url, topic) of pages that were given None and have been seeded since"""
+        with self._lock:
+            seeded, self._seeded = self._seeded, []
+            return seeded
+
+    def _seed(self):
+        matrix = sparse.vstack([rows for rows, _ in self._pending], format='csr')
+        urls = [url for _, pending_urls in self._pending for url in pending_urls]
+        self._pending = []
+        self._fitted = True
+        self._update(matrix)
+        return urls, self._assign(matrix, urls)
+
+    def _flush(self):
+        if self._unfitted:
+            self._update(sparse.vstack(self._unfitted, format='csr'))
+            self._unfitted = []
+
+    def _update_pages(self):
+        return min(MAX_UPDATE_PAGES, max(MIN_UPDATE_PAGES, int(self.counts.sum()) // 4))
+
+    def _update(self, matrix):
+        """One partial_fit step of the centroids over matrix"""
+        self.kmeans.partial_fit(matrix)
+        # Spherical k-means: on unit-length centroids Euclidean assignment is cosine similarity,
+        # so a diffuse centroid averaged over unrelated pages can't end up nearest to everything
+        normalize(self.kmeans.cluster_centers_, copy=False)
+        # Laid out column-major once per update rather than copied by every sparse product
+        self._centers = np.ascontiguousarray(self.kmeans.cluster_centers_.T)
+
+    def _assign(self, matrix, urls):
+        """Label rows with their nearest centroid and count them in"""
+        # Rows and centroids are unit length, so the nearest centroid is the most similar one.
+        # Rows against every centroid is only chunk x n_topics, unlike gathering a centroid per row
+        scores = np.asarray(matrix @ self._centers)
+        labels = scores.argmax(axis=1)
+        similarities = scores[np.arange(len(labels)), labels]
+        self.counts += np.bincount(labels, minlength=self.n_topics)
+
+        for row, (label, similarity, url) in enumerate(zip(labels, similarities, urls)):
+            candidates = self._candidates[label]
+            candidates.append((float(similarity), url, matrix[row]))
+            if len(candidates) > REPRESENTATIVE_CANDIDATES:
+                candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+                candidates.pop()
+        return labels
+
+    def summary(self):
+        """Topics by size, each with its label terms, page count and the page nearest its centroid
+
+        Before the centroids are seeded the buffered pages are clustered on
+        their own, into at most as many topics as there are pages. After,
+        the pages assigned since the last centroid update are fitted first.
+        """
+        with self._lock:
+            if self._fitted:
+                self._flush()
+                return self._summary()
+            pages = self._pending_pages()
+            if not pages:
+                return []
+            preview = TopicClusterer(self.model, min(self.n_topics, pages), self.random_state)
+            preview._pending = list(self._pending)
+            preview._seed()
+            return preview._summary()
+
+    def _summary(self):
+        centers = self.kmeans.cluster_centers_
+        label_terms = min(LABEL_TERMS, centers.shape[1])
+        topics = []
+        for topic in np.argsort(-self.counts, kind='stable'):
+            if not self.counts[topic]:
+                continue
+            center = centers[topic]
+            columns = np.argpartition(-center, label_terms - 1)[:label_terms]
+            columns = columns[np.argsort(-center[columns])]
+            terms = [self.model.terms[column] for column in columns if center[column] > 0]
+
+            representative = None
+            if self._candidates[topic]:
+                similarity, url = max(
+                    (float((row @ center)[0]), url) for _, url, row in self._candidates[topic]
+                )
+                representative = {'url': url, 'similarity': round(similarity, 4)}
+
+            topics.append({
+                'topic': int(topic),
+                'label': ', '.join(terms[:3]),
+                'terms': terms,
+                'pages': int(self.counts[topic]),
+                'representative': representative
+            })
+        return topics
@@ -0,0 +1,59 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """Return a canonical form of a URL for cache keys and visited checks
+
+    Lowercases scheme and host, drops default ports and fragments, sorts the
+    query string and gives empty paths a trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host
+    if port and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else '')
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+# Query parameters that only track campaigns or clicks and never change the page
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'ref_src'}
+
+
+def canonicalize_url(url):
+    """Normalize a URL and also drop tracking parameters and dot segments
+
+    Used to decide whether two links point at the same page during a crawl.
+    """
+    parts = urlsplit(normalize_url(url))
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ])
+
+    path = parts.path
+    if '/.' in path or '//' in path:
+        segments = []
+        for segment in path.split('/'):
+            if segment == '..':
+                if len(segments) > 1:
+                    segments.pop()
+            elif segment != '.' and (segment or not segments):
+                segments.append(segment)
+        path = '/'.join(segments) or '/'
+        if parts.path.endswith(('/', '/.', '/..')) and not path.endswith('/'):
+            path += '/'
+    return urlunsplit((parts.scheme, parts.netloc, path, query, ''))
@@ -1,257 +1,210 @@
-import trafilatura
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import time
+from urllib.parse import urlparse
 import logging
-from urllib.robotparser import RobotFileParser
-import re
-import os
-import hashlib
-from PIL import Image
-from io import BytesIO
+from functools import partial
+from .scheduler import HostLimiter, ScrapeCancelled
+from .http_client import HttpClient
+from .image_pipeline import ImagePipeline
+from .http_cache import HttpCache
+from .document import ParsedDocument
+from .robots import RobotsCache
+from .extraction import ExtractionPool, ExtractedPage
+from .metrics import registry, tracer, stage, record_stage, host_label
+
+PAGES = registry.counter('scraper_pages_total', 'Pages passed to scrape_website, by outcome', ('outcome',))
+HOST_ERRORS = registry.counter('scraper_host_errors_total', 'Failed page scrapes per host', ('host', 'error'))
+ROBOTS_BLOCKED = registry.counter('scraper_robots_blocked_total', 'Pages skipped because robots.txt disallows them', ('host',))
 
 logger = logging.getLogger(__name__)
 
 class WebCrawler:
-    def __init__(self):
+    def __init__(self, http_client=None, cache_dir=None, extractor=None):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (compatible; IntelligentScraper/1.0)'
         }
-        self.visited_urls = set()
-        self.delay = 1  # Seconds between requests
-        self.robots_cache = {}
+        self.http = http_client or HttpClient(
+            headers=self.headers,
+            cache=HttpCache(cache_dir) if cache_dir else None
+        )
+        self.image_pipeline = ImagePipeline(self.http)
+        # Parsing and extraction run here; without a pool they run inline on the scrape thread
+        self.extractor = extractor or ExtractionPool(workers=0)
+        self.delay = 1  # Default seconds between requests to the same host
+        self.robots = RobotsCache(self.http, self.headers['User-Agent'])
+        self.host_limiter = HostLimiter(per_host_limit=2, delay=self.delay)
+
+    def prefetch_robots(self, urls):
+        """Fetch robots.txt for all hosts of a job up front, in parallel"""
+        try:
+            for origin, entry in self.robots.prefetch(urls).items():
+                self.host_limiter.set_delay(origin, entry.crawl_delay)
+        except Exception as e:
+            logger.warning(f"Failed to prefetch robots.txt: {str(e)}")
 
     def _check_robots_txt(self, url):
-        """Check if scraping is allowed by robots.txt"""
+        """Check if scraping is allowed by robots.txt, applying the host's Crawl-delay"""
         try:
-            parsed_url = urlparse(url)
-            robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
-            
-            if robots_url not in self.robots_cache:
-                rp = RobotFileParser()
-                rp.set_url(robots_url)
-                rp.read()
-                self.robots_cache[robots_url] = rp
-            
-            return self.robots_cache[robots_url].can_fetch(self.headers['User-Agent'], url)
+            entry = self.robots.entry(url)
+            self.host_limiter.set_delay(url, entry.crawl_delay)
+            return entry.parser.can_fetch(self.headers['User-Agent'], url)
         except Exception as e:
             logger.warning(f"Failed to check robots.txt for {url}: {str(e)}")
             return True  # Allow by default if robots.txt check fails
 
-    def _clean_content(self, content):
-        """Clean and normalize the extracted content"""
-        # Remove script and style elements
-        content = re.sub(r'<(script|style)[^>]*>.*?</\1>', '', content, flags=re.DOTALL)
-        # Remove HTML comments
-        content = re.sub(r'<!--.*?-->', '', content, flags=re.DOTALL)
-        # Remove extra whitespace
-        content = re.sub(r'\s+', ' ', content)
-        # Remove empty lines
-        content = re.sub(r'^\s*$\n', '', content, flags=re.MULTILINE)
-        return content.strip()
+    def _as_document(self, html_content, base_url=None):
+        """Accept either raw HTML or an already parsed document"""
+        if isinstance(html_content, (ParsedDocument, ExtractedPage)):
+            return html_content
+        return ParsedDocument(html_content, base_url)
 
     def extract_text_content(self, html_content):
-        """Extract clean text content from HTML using BeautifulSoup"""
+        """Extract clean paragraph and heading text from HTML or a parsed document"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Remove unwanted elements
-            for element in soup(['script', 'style', 'nav', 'footer', 'header']):
-                element.decompose()
-            
-            # Get all text elements
-            paragraphs = []
-            for element in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                text = element.get_text(strip=True)
-                if text:  # Only add non-empty paragraphs
-                    if element.name.startswith('h'):
-                        paragraphs.append(f"\n# {text}\n")
-                    else:
-                        paragraphs.append(text)
-            
-            return '\n\n'.join(paragraphs)
+            return self._as_document(html_content).text()
         except Exception as e:
             logger.error(f"Error extracting text content: {str(e)}", exc_info=True)
             return None
 
-    def extract_images(self, html_content, base_url):
-        """Extract and download images from HTML content"""
+    def extract_images(self, html_content, base_url, image_session=None):
+        """Extract image references and download them through the image pipeline
+
+        Without an image_session only the references are returned; with one the
+        images are streamed into the session's images directory.
+        """
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            images = []
-            
-            for img in soup.find_all('img'):
-                src = img.get('src')
-                if not src:
-                    continue
-                
-                # Get absolute URL
-                img_url = urljoin(base_url, src)
-                
-                try:
-                    # Download image
-                    response = requests.get(img_url, headers=self.headers, timeout=10)
-                    response.raise_for_status()
-                    
-                    # Verify it's an image
-                    img_content = BytesIO(response.content)
-                    img_obj = Image.open(img_content)
-                    
-                    # Get image format and generate filename
-                    img_format = img_obj.format.lower() if img_obj.format else 'jpg'
-                    img_hash = hashlib.md5(response.content).hexdigest()[:10]
-                    filename = f"image_{img_hash}.{img_format}"
-                    
-                    # Add to images list
-                    images.append({
-                        'url': img_url,
-                        'content': response.content,
-                        'filename': filename,
-                        'format': img_format,
-                        'alt': img.get('alt', ''),
-                        'size': len(response.content)
-                    })
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to process image {img_url}: {str(e)}")
-                    continue
-            
-            return images
+            document = self._as_document(html_content, base_url)
+            candidates = [
+                {'url': image['url'], 'alt': image['alt']}
+                for image in document.images()
+                if self.is_valid_url(image['url'])
+            ]
+
+            if image_session is None:
+                return candidates
+
+            return self.image_pipeline.fetch_images(candidates, image_session)
             
         except Exception as e:
             logger.error(f"Error extracting images: {str(e)}", exc_info=True)
             return []
 
-    def _normalize_url(self, base_url, relative_url):
-        """Normalize relative URLs to absolute URLs"""
-        try:
-            return urljoin(base_url, relative_url)
-        except Exception as e:
-            logger.error(f"Error normalizing URL {relative_url} with base {base_url}: {str(e)}")
-            return None
-
-    def _extract_links(self, soup, base_url):
+    def _extract_links(self, document, base_url):
         """Extract and normalize all links from the page"""
-        links = set()
         try:
-            for anchor in soup.find_all('a', href=True):
-                href = anchor['href']
-                if href.startswith('#') or href.startswith('javascript:'):
-                    continue
-                    
-                absolute_url = self._normalize_url(base_url, href)
-                if absolute_url and self.is_valid_url(absolute_url):
-                    links.add(absolute_url)
-                    
+            links = set(self._as_document(document, base_url).links)
             logger.info(f"Found {len(links)} valid links on {base_url}")
             return links
         except Exception as e:
             logger.error(f"Error extracting links from {base_url}: {str(e)}")
             return set()
 
-    def scrape_website(self, url, progress_callback=None):
-        """Scrape content from a given URL with enhanced content cleaning and error handling"""
+    def _build_content(self, url, page, image_session, duplicate_check=None):
+        """Assemble the scraped content from an extracted page
+
+        duplicate_check(text) may return a match for a page seen before; the
+        content is then marked with duplicate_of and its images are not fetched.
+        """
+        text = page.text()
+        with stage('dedupe'):
+            duplicate_of = duplicate_check(text) if duplicate_check else None
+        if duplicate_of:
+            logger.info(f"{url} is a near-duplicate of a page already scraped")
+            images = []
+        else:
+            with stage('images'):
+                images = self.extract_images(page, url, image_session)
+        return {
+            'html': page.html,
+            'text': text,
+            'images': images,
+            'url': url,
+            'metadata': page.metadata,
+            'links': page.links,
+            'link_contexts': page.link_contexts,
+            'canonical_url': page.canonical_url,
+            'document': page,
+            'duplicate_of': duplicate_of
+        }
+
+    def scrape_website(self, url, progress_callback=None, image_session=None, cancel_event=None,
+                       duplicate_check=None):
+        """Scrape content from a given URL with enhanced content cleaning and error handling
+
+        Every stage is timed into scraper_stage_seconds and the URL's trace.
+        """
+        outcome = 'failed'
+        try:
+            with tracer.trace(url), stage('page'):
+                content = self._scrape_website(url, progress_callback, image_session, cancel_event, duplicate_check)
+            if content:
+                outcome = 'duplicate' if content.get('duplicate_of') else 'scraped'
+            return content
+        except ScrapeCancelled:
+            outcome = 'cancelled'
+            raise
+        finally:
+            PAGES.inc(outcome=outcome)
+
+    def _scrape_website(self, url, progress_callback, image_session, cancel_event, duplicate_check):
         try:
             if not self.is_valid_url(url):
                 raise ValueError(f"Invalid URL format: {url}")
 
-            if url in self.visited_urls:
-                logger.info(f"Skipping already visited URL: {url}")
-                return None
-
-            if not self._check_robots_txt(url):
+            with stage('robots'):
+                allowed = self._check_robots_txt(url)
+            if not allowed:
                 logger.warning(f"Robots.txt disallows scraping: {url}")
+                ROBOTS_BLOCKED.inc(host=host_label(url))
                 return None
-
-            # Respect rate limiting
-            time.sleep(self.delay)
-            self.visited_urls.add(url)
             
             logger.info(f"Starting to scrape: {url}")
             if progress_callback:
                 progress_callback(f"Starting to scrape {url}", 0)
             
-            # Try trafilatura first for main content extraction
-            logger.info(f"Attempting to scrape content from: {url}")
-            downloaded = trafilatura.fetch_url(url)
-            if downloaded:
-                main_content = trafilatura.extract(
-                    downloaded,
-                    include_images=True,
-                    include_links=True,
-                    output_format='html',
-                    with_metadata=True
-                )
-                
-                if main_content:
-                    html_content = self._clean_content(main_content)
-                    text_content = self.extract_text_content(html_content)
-                    images = self.extract_images(html_content, url)
-                    
-                    logger.info(f"Successfully extracted content from {url}")
-                    return {
-                        'html': html_content,
-                        'text': text_content,
-                        'images': images,
-                        'url': url
-                    }
-
-            # Fallback to BeautifulSoup if trafilatura fails
-            logger.info(f"Trafilatura extraction failed, falling back to BeautifulSoup for {url}")
+            # Download the page once; both extraction paths share the body
             logger.info(f"Downloading content from: {url}")
             if progress_callback:
                 progress_callback(f"Downloading content from {url}", 20)
-                
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            
+
+            # Respect per-host rate limiting for requests that reach the network
+            with stage('fetch'):
+                body, charset = self.http.fetch_body(
+                    url,
+                    throttle=partial(self.host_limiter.acquire, cancel_event=cancel_event)
+                )
+
             logger.info(f"Parsing content from: {url}")
             if progress_callback:
                 progress_callback(f"Parsing content from {url}", 40)
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract links before cleaning
-            links = self._extract_links(soup, url)
-            logger.info(f"Found {len(links)} links on {url}")
-            
-            # Remove unwanted elements
-            for element in soup(['script', 'style', 'nav', 'footer', 'iframe', 'header']):
-                element.decompose()
-                
+
+            # Parsing, trafilatura and cleaning are CPU-bound; they run in the extraction pool
+            with stage('extract'):
+                page = self.extractor.extract(url, body, charset)
+            for name, started, duration in page.timings:
+                record_stage(name, started, duration)
+
             if progress_callback:
                 progress_callback(f"Processing content from {url}", 60)
-            
-            # Extract main content
-            main_content = soup.find('main') or soup.find('article') or soup.find('div', {'class': ['content', 'main', 'article']})
-            
-            if not main_content:
-                main_content = soup.body if soup.body else soup
-            
-            html_content = str(main_content)
-            html_content = self._clean_content(html_content)
-            
-            if not html_content.strip():
+
+            if page.html is None:
                 logger.warning(f"No content extracted from {url}")
                 return None
-            
-            text_content = self.extract_text_content(html_content)
-            images = self.extract_images(html_content, url)
-            
-            logger.info(f"Successfully extracted content using fallback method from {url}")
-            return {
-                'html': html_content,
-                'text': text_content,
-                'images': images,
-                'url': url
-            }
 
+            if page.method == 'fallback':
+                logger.info(f"Successfully extracted content using fallback method from {url}")
+            else:
+                logger.info(f"Successfully extracted content from {url}")
+            return self._build_content(url, page, image_session, duplicate_check)
+
+        except ScrapeCancelled:
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed for {url}: {str(e)}")
+            HOST_ERRORS.inc(host=host_label(url), error=type(e).__name__)
             return None
         except Exception as e:
             logger.error(f"Error scraping {url}: {str(e)}", exc_info=True)
+            HOST_ERRORS.inc(host=host_label(url), error=type(e).__name__)
             return None
 
     def is_valid_url(self, url):
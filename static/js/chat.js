@@ -58,6 +58,14 @@ document.addEventListener('DOMContentLoaded', function() {
     let isScrapingPaused = false;
     let currentProgress = 0;
 
+    // Background scraping job currently being tracked
+    let currentJobId = null;
+    const JOB_POLL_INTERVAL = 2000;
+
+    // Research topic and LLM context sent along with scrape requests for relevance scoring
+    let researchQuery = '';
+    let researchContext = '';
+
     // Event Listeners with null checks
     if (elements.drawerToggle && elements.drawer && elements.drawerWrapper) {
         elements.drawerToggle.addEventListener('click', () => {
@@ -99,16 +107,38 @@ document.addEventListener('DOMContentLoaded', function() {
     // SSE Setup with improved error handling
     let eventSource = null;
     let reconnectAttempts = 0;
+    let lastEventId = null;
     const MAX_RECONNECT_ATTEMPTS = 3;
 
+    // Stable per-tab id so the server can route events to this page
+    const clientId = sessionStorage.getItem('scraperClientId') ||
+        (window.crypto && crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`);
+    sessionStorage.setItem('scraperClientId', clientId);
+
+    function clientHeaders(headers = {}) {
+        return { ...headers, 'X-Client-Id': clientId };
+    }
+
+    function trackEventId(e) {
+        if (e.lastEventId) {
+            lastEventId = e.lastEventId;
+        }
+    }
+
     function setupEventSource() {
         if (eventSource) {
             eventSource.close();
         }
 
-        eventSource = new EventSource("/stream");
+        // Resume from the last event we saw so nothing published meanwhile is lost
+        const params = new URLSearchParams({ client_id: clientId });
+        if (lastEventId) {
+            params.set('last_event_id', lastEventId);
+        }
+        eventSource = new EventSource(`/stream?${params.toString()}`);
         
         eventSource.addEventListener('log', function(e) {
+            trackEventId(e);
             try {
                 const data = JSON.parse(e.data);
                 addLogMessage(data.message, data.level);
@@ -118,6 +148,7 @@ document.addEventListener('DOMContentLoaded', function() {
         });
 
         eventSource.addEventListener('progress', function(e) {
+            trackEventId(e);
             try {
                 const data = JSON.parse(e.data);
                 updateProgress(data);
@@ -200,26 +231,109 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Folder listings already loaded, keyed by path and offset, for conditional requests
+    const folderCache = new Map();
+    const FOLDER_PAGE_SIZE = 200;
+
+    async function fetchFolder(path = '', offset = 0) {
+        const key = `${path}|${offset}`;
+        const cached = folderCache.get(key);
+        const headers = cached ? { 'If-None-Match': `"${cached.etag}"` } : {};
+        const response = await fetch(
+            `/api/folder-structure?path=${encodeURIComponent(path)}&offset=${offset}&limit=${FOLDER_PAGE_SIZE}`,
+            { headers, cache: 'no-store' }
+        );
+        if (response.status === 304 && cached) {
+            return { data: cached, changed: false };
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+        folderCache.set(key, data);
+        return { data, changed: true };
+    }
+
+    // Crawl settings from the website form, or null to scrape only the selected pages
+    function crawlOptions() {
+        const crawlMode = document.getElementById('crawl-mode');
+        if (!crawlMode || !crawlMode.checked) {
+            return null;
+        }
+        return {
+            max_depth: parseInt(document.getElementById('crawl-depth').value, 10) || 0,
+            max_pages: parseInt(document.getElementById('crawl-pages').value, 10) || 1,
+            same_domain: true,
+            // With a research topic, follow the most on-topic links first
+            focused: Boolean(researchQuery || researchContext)
+        };
+    }
+
     async function updateFolderStructure() {
         try {
-            const response = await fetch('/api/folder-structure');
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            const structure = await response.json();
             const folderTree = document.querySelector('.folder-tree');
             if (!folderTree) {
                 console.warn('Folder tree element not found');
                 return;
             }
+            const { data, changed } = await fetchFolder('');
+            if (!changed && folderTree.childElementCount) {
+                return;
+            }
             folderTree.innerHTML = '';
-            folderTree.appendChild(renderFolderTree(structure));
+            folderTree.appendChild(renderFolderTree(data));
         } catch (error) {
             console.error('Error fetching folder structure:', error);
             addLogMessage(`Failed to update folder structure: ${error.message}`, 'error');
         }
     }
 
+    async function loadFolderChildren(node, childrenDiv, level) {
+        try {
+            const { data, changed } = await fetchFolder(node.path);
+            if (!changed && childrenDiv.childElementCount) {
+                return;
+            }
+            childrenDiv.innerHTML = '';
+            appendFolderPage(childrenDiv, data, level);
+        } catch (error) {
+            console.error('Error fetching folder contents:', error);
+            addLogMessage(`Failed to load ${node.name}: ${error.message}`, 'error');
+        }
+    }
+
+    function appendFolderPage(childrenDiv, page, level) {
+        page.children.forEach(child => {
+            childrenDiv.appendChild(renderFolderTree(child, level + 1));
+        });
+
+        const loaded = page.offset + page.children.length;
+        if (loaded < page.total) {
+            const more = document.createElement('div');
+            more.className = 'folder-item folder-more';
+            more.style.paddingLeft = `${(level + 1) * 1.5}rem`;
+            more.textContent = `Show more (${page.total - loaded} remaining)`;
+            more.onclick = async (e) => {
+                e.stopPropagation();
+                try {
+                    const { data } = await fetchFolder(page.path, loaded);
+                    more.remove();
+                    appendFolderPage(childrenDiv, data, level);
+                } catch (error) {
+                    console.error('Error fetching folder contents:', error);
+                    addLogMessage(`Failed to load more files: ${error.message}`, 'error');
+                }
+            };
+            childrenDiv.appendChild(more);
+        }
+    }
+
+    function formatFileSize(bytes) {
+        if (bytes < 1024) return `${bytes} B`;
+        if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+        return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+    }
+
     function renderFolderTree(node, level = 0) {
         const div = document.createElement('div');
         div.className = 'folder-item';
@@ -266,6 +380,13 @@ document.addEventListener('DOMContentLoaded', function() {
             fileTypeIcon.textContent = fileExtension;
             div.appendChild(fileTypeIcon);
 
+            if (typeof node.size === 'number') {
+                const sizeSpan = document.createElement('span');
+                sizeSpan.className = 'file-size';
+                sizeSpan.textContent = formatFileSize(node.size);
+                div.appendChild(sizeSpan);
+            }
+
             // Add download icon for files
             const downloadIcon = document.createElement('i');
             downloadIcon.className = 'fas fa-download download-icon';
@@ -318,19 +439,23 @@ document.addEventListener('DOMContentLoaded', function() {
             };
             div.appendChild(downloadFolderIcon);
 
-            // Add expandable children
+            // Children are fetched one level at a time when the folder is expanded
             const childrenDiv = document.createElement('div');
             childrenDiv.className = 'folder-children d-none';
-            node.children.forEach(child => {
-                childrenDiv.appendChild(renderFolderTree(child, level + 1));
-            });
+            if (node.children) {
+                appendFolderPage(childrenDiv, node, level);
+            }
             div.appendChild(childrenDiv);
 
             // Add click handler for folders
-            div.onclick = (e) => {
+            div.onclick = async (e) => {
                 e.stopPropagation();
+                const expanding = !div.classList.contains('expanded');
                 div.classList.toggle('expanded');
                 childrenDiv.classList.toggle('d-none');
+                if (expanding) {
+                    await loadFolderChildren(node, childrenDiv, level);
+                }
             };
         }
 
@@ -374,13 +499,27 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
+        const topics = data.topics || [];
+        const topicsHtml = topics.length ? `
+            <h3>Topics</h3>
+            <div class="topics-content mb-4">
+                ${topics.map(topic => `
+                    <div class="topic-item mb-2">
+                        <h5>${topic.label || 'Untitled topic'} <small class="text-muted">(${topic.pages} pages)</small></h5>
+                        ${topic.representative ? `<p>Representative page: ${topic.representative.url}</p>` : ''}
+                    </div>
+                `).join('')}
+            </div>
+        ` : '';
+
         const resultsHtml = `
+            ${topicsHtml}
             <h3>Analysis Results</h3>
             <div class="results-content">
                 ${data.analyzed_data.map(item => `
                     <div class="result-item mb-3">
                         <h4>Source: ${item.url}</h4>
-                        <p>Relevance Score: ${item.relevance_score.toFixed(2)}</p>
+                        <p>Relevance Score: ${item.relevance_score == null ? 'N/A' : item.relevance_score.toFixed(2)}</p>
                         <p>Found ${item.images.length} relevant images</p>
                         <div class="metadata">
                             <h5>Metadata:</h5>
@@ -414,9 +553,9 @@ document.addEventListener('DOMContentLoaded', function() {
             try {
                 const response = await fetch('/api/chat', {
                     method: 'POST',
-                    headers: {
+                    headers: clientHeaders({
                         'Content-Type': 'application/json'
-                    },
+                    }),
                     body: JSON.stringify({ message })
                 });
 
@@ -426,6 +565,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
                 const data = await response.json();
                 addMessage(data.response);
+                researchQuery = message;
+                researchContext = data.context || '';
                 
                 if (data.websites && data.websites.length > 0) {
                     displayWebsites(data.websites);
@@ -465,21 +606,30 @@ document.addEventListener('DOMContentLoaded', function() {
             try {
                 const response = await fetch('/api/scrape', {
                     method: 'POST',
-                    headers: {
+                    headers: clientHeaders({
                         'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({ websites: selectedWebsites })
+                    }),
+                    body: JSON.stringify({
+                        websites: selectedWebsites,
+                        query: researchQuery,
+                        context: researchContext,
+                        crawl: crawlOptions()
+                    })
                 });
 
                 if (!response.ok) {
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
 
-                const data = await response.json();
+                const job = await response.json();
+                currentJobId = job.job_id;
+                addLogMessage(`Scraping job ${job.job_id} queued`, 'info');
+
+                const data = await waitForJob(job.job_id);
                 
                 if (data.analyzed_data) {
                     displayResults(data);
-                    addLogMessage('Analysis completed successfully', 'info');
+                    addLogMessage(`Scraping job ${data.status}`, data.status === 'completed' ? 'info' : 'warning');
                 }
 
                 if (elements.websiteSelection && elements.scrapeSelectedBtn) {
@@ -491,12 +641,36 @@ document.addEventListener('DOMContentLoaded', function() {
                 addLogMessage(`Scraping error: ${error.message}`, 'error');
                 addMessage('An error occurred during scraping. Please try again.');
             } finally {
+                currentJobId = null;
                 elements.loadingIndicator.classList.remove('active');
                 elements.scrapeSelectedBtn.disabled = false;
             }
         });
     }
 
+    // Poll a background scraping job until it stops, then fetch its results
+    async function waitForJob(jobId) {
+        const terminalStates = ['completed', 'failed', 'cancelled', 'interrupted'];
+        while (true) {
+            const response = await fetch(`/api/jobs/${jobId}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const status = await response.json();
+            updateStats(status.stats);
+            if (terminalStates.includes(status.status) && !status.active) {
+                break;
+            }
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        }
+
+        const results = await fetch(`/api/jobs/${jobId}/results`);
+        if (!results.ok) {
+            throw new Error(`HTTP error! status: ${results.status}`);
+        }
+        return results.json();
+    }
+
     // Initialize pause/cancel buttons
     if (elements.pauseScrapingBtn) {
         elements.pauseScrapingBtn.addEventListener('click', function() {
@@ -511,6 +685,10 @@ document.addEventListener('DOMContentLoaded', function() {
     if (elements.cancelScrapingBtn) {
         elements.cancelScrapingBtn.addEventListener('click', function() {
             if (confirm('Are you sure you want to cancel the scraping process?')) {
+                if (currentJobId !== null) {
+                    fetch(`/api/jobs/${currentJobId}/cancel`, { method: 'POST', headers: clientHeaders() })
+                        .catch(error => addLogMessage(`Failed to cancel job: ${error.message}`, 'error'));
+                }
                 addLogMessage('Scraping cancelled by user', 'info');
                 if (elements.scrapingProgress) {
                     elements.scrapingProgress.classList.add('d-none');
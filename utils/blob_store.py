@@ -0,0 +1,148 @@
+import os
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+BLOB_MODE = 0o444
+
+class BlobStore:
+    """Content-addressed file store keyed by full SHA-256
+
+    Each distinct piece of content is written once under
+    <root>/<sha[:2]>/<sha>, and session directories reference it with a
+    hardlink. Content that is already stored is never written again, and the
+    bytes saved that way are tallied per owner (a session directory) so the
+    dedup ratio can be reported. The tallies live in memory; owners persist
+    usage() themselves and hand it back to restore() when they carry on.
+    Blobs are read-only: a session file shares
+    its inode with every other file holding the same content.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.temp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.temp_dir, exist_ok=True)
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def contains(self, digest):
+        """Whether a blob exists; a hit refreshes its mtime so garbage collection spares it"""
+        try:
+            os.utime(self.blob_path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _admit(self, temp_path, digest):
+        """Move a fully written temp file into the store; False if it was already there"""
+        path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(temp_path, BLOB_MODE)
+        try:
+            # link() rather than replace() so an existing blob (and its links) is left alone
+            os.link(temp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            # Temp file on another filesystem or no hardlink support
+            if os.path.exists(path):
+                return False
+            shutil.copy2(temp_path, path)
+            return True
+        finally:
+            os.remove(temp_path)
+
+    def put_bytes(self, data):
+        """Store bytes unless they are already present; returns (digest, created)"""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.contains(digest):
+            return digest, False
+
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_dir, prefix='blob_')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return digest, self._admit(temp_path, digest)
+
+    def put_file(self, temp_path, digest):
+        """Store a file whose SHA-256 is already known, consuming temp_path; returns created"""
+        if self.contains(digest):
+            os.remove(temp_path)
+            return False
+        return self._admit(temp_path, digest)
+
+    def link(self, digest, dest_path):
+        """Make dest_path reference a blob, replacing whatever was there"""
+        blob_path = self.blob_path(digest)
+        if os.path.exists(dest_path) and os.path.samefile(blob_path, dest_path):
+            return dest_path
+
+        directory, name = os.path.split(dest_path)
+        temp_link = os.path.join(directory, f".{name}.link_{threading.get_ident()}")
+        try:
+            os.link(blob_path, temp_link)
+        except OSError as e:
+            logger.warning(f"Hardlink into {directory} failed, copying instead: {str(e)}")
+            shutil.copy2(blob_path, temp_link)
+        os.replace(temp_link, dest_path)
+        if os.path.lexists(temp_link):
+            # rename() is a no-op when both names already point at the same inode
+            os.remove(temp_link)
+        return dest_path
+
+    def record(self, owner, size, created):
+        """Account one stored file for an owner"""
+        with self._lock:
+            usage = self._usage.setdefault(owner, {'files': 0, 'bytes': 0, 'stored_bytes': 0})
+            usage['files'] += 1
+            usage['bytes'] += size
+            if created:
+                usage['stored_bytes'] += size
+
+    def usage(self, owner):
+        """Files and bytes saved for an owner, how many were new and the dedup ratio"""
+        with self._lock:
+            usage = dict(self._usage.get(owner) or {'files': 0, 'bytes': 0, 'stored_bytes': 0})
+        usage['deduplicated_bytes'] = usage['bytes'] - usage['stored_bytes']
+        usage['dedup_ratio'] = usage['deduplicated_bytes'] / usage['bytes'] if usage['bytes'] else 0.0
+        return usage
+
+    def restore(self, owner, usage):
+        """Continue an owner's tally from a usage() persisted by an earlier run"""
+        usage = usage or {}
+        with self._lock:
+            self._usage[owner] = {key: int(usage.get(key) or 0) for key in ('files', 'bytes', 'stored_bytes')}
+
+    def forget(self, owner):
+        with self._lock:
+            self._usage.pop(owner, None)
+
+    def collect_garbage(self, min_age=3600):
+        """Remove blobs no session links to any more; returns the number removed
+
+        A blob with a link count of one is only referenced by the store itself.
+        Recent blobs are kept so one that is about to be linked isn't lost.
+        """
+        removed = 0
+        cutoff = time.time() - min_age
+        for dirpath, _, filenames in os.walk(self.root):
+            if dirpath == self.temp_dir:
+                continue
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_nlink == 1 and stat.st_mtime < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
@@ -4,13 +4,23 @@ from datetime import datetime
 import shutil
 import stat
 import json
+from utils.folder_index import FolderIndex
+from utils.blob_store import BlobStore
+from scraper.metrics import registry, stage
 
 logger = logging.getLogger(__name__)
 
+SAVED_BYTES = registry.counter(
+    'storage_saved_bytes_total', 'Bytes passed to store_content, by whether they were written or deduplicated', ('result',)
+)
+
 class FileManager:
-    def __init__(self):
+    def __init__(self, blob_dir=None):
         self.base_dir = os.path.join(os.getcwd(), 'data')
         self._ensure_base_directory()
+        self.index = FolderIndex(self.base_dir)
+        # Kept outside data/ so blobs never show up as a session
+        self.blobs = BlobStore(blob_dir or os.path.join(os.getcwd(), 'instance', 'blobs'))
 
     def _ensure_base_directory(self):
         """Create base directory if it doesn't exist with proper permissions"""
@@ -54,6 +64,7 @@ class FileManager:
             
             # Ensure proper permissions for main directory
             os.chmod(session_dir, stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH)
+            self.index.record_directory(session_dir)
             
             return session_dir
         except Exception as e:
@@ -62,6 +73,14 @@ class FileManager:
 
     def save_content(self, session_dir, filename, content, content_type='html'):
         """Save content to a file in the session directory with proper error handling"""
+        return self.store_content(session_dir, filename, content, content_type)['path']
+
+    def store_content(self, session_dir, filename, content, content_type='html'):
+        """Save content through the blob store and return its path, SHA-256 and size
+
+        Content that is already stored anywhere is not written again; the
+        session file is a hardlink to the existing blob.
+        """
         try:
             if not os.path.exists(session_dir):
                 raise Exception(f"Session directory does not exist: {session_dir}")
@@ -76,58 +95,53 @@ class FileManager:
             safe_filename = os.path.basename(filename)
             if safe_filename != filename:
                 logger.warning(f"Sanitized filename from {filename} to {safe_filename}")
-                safe_filename = filename
             
             filepath = os.path.join(subdir, safe_filename)
             
-            # Handle different content types
-            if content_type == 'images':
-                with open(filepath, 'wb') as f:
-                    f.write(content)
-            else:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(content)
-            
-            # Set proper file permissions
-            os.chmod(filepath, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
-            
-            logger.info(f"Successfully saved {content_type} content to: {filepath}")
-            return filepath
+            data = content.encode('utf-8') if isinstance(content, str) else content
+            with stage('save', content_type=content_type):
+                digest, created = self.blobs.put_bytes(data)
+                self.blobs.link(digest, filepath)
+                self.blobs.record(session_dir, len(data), created)
+                self.index.record_file(filepath)
+            SAVED_BYTES.inc(len(data), result='written' if created else 'deduplicated')
             
-        except Exception as e:
-            logger.error(f"Failed to save content: {str(e)}", exc_info=True)
-            raise Exception(f"Failed to save content: {str(e)}")
+            if created:
+                logger.info(f"Successfully saved {content_type} content to: {filepath}")
+            else:
+                logger.info(f"Linked existing {content_type} content to: {filepath}")
+            return {'path': filepath, 'content_hash': digest, 'size': len(data), 'created': created}
             
         except Exception as e:
             logger.error(f"Failed to save content: {str(e)}", exc_info=True)
             raise Exception(f"Failed to save content: {str(e)}")
 
-    def get_folder_structure(self):
-        """Get the current folder structure as a tree"""
+    def storage_stats(self, session_dir):
+        """Bytes saved for a session and how many of them were deduplicated"""
+        return self.blobs.usage(session_dir)
+
+    def restore_storage_stats(self, session_dir, stats):
+        """Carry on counting a session's storage from stats saved by an earlier run"""
+        self.blobs.restore(session_dir, stats)
+
+    def forget_storage_stats(self, session_dir):
+        self.blobs.forget(session_dir)
+
+    def get_folder_structure(self, path='', offset=0, limit=200):
+        """Get one page of a directory in the data folder, served from the folder index
+
+        Directories list their child_count instead of their children; the
+        client expands them one level at a time.
+        """
         try:
-            def create_tree(path):
-                name = os.path.basename(path)
-                if os.path.isfile(path):
-                    return {
-                        'name': name,
-                        'type': 'file'
-                    }
-                else:
-                    return {
-                        'name': name,
-                        'type': 'directory',
-                        'children': sorted(
-                            [create_tree(os.path.join(path, x)) 
-                             for x in os.listdir(path)],
-                            key=lambda x: (x['type'] == 'file', x['name'])
-                        )
-                    }
-            
             if not os.path.exists(self.base_dir):
-                return {'name': 'data', 'type': 'directory', 'children': []}
+                return {'name': 'data', 'path': '', 'type': 'directory', 'total': 0,
+                        'offset': offset, 'limit': limit, 'children': [], 'etag': 'empty'}
                 
-            return create_tree(self.base_dir)
+            return self.index.page(path, offset, limit)
             
+        except (ValueError, FileNotFoundError, NotADirectoryError):
+            raise
         except Exception as e:
             logger.error(f"Failed to get folder structure: {str(e)}", exc_info=True)
             raise Exception(f"Failed to get folder structure: {str(e)}")
@@ -149,10 +163,17 @@ class FileManager:
                         # Remove if older than 24 hours
                         if (current_time - created_time).days >= 1:
                             shutil.rmtree(item_path)
+                            self.index.forget(item_path)
+                            self.blobs.forget(item_path)
                             logger.info(f"Cleaned up old session: {item_path}")
                 except Exception as e:
                     logger.error(f"Failed to cleanup {item}: {str(e)}", exc_info=True)
                     continue
+
+            # Blobs only the store still links to belonged to removed sessions
+            removed = self.blobs.collect_garbage()
+            if removed:
+                logger.info(f"Removed {removed} unreferenced blobs")
                     
         except Exception as e:
             logger.error(f"Failed to cleanup temporary files: {str(e)}", exc_info=True)
@@ -0,0 +1,172 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class FolderIndex:
+    """Cached per-directory listings of the data directory
+
+    A directory is scanned the first time it is opened and FileManager keeps
+    the listing current as it writes. Every read compares the directory's
+    mtime with the cached one, so changes made outside the app are picked up
+    with one stat instead of a walk over the whole tree.
+    """
+
+    def __init__(self, base_dir, max_directories=5000):
+        self.base_dir = os.path.abspath(base_dir)
+        self.max_directories = max_directories
+        self._listings = OrderedDict()
+        self._lock = threading.RLock()
+
+    def relpath(self, path):
+        """Path relative to the data directory with '/' separators ('' for the root)"""
+        relpath = os.path.relpath(os.path.abspath(path), self.base_dir)
+        return '' if relpath == '.' else relpath.replace(os.sep, '/')
+
+    def abspath(self, relpath):
+        """Absolute path for a relative one, refusing anything outside the data directory"""
+        abs_path = os.path.abspath(os.path.join(self.base_dir, (relpath or '').strip('/')))
+        if abs_path != self.base_dir and not abs_path.startswith(self.base_dir + os.sep):
+            raise ValueError(f"Path outside the data directory: {relpath}")
+        return abs_path
+
+    def _describe(self, entry, parent):
+        path = f"{parent}/{entry.name}" if parent else entry.name
+        stat = entry.stat()
+        if entry.is_dir():
+            cached = self._listings.get(path)
+            if cached is not None and cached['mtime_ns'] == stat.st_mtime_ns:
+                child_count = len(cached['entries'])
+            else:
+                child_count = self._count_children(entry.path)
+            return {
+                'name': entry.name,
+                'path': path,
+                'type': 'directory',
+                'child_count': child_count,
+                'modified': stat.st_mtime
+            }
+        return {
+            'name': entry.name,
+            'path': path,
+            'type': 'file',
+            'size': stat.st_size,
+            'modified': stat.st_mtime
+        }
+
+    @staticmethod
+    def _count_children(path):
+        try:
+            with os.scandir(path) as entries:
+                return sum(1 for entry in entries if not entry.name.startswith('.'))
+        except OSError:
+            return 0
+
+    def _scan(self, relpath):
+        entries = {}
+        with os.scandir(self.abspath(relpath)) as scan:
+            for entry in scan:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    entries[entry.name] = self._describe(entry, relpath)
+                except OSError:
+                    continue  # Removed while we were scanning
+        return entries
+
+    def _listing(self, relpath):
+        """Return the cached listing for a directory, rescanning it if its mtime moved"""
+        mtime_ns = os.stat(self.abspath(relpath)).st_mtime_ns
+        listing = self._listings.get(relpath)
+        if listing is None or listing['mtime_ns'] != mtime_ns:
+            logger.debug(f"Scanning {relpath or 'data'} for folder index")
+            listing = {'mtime_ns': mtime_ns, 'entries': self._scan(relpath), 'ordered': None, 'etag': None}
+            self._listings[relpath] = listing
+            while len(self._listings) > self.max_directories:
+                self._listings.popitem(last=False)
+        self._listings.move_to_end(relpath)
+
+        if listing['ordered'] is None:
+            listing['ordered'] = sorted(
+                listing['entries'].values(),
+                key=lambda x: (x['type'] == 'file', x['name'])
+            )
+            digest = hashlib.sha1(json.dumps(listing['ordered'], sort_keys=True).encode('utf-8'))
+            listing['etag'] = digest.hexdigest()
+        return listing
+
+    def page(self, relpath='', offset=0, limit=200):
+        """One page of a directory's children, directories first"""
+        relpath = (relpath or '').strip('/')
+        with self._lock:
+            listing = self._listing(relpath)
+            children = listing['ordered'][offset:offset + limit]
+            return {
+                'name': os.path.basename(relpath) or os.path.basename(self.base_dir),
+                'path': relpath,
+                'type': 'directory',
+                'total': len(listing['ordered']),
+                'offset': offset,
+                'limit': limit,
+                'children': children,
+                'etag': f"{listing['etag'][:24]}-{offset}-{limit}"
+            }
+
+    def _update_parent(self, path, describe):
+        relpath = self.relpath(path)
+        parent, _, name = relpath.rpartition('/')
+        with self._lock:
+            listing = self._listings.get(parent)
+            if listing is None:
+                return  # Not opened yet; it will be scanned on first read
+            is_new = name not in listing['entries']
+            listing['entries'][name] = describe(relpath)
+            listing['ordered'] = None
+            listing['mtime_ns'] = os.stat(self.abspath(parent)).st_mtime_ns
+
+            grandparent, _, parent_name = parent.rpartition('/')
+            outer = self._listings.get(grandparent) if parent else None
+            if is_new and outer is not None and parent_name in outer['entries']:
+                outer['entries'][parent_name]['child_count'] = len(listing['entries'])
+                outer['ordered'] = None
+
+    def record_file(self, path):
+        """Update the index after a file was written"""
+        def describe(relpath):
+            stat = os.stat(path)
+            return {
+                'name': os.path.basename(path),
+                'path': relpath,
+                'type': 'file',
+                'size': stat.st_size,
+                'modified': stat.st_mtime
+            }
+        self._update_parent(path, describe)
+
+    def record_directory(self, path):
+        """Update the index after a directory was created"""
+        def describe(relpath):
+            return {
+                'name': os.path.basename(path),
+                'path': relpath,
+                'type': 'directory',
+                'child_count': self._count_children(path),
+                'modified': os.stat(path).st_mtime
+            }
+        self._update_parent(path, describe)
+
+    def forget(self, path):
+        """Drop a removed file or directory and every listing below it"""
+        relpath = self.relpath(path)
+        parent, _, name = relpath.rpartition('/')
+        with self._lock:
+            for cached in list(self._listings):
+                if cached == relpath or cached.startswith(relpath + '/'):
+                    del self._listings[cached]
+            listing = self._listings.get(parent)
+            if listing is not None and listing['entries'].pop(name, None) is not None:
+                listing['ordered'] = None
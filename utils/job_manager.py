@@ -0,0 +1,61 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class JobManager:
+    def __init__(self, max_workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._cancel_events = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_id, runner):
+        """Run runner(job_id, cancel_event) on the background executor"""
+        with self._lock:
+            if self._is_active(job_id):
+                raise ValueError(f"Job {job_id} is already running")
+            cancel_event = threading.Event()
+            self._cancel_events[job_id] = cancel_event
+            self._futures[job_id] = self.executor.submit(self._run, job_id, runner, cancel_event)
+        logger.info(f"Submitted job {job_id}")
+
+    def _run(self, job_id, runner, cancel_event):
+        try:
+            runner(job_id, cancel_event)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+                self._futures.pop(job_id, None)
+
+    def _is_active(self, job_id):
+        future = self._futures.get(job_id)
+        return future is not None and not future.done()
+
+    def active_count(self):
+        """Jobs queued or running in this process"""
+        with self._lock:
+            return sum(1 for job_id in self._futures if self._is_active(job_id))
+
+    def active_jobs(self):
+        """Ids of the jobs queued or running in this process"""
+        with self._lock:
+            return [job_id for job_id in self._futures if self._is_active(job_id)]
+
+    def is_active(self, job_id):
+        """Check whether a job is queued or running in this process"""
+        with self._lock:
+            return self._is_active(job_id)
+
+    def cancel(self, job_id):
+        """Ask a job to stop; URLs already in flight finish, the rest stay pending"""
+        with self._lock:
+            cancel_event = self._cancel_events.get(job_id)
+            if cancel_event is None:
+                return False
+            cancel_event.set()
+            logger.info(f"Cancellation requested for job {job_id}")
+            return True
@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r'\s+')
+
+def normalize_prompt(text):
+    """Collapse whitespace and case so trivially different prompts share a cache entry"""
+    return WHITESPACE.sub(' ', text or '').strip().casefold()
+
+def cache_key(model, messages, **options):
+    """Key for a chat completion: model, normalized messages and request options"""
+    payload = {
+        'model': model,
+        'messages': [[message['role'], normalize_prompt(message['content'])] for message in messages],
+        'options': options
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+class LLMCache:
+    """SQLite-backed cache of LLM responses with a TTL and a size cap"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=20000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses (expires_at)')
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT response FROM responses WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, model, response):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses (key, model, response, created_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (key, model, json.dumps(response), now, now + self.ttl)
+            )
+            # Prune now and then rather than on every write
+            if random.random() < 0.02:
+                self._prune(now)
+
+    def _prune(self, now):
+        self._db.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+        self._db.execute(
+            'DELETE FROM responses WHERE key IN ('
+            'SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+class RequestCoalescer:
+    """Run one call per key at a time; concurrent callers with the same key share its result"""
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, call):
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = call()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+class RateLimiter:
+    """Caps concurrent requests and spaces them out to a requests-per-minute budget"""
+
+    def __init__(self, max_concurrency=4, requests_per_minute=60):
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._slots.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._slots.release()
+        return False
@@ -1,38 +1,144 @@
 import os
-from openai import OpenAI
 import json
+import time
+import random
+import logging
+import openai
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI
+from utils.llm_cache import LLMCache, RequestCoalescer, RateLimiter, cache_key
+from scraper.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LLM_SECONDS = registry.histogram('llm_request_seconds', 'Chat completion latency, by outcome', ('outcome',))
+LLM_WAIT = registry.histogram('llm_rate_limit_wait_seconds', 'Time chat completions waited for the rate limiter')
+LLM_REQUESTS = registry.counter('llm_requests_total', 'Chat completion attempts, by outcome', ('outcome',))
+LLM_CACHE = registry.counter('llm_cache_total', 'LLM response cache lookups, by result', ('result',))
+LLM_TOKENS = registry.counter('llm_tokens_total', 'Tokens used by chat completions', ('kind',))
+
+# Failures worth retrying: throttling, dropped connections and server errors
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+RELEVANCE_PROMPT = """Analyze the relevance of the content to the given context.
+                        Respond with a JSON object containing:
+                        {
+                            "relevance_score": float between 0 and 1,
+                            "explanation": "brief explanation of the score"
+                        }"""
+
+BATCH_RELEVANCE_PROMPT = """Analyze the relevance of each numbered content item to the given context.
+                        Respond with a JSON object containing one result per item:
+                        {
+                            "results": [
+                                {
+                                    "index": item index,
+                                    "relevance_score": float between 0 and 1,
+                                    "explanation": "brief explanation of the score"
+                                }
+                            ]
+                        }"""
 
 class LLMHandler:
-    def __init__(self):
+    def __init__(self, api_key=None, base_url=None, cache_path=None, cache_ttl=7 * 24 * 3600,
+                 max_concurrency=4, requests_per_minute=60, max_retries=4, timeout=60):
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
         self.model = "gpt-4o"
-        self.openai = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        # base_url (or OPENAI_BASE_URL) points the client at any OpenAI-compatible server,
+        # e.g. a local stub; retries are ours so they go through the rate limiter
+        self.openai = OpenAI(
+            api_key=api_key or os.environ.get("OPENAI_API_KEY"),
+            base_url=base_url or os.environ.get("OPENAI_BASE_URL"),
+            max_retries=0,
+            timeout=timeout
+        )
+        self.cache = LLMCache(cache_path, ttl=cache_ttl) if cache_path else None
+        self.coalescer = RequestCoalescer()
+        self.limiter = RateLimiter(max_concurrency, requests_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+    def _retry_delay(self, error, attempt):
+        """Honour Retry-After when the server sends one, else exponential backoff with jitter"""
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            if retry_after:
+                return min(60.0, float(retry_after))
+        except ValueError:
+            pass
+        return min(30.0, 2 ** attempt) * (0.5 + random.random())
+
+    def _create(self, messages):
+        """One chat completion, rate limited and retried on transient errors"""
+        for attempt in range(self.max_retries + 1):
+            queued = started = time.perf_counter()
+            try:
+                with self.limiter:
+                    started = time.perf_counter()
+                    LLM_WAIT.observe(started - queued)
+                    response = self.openai.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        response_format={"type": "json_object"}
+                    )
+                LLM_SECONDS.observe(time.perf_counter() - started, outcome='ok')
+                LLM_REQUESTS.inc(outcome='ok')
+                usage = getattr(response, 'usage', None)
+                if usage is not None:
+                    LLM_TOKENS.inc(usage.prompt_tokens or 0, kind='prompt')
+                    LLM_TOKENS.inc(usage.completion_tokens or 0, kind='completion')
+                return response
+            except RETRYABLE_ERRORS as e:
+                LLM_SECONDS.observe(time.perf_counter() - started, outcome='retryable_error')
+                LLM_REQUESTS.inc(outcome='retryable_error')
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                logger.warning(f"LLM request failed with {type(e).__name__}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+            except Exception:
+                LLM_SECONDS.observe(time.perf_counter() - started, outcome='error')
+                LLM_REQUESTS.inc(outcome='error')
+                raise
+
+    def _complete_json(self, messages, key=None, use_cache=True):
+        """JSON chat completion served from the cache, or shared with identical calls in flight"""
+        key = key or cache_key(self.model, messages, response_format='json_object')
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            cached = self.cache.get(key)
+            LLM_CACHE.inc(result='miss' if cached is None else 'hit')
+            if cached is not None:
+                return cached
+
+        def call():
+            result = json.loads(self._create(messages).choices[0].message.content)
+            if use_cache:
+                self.cache.put(key, self.model, result)
+            return result
+
+        return self.coalescer.run(key, call)
 
     def process_user_input(self, user_message):
         """Process user input and return relevant websites and context"""
         try:
-            response = self.openai.chat.completions.create(
-                model=self.model,
-                messages=[
+            return self._complete_json([
+                {
+                    "role": "system",
+                    "content": """You are an AI assistant helping users find relevant websites
+                    for their research topics. Analyze the user's request and provide a list
+                    of relevant websites to scrape. Respond in JSON format with:
                     {
-                        "role": "system",
-                        "content": """You are an AI assistant helping users find relevant websites 
-                        for their research topics. Analyze the user's request and provide a list 
-                        of relevant websites to scrape. Respond in JSON format with:
-                        {
-                            "message": "your response to user",
-                            "websites": ["url1", "url2", ...],
-                            "context": "additional context for processing"
-                        }"""
-                    },
-                    {"role": "user", "content": user_message}
-                ],
-                response_format={"type": "json_object"}
-            )
-            
-            return json.loads(response.choices[0].message.content)
-        
+                        "message": "your response to user",
+                        "websites": ["url1", "url2", ...],
+                        "context": "additional context for processing"
+                    }"""
+                },
+                {"role": "user", "content": user_message}
+            ])
+
         except Exception as e:
             return {
                 "message": f"Error processing request: {str(e)}",
@@ -42,31 +148,79 @@ class LLMHandler:
 
     def analyze_relevance(self, content, context):
         """Analyze content relevance using LLM"""
+        return self.analyze_relevance_batch([content], context)[0]
+
+    def _relevance_key(self, content, context):
+        """Per-page cache key, independent of which batch the page was scored in"""
+        return cache_key(self.model, [
+            {"role": "system", "content": RELEVANCE_PROMPT},
+            {"role": "user", "content": f"Context: {context}\nContent: {content}"}
+        ], response_format='json_object')
+
+    def analyze_relevance_batch(self, contents, context, batch_size=8):
+        """Score many pages against one context, several pages per request
+
+        Returns one {relevance_score, explanation} dict per content, in order.
+        Pages already scored for this context come from the cache and are not
+        sent again.
+        """
+        contents = [(content or '')[:1000] for content in contents]
+        keys = [self._relevance_key(content, context) for content in contents]
+        results = [None] * len(contents)
+
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if self.cache else None
+            if self.cache:
+                LLM_CACHE.inc(result='miss' if cached is None else 'hit')
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.append(i)
+
+        batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                for batch, (scored, error) in zip(batches, executor.map(
+                    lambda batch: self._score_batch(batch, contents, context), batches
+                )):
+                    for i in batch:
+                        results[i] = scored.get(i)
+                        if results[i] is None:
+                            results[i] = {
+                                "relevance_score": 0.0,
+                                "explanation": error or "Error analyzing relevance: no result returned"
+                            }
+                        elif self.cache:
+                            self.cache.put(keys[i], self.model, results[i])
+        return results
+
+    def _score_batch(self, batch, contents, context):
+        """Score one batch of pages in a single request; returns ({index: result}, error)"""
+        items = [{"index": i, "content": contents[i]} for i in batch]
         try:
-            response = self.openai.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Analyze the relevance of the content to the given context. 
-                        Respond with a JSON object containing:
-                        {
-                            "relevance_score": float between 0 and 1,
-                            "explanation": "brief explanation of the score"
-                        }"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Context: {context}\nContent: {content[:1000]}"
+            response = self._complete_json([
+                {"role": "system", "content": BATCH_RELEVANCE_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"Context: {context}\nItems: {json.dumps(items, ensure_ascii=False)}"
+                }
+            ], key=cache_key(self.model, [], batch=[self._relevance_key(contents[i], context) for i in batch]),
+                use_cache=False)
+
+            scored = {}
+            for result in response.get('results', []):
+                try:
+                    index = int(result['index'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if index in batch:
+                    scored[index] = {
+                        "relevance_score": float(result.get('relevance_score', 0.0)),
+                        "explanation": result.get('explanation', '')
                     }
-                ],
-                response_format={"type": "json_object"}
-            )
-            
-            return json.loads(response.choices[0].message.content)
-            
+            return scored, None
+
         except Exception as e:
-            return {
-                "relevance_score": 0.0,
-                "explanation": f"Error analyzing relevance: {str(e)}"
-            }
+            logger.error(f"Batch relevance analysis failed: {str(e)}")
+            return {}, f"Error analyzing relevance: {str(e)}"
@@ -0,0 +1,253 @@
+import os
+import re
+import html
+import time
+import queue
+import logging
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Longest stretch of page text kept in the index; enough for search and snippets
+MAX_TEXT_CHARS = 200000
+# Snippet highlight markers, swapped for <mark> tags after the snippet is HTML-escaped
+MARK_START, MARK_END = '\x02', '\x03'
+QUERY_TERMS = re.compile(r'"([^"]+)"|(\w+\*?)', re.UNICODE)
+
+
+def page_domain(url):
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def fts_query(text):
+    """Turn free text into a safe FTS5 query: every word or "quoted phrase" must match
+
+    A trailing * keeps prefix matching (astro*); any other FTS5 syntax in the
+    input is treated as plain text rather than raising a syntax error.
+    """
+    terms = []
+    for phrase, word in QUERY_TERMS.findall(text or ''):
+        if phrase:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                terms.append('"' + ' '.join(words) + '"')
+        elif word.endswith('*'):
+            terms.append(f'"{word[:-1]}"*')
+        else:
+            terms.append(f'"{word}"')
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    """Full-text index of scraped pages in SQLite FTS5, written by a background thread
+
+    add() only queues the page, so the scrape path never waits on the index;
+    the writer commits queued pages in batches. Page ids are the WebsiteData
+    ids, and per-page filter columns (session, domain, scrape time) live in a
+    plain indexed table joined to the FTS table by rowid.
+    """
+
+    def __init__(self, path, batch_size=200, flush_interval=1.0, max_queued=10000, rank_window=10000):
+        self.path = path
+        self.rank_window = rank_window
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._local = threading.local()
+        self.dropped = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        connection = self._connect()
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY,
+                session_id INTEGER,
+                url TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                scraped_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_pages_session ON pages (session_id);
+            CREATE INDEX IF NOT EXISTS idx_pages_domain ON pages (domain);
+            CREATE INDEX IF NOT EXISTS idx_pages_scraped_at ON pages (scraped_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+                title, description, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            );
+        ''')
+
+        self._writer = threading.Thread(target=self._write_loop, name='search-index', daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        """One connection per thread; readers never block the writer under WAL"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=15, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def add(self, page_id, session_id, url, title='', description='', text='', scraped_at=None, block=False):
+        """Queue a page for indexing, replacing any earlier version with the same id
+
+        Unless block is set, a full queue drops the page rather than wait.
+        """
+        item = ('add', (
+            page_id, session_id, url, page_domain(url), scraped_at or time.time(),
+            title or '', description or '', (text or '')[:MAX_TEXT_CHARS]
+        ))
+        try:
+            self._queue.put(item, block=block)
+        except queue.Full:
+            # Never stall a scrape on the index; the backfill at the next start picks the page up
+            self.dropped += 1
+            logger.warning(f"Search index queue full, dropped page {page_id}")
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been written"""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        connection = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or batch[-1][0] == 'flush':
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(connection, batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} search index updates: {str(e)}", exc_info=True)
+            for operation, payload in batch:
+                if operation == 'flush':
+                    payload.set()
+
+    def _write(self, connection, batch):
+        pages = [payload for operation, payload in batch if operation == 'add']
+        if not pages:
+            return
+        ids = [(page[0],) for page in pages]
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany('DELETE FROM pages_fts WHERE rowid = ?', ids)
+            connection.executemany(
+                'INSERT OR REPLACE INTO pages (id, session_id, url, domain, scraped_at) VALUES (?, ?, ?, ?, ?)',
+                [page[:5] for page in pages]
+            )
+            connection.executemany(
+                'INSERT INTO pages_fts (rowid, title, description, body) VALUES (?, ?, ?, ?)',
+                [(page[0],) + page[5:] for page in pages]
+            )
+        logger.debug(f"Indexed {len(pages)} pages")
+
+    def missing(self, page_ids):
+        """The ids among page_ids that are not in the index, for catching up on pages it never got
+
+        Pages are indexed out of id order (concurrent jobs, crawl rows created
+        late, pages dropped from a full queue), so anything short of checking
+        each id can miss some for good.
+        """
+        page_ids = list(page_ids)
+        if not page_ids:
+            return []
+        indexed = {
+            row[0] for row in self._connect().execute(
+                f"SELECT id FROM pages WHERE id IN ({', '.join('?' * len(page_ids))})", page_ids
+            )
+        }
+        return [page_id for page_id in page_ids if page_id not in indexed]
+
+    def search(self, text, session_id=None, domain=None, since=None, until=None, offset=0, limit=20):
+        """BM25-ranked pages matching text, with highlighted snippets
+
+        since and until are unix timestamps. BM25 has to score every match,
+        so a query matching more than rank_window pages ranks only the newest
+        rank_window of them; total then reads as at least rank_window and
+        total_capped is set.
+        """
+        match = fts_query(text)
+        if not match:
+            return {'total': 0, 'total_capped': False, 'results': []}
+
+        # Filters use unary + so the planner walks the FTS matches and looks pages up by id,
+        # rather than probing the FTS index once per page of a filtered session or domain
+        conditions = ['pages_fts MATCH ?']
+        params = [match]
+        if session_id is not None:
+            conditions.append('+pages.session_id = ?')
+            params.append(session_id)
+        if domain:
+            domain = page_domain(f"//{domain.lower().strip('.')}")
+            conditions.append("(+pages.domain = ? OR pages.domain LIKE '%.' || ?)")
+            params.extend([domain, domain])
+        if since is not None:
+            conditions.append('+pages.scraped_at >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('+pages.scraped_at < ?')
+            params.append(until)
+        source = 'FROM pages_fts JOIN pages ON pages.id = pages_fts.rowid WHERE ' + ' AND '.join(conditions)
+
+        connection = self._connect()
+        # Walking the matches newest first costs no scoring, so find the window's edge that way
+        edge = connection.execute(
+            f'SELECT pages_fts.rowid {source} ORDER BY pages_fts.rowid DESC LIMIT 1 OFFSET ?',
+            params + [self.rank_window - 1]
+        ).fetchone()
+        if edge:
+            source += ' AND pages_fts.rowid >= ?'
+            params.append(edge[0])
+            total = self.rank_window
+        else:
+            total = connection.execute(f'SELECT COUNT(*) {source}', params).fetchone()[0]
+
+        ranked = connection.execute(
+            f'SELECT pages_fts.rowid, bm25(pages_fts, 5.0, 2.0, 1.0) AS rank {source} '
+            f'ORDER BY rank LIMIT ? OFFSET ?',
+            params + [limit, offset]
+        ).fetchall()
+        if not ranked:
+            return {'total': total, 'total_capped': bool(edge), 'results': []}
+
+        # Snippets only for the page being returned, not for every ranked match
+        ids = [page_id for page_id, _ in ranked]
+        details = {
+            row[0]: row[1:]
+            for row in connection.execute(
+                f'''SELECT pages.id, pages.session_id, pages.url, pages.domain, pages.scraped_at,
+                           pages_fts.title, snippet(pages_fts, -1, ?, ?, '…', 24)
+                    FROM pages_fts JOIN pages ON pages.id = pages_fts.rowid
+                    WHERE pages_fts MATCH ? AND pages_fts.rowid IN ({', '.join('?' * len(ids))})''',
+                [MARK_START, MARK_END, match] + ids
+            )
+        }
+
+        results = []
+        for page_id, rank in ranked:
+            session, url, host, scraped_at, title, snippet = details[page_id]
+            results.append({
+                'id': page_id,
+                'session_id': session,
+                'url': url,
+                'domain': host,
+                'scraped_at': scraped_at,
+                'title': title,
+                'score': -rank,
+                'snippet': html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+            })
+        return {'total': total, 'total_capped': bool(edge), 'results': results}
+
+    def stats(self):
+        pages = self._connect().execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+        return {'pages': pages, 'queued': self._queue.qsize(), 'dropped': self.dropped}
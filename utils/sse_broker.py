@@ -0,0 +1,198 @@
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+def coalesce_progress(events):
+    """Collapse runs of progress events into the latest one
+
+    Completion events are always kept so the UI sees the final state.
+    """
+    coalesced = []
+    for event in events:
+        if (
+            coalesced
+            and event['event'] == 'progress'
+            and coalesced[-1]['event'] == 'progress'
+            and not coalesced[-1].get('final')
+        ):
+            coalesced[-1] = event
+        else:
+            coalesced.append(event)
+    return coalesced
+
+def format_events(events):
+    """Serialize a batch of events into one SSE chunk"""
+    return ''.join(
+        f"id: {event['id']}\nevent: {event['event']}\ndata: {event['data']}\n\n"
+        for event in events
+    )
+
+def _is_final(event_type, data):
+    if event_type != 'progress':
+        return False
+    try:
+        return json.loads(data).get('level', {}).get('status') == 'complete'
+    except (AttributeError, TypeError, ValueError):
+        return False
+
+class _Channel:
+    def __init__(self, buffer_size):
+        self.buffer = deque(maxlen=buffer_size)
+        self.condition = threading.Condition()
+        self.last_id = 0
+        self.delivered_id = 0
+        self.subscribers = 0
+        self.last_active = time.monotonic()
+
+class SSEBroker:
+    """In-process pub/sub for server-sent events
+
+    Every client gets a bounded replay buffer, so messages published before
+    the stream opens are kept and reconnects can resume from Last-Event-ID.
+    """
+
+    def __init__(self, buffer_size=500, idle_ttl=900):
+        self.buffer_size = buffer_size
+        self.idle_ttl = idle_ttl
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _channel(self, client_id):
+        with self._lock:
+            channel = self._channels.get(client_id)
+            if channel is None:
+                channel = self._channels[client_id] = _Channel(self.buffer_size)
+            channel.last_active = time.monotonic()
+            self._sweep()
+            return channel
+
+    def _sweep(self):
+        """Drop idle channels nobody is listening to (called with the lock held)"""
+        now = time.monotonic()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for client_id, channel in list(self._channels.items()):
+            if channel.subscribers == 0 and now - channel.last_active > self.idle_ttl:
+                del self._channels[client_id]
+
+    def publish(self, client_id, event_type, data):
+        """Append an event to a client's buffer and wake its streams"""
+        channel = self._channel(client_id)
+        with channel.condition:
+            channel.last_id += 1
+            channel.buffer.append({
+                'id': channel.last_id,
+                'event': event_type,
+                'data': data,
+                'final': _is_final(event_type, data)
+            })
+            channel.condition.notify_all()
+
+    def backlog(self):
+        """Number of buffered events not yet delivered, per client"""
+        with self._lock:
+            channels = list(self._channels.items())
+        return {
+            client_id: sum(1 for event in channel.buffer if event['id'] > channel.delivered_id)
+            for client_id, channel in channels
+        }
+
+    def stream(self, client_id, last_event_id=None, keepalive=15):
+        """Yield batches of events for a client, or an empty batch as a keepalive"""
+        channel = self._channel(client_id)
+        try:
+            cursor = int(last_event_id) if last_event_id is not None else None
+        except ValueError:
+            cursor = None
+
+        with channel.condition:
+            channel.subscribers += 1
+            if cursor is None:
+                cursor = channel.delivered_id
+
+        try:
+            while True:
+                with channel.condition:
+                    if channel.last_id <= cursor:
+                        channel.condition.wait(keepalive)
+                    batch = [event for event in channel.buffer if event['id'] > cursor]
+                    if batch:
+                        cursor = batch[-1]['id']
+                        channel.delivered_id = max(channel.delivered_id, cursor)
+                    channel.last_active = time.monotonic()
+                yield coalesce_progress(batch)
+        finally:
+            with channel.condition:
+                channel.subscribers -= 1
+
+class RedisSSEBroker:
+    """Redis Streams backed broker so several server processes can publish to one client"""
+
+    def __init__(self, url, buffer_size=500, ttl=3600):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.redis.ping()
+        self.buffer_size = buffer_size
+        self.ttl = ttl
+
+    def _key(self, client_id):
+        return f"sse:{client_id}"
+
+    def publish(self, client_id, event_type, data):
+        key = self._key(client_id)
+        pipeline = self.redis.pipeline()
+        pipeline.xadd(
+            key,
+            {'event': event_type, 'data': data, 'final': int(_is_final(event_type, data))},
+            maxlen=self.buffer_size,
+            approximate=True
+        )
+        pipeline.expire(key, self.ttl)
+        pipeline.execute()
+
+    def backlog(self):
+        backlog = {}
+        for key in self.redis.scan_iter(match='sse:*', count=100):
+            if key.endswith(':delivered'):
+                continue
+            delivered = self.redis.get(f"{key}:delivered") or '0'
+            backlog[key[4:]] = len(self.redis.xrange(key, min=f"({delivered}", count=self.buffer_size))
+        return backlog
+
+    def stream(self, client_id, last_event_id=None, keepalive=15):
+        key = self._key(client_id)
+        delivered_key = f"{key}:delivered"
+        cursor = last_event_id or self.redis.get(delivered_key) or '0'
+
+        while True:
+            response = self.redis.xread({key: cursor}, count=self.buffer_size, block=keepalive * 1000)
+            batch = []
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    batch.append({
+                        'id': entry_id,
+                        'event': fields['event'],
+                        'data': fields['data'],
+                        'final': fields.get('final') == '1'
+                    })
+            if batch:
+                cursor = batch[-1]['id']
+                self.redis.set(delivered_key, cursor, ex=self.ttl)
+            yield coalesce_progress(batch)
+
+def create_broker(redis_url=None, **kwargs):
+    """Use Redis when configured and reachable, otherwise the in-process broker"""
+    if redis_url:
+        try:
+            broker = RedisSSEBroker(redis_url, **kwargs)
+            logger.info("Using Redis SSE broker")
+            return broker
+        except Exception as e:
+            logger.warning(f"Redis SSE broker unavailable, falling back to in-process broker: {str(e)}")
+    return SSEBroker(**kwargs)
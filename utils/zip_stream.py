@@ -0,0 +1,221 @@
+import os
+import time
+import zlib
+import struct
+import fnmatch
+import hashlib
+import logging
+import zipfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+ZIP32_LIMIT = 0xFFFFFFFF
+
+# Formats that are already compressed; deflating them again only costs CPU
+STORED_EXTENSIONS = {
+    'jpg', 'jpeg', 'png', 'gif', 'webp', 'avif', 'ico', 'zip', 'gz', 'bz2', 'xz',
+    '7z', 'mp3', 'mp4', 'webm', 'pdf', 'woff', 'woff2'
+}
+
+FLAG_UTF8 = 0x0800
+VERSION = 20
+
+_crc_cache = OrderedDict()
+_crc_lock = threading.Lock()
+CRC_CACHE_SIZE = 20000
+
+def _matches(relpath, patterns):
+    for pattern in patterns:
+        pattern = pattern.strip().strip('/')
+        if not pattern:
+            continue
+        if relpath == pattern or relpath.startswith(pattern + '/') or fnmatch.fnmatch(relpath, pattern):
+            return True
+    return False
+
+def _dos_datetime(mtime):
+    t = time.localtime(mtime)
+    year = max(t.tm_year, 1980)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+def _file_crc32(path, size, mtime_ns):
+    """CRC32 of a file, cached by (path, size, mtime) so repeat manifests are cheap"""
+    key = (path, size, mtime_ns)
+    with _crc_lock:
+        if key in _crc_cache:
+            _crc_cache.move_to_end(key)
+            return _crc_cache[key]
+
+    crc = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+
+    with _crc_lock:
+        _crc_cache[key] = crc
+        if len(_crc_cache) > CRC_CACHE_SIZE:
+            _crc_cache.popitem(last=False)
+    return crc
+
+def build_manifest(root, include=None, with_crc=False):
+    """List the files under root that belong in the archive, in a stable order
+
+    include is an optional list of relative paths or glob patterns (for
+    example ['text'] or ['images/*.png']) selecting a subset of the folder.
+    """
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if filename.startswith('.'):
+                continue
+            path = os.path.join(dirpath, filename)
+            relpath = os.path.relpath(path, root).replace(os.sep, '/')
+            if include and not _matches(relpath, include):
+                continue
+            stat = os.stat(path)
+            entry = {
+                'arcname': relpath,
+                'path': path,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'stored': relpath.rsplit('.', 1)[-1].lower() in STORED_EXTENSIONS
+            }
+            if with_crc:
+                entry['crc32'] = _file_crc32(path, stat.st_size, stat.st_mtime_ns)
+            entries.append(entry)
+    return entries
+
+class _StreamBuffer:
+    """Write-only, unseekable sink that zipfile writes into and we drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_zip(entries):
+    """Generate a ZIP on the fly; images and other compressed formats are stored"""
+    sink = _StreamBuffer()
+    with zipfile.ZipFile(sink, mode='w', allowZip64=True) as archive:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry['arcname'], date_time=time.localtime(max(entry['mtime'], 315619200))[:6])
+            info.compress_type = zipfile.ZIP_STORED if entry['stored'] else zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            info.file_size = entry['size']
+            try:
+                with open(entry['path'], 'rb') as source, \
+                        archive.open(info, mode='w', force_zip64=entry['size'] > ZIP32_LIMIT // 2) as target:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            except OSError as e:
+                logger.warning(f"Skipping {entry['path']} in ZIP stream: {str(e)}")
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+class StoredZipLayout:
+    """Byte-exact layout of an all-stored ZIP, so any byte range can be served
+
+    Every entry is uncompressed and its CRC comes from the manifest, which
+    makes the archive size and offsets known before streaming starts. That
+    is what lets interrupted downloads resume with HTTP Range requests.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.segments = []
+        central = []
+        offset = 0
+
+        for entry in entries:
+            name = entry['arcname'].encode('utf-8')
+            dos_time, dos_date = _dos_datetime(entry['mtime'])
+            header = struct.pack(
+                '<IHHHHHIIIHH',
+                0x04034b50, VERSION, FLAG_UTF8, 0, dos_time, dos_date,
+                entry['crc32'], entry['size'], entry['size'], len(name), 0
+            ) + name
+            self.segments.append((offset, len(header), header, None))
+            offset += len(header)
+            self.segments.append((offset, entry['size'], None, entry['path']))
+
+            central.append(struct.pack(
+                '<IHHHHHHIIIHHHHHII',
+                0x02014b50, VERSION, VERSION, FLAG_UTF8, 0, dos_time, dos_date,
+                entry['crc32'], entry['size'], entry['size'], len(name), 0, 0, 0, 0,
+                0o644 << 16, offset - len(header)
+            ) + name)
+            offset += entry['size']
+
+        directory = b''.join(central)
+        end_record = struct.pack(
+            '<IHHHHIIH',
+            0x06054b50, 0, 0, len(entries), len(entries), len(directory), offset, 0
+        )
+        self.segments.append((offset, len(directory) + len(end_record), directory + end_record, None))
+        self.total_size = offset + len(directory) + len(end_record)
+
+        if self.total_size > ZIP32_LIMIT or len(entries) > 0xFFFF:
+            raise ValueError("Archive too large for a resumable ZIP")
+
+    @property
+    def etag(self):
+        digest = hashlib.sha256()
+        for entry in self.entries:
+            digest.update(f"{entry['arcname']}\0{entry['size']}\0{entry['crc32']}\0{entry['mtime']}\n".encode('utf-8'))
+        return digest.hexdigest()[:32]
+
+    def iter_range(self, start=0, stop=None):
+        """Yield the archive bytes in [start, stop)"""
+        stop = self.total_size if stop is None else min(stop, self.total_size)
+        for segment_offset, length, data, path in self.segments:
+            segment_end = segment_offset + length
+            if segment_end <= start or segment_offset >= stop:
+                continue
+            begin = max(start, segment_offset) - segment_offset
+            end = min(stop, segment_end) - segment_offset
+            if data is not None:
+                yield data[begin:end]
+                continue
+            with open(path, 'rb') as source:
+                source.seek(begin)
+                remaining = end - begin
+                while remaining > 0:
+                    chunk = source.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise IOError(f"{path} changed while streaming")
+                    remaining -= len(chunk)
+                    yield chunk